@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# EESync - sync throughput benchmark.
+# Generates synthetic source trees and runs the SyncProvider (local rsync) through the benchmark scenarios.
+# Usage: `./Benchmarks/sync_benchmark.py --help`
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import GeneralSettings  # noqa
+from Src.Common.BackupAction import BackupAction  # noqa
+from Src.Config.ConfigEntry import ConfigEntry  # noqa
+from Src.IO.Logger import Logger  # noqa
+from Src.IO.UserInputConsole import UserInputConsole  # noqa
+from Src.Service.CryptProvider import CryptProvider  # noqa
+from Src.Service.SyncProvider import SyncProvider  # noqa
+
+
+class CryptStandIn:
+    """
+    Stand-in for the CryptProvider (no encfs needed): the "decrypted" directory is a plain directory.
+    The entries are still configured as encrypted, so the SyncProvider works with the same paths as with EncFS.
+    """
+
+    config: ConfigEntry = None
+
+    def set_config(self, config: ConfigEntry):
+        self.config = config
+
+    def run(self, action: BackupAction):
+        pass
+
+    def cleanup(self):
+        pass
+
+
+class SyncBenchmark:
+    """
+    Sync throughput benchmark: synthetic trees x scenarios, results saved as JSON.
+    """
+
+    benchmark_version: int = 1
+
+    file_mtime: int = 1_600_000_000
+    """All the generated files get the same modification time - the trees are identical between the runs."""
+
+    trees: dict = {
+        # name: (number of small files, small file size range, number of big files, big file size, max depth)
+        "tiny": (20000, (1024, 4096), 0, 0, 2),
+        "huge": (0, (0, 0), 4, 256 * 1024 * 1024, 1),
+        "deep": (3000, (1024, 65536), 0, 0, 40),
+        "mixed": (5000, (1024, 262144), 2, 128 * 1024 * 1024, 6),
+    }
+    """Synthetic tree definitions (sizes for the scale 1.0)."""
+
+    scenarios: list = ["seed", "no_change", "small_delta"]
+    """Scenarios run one after another for every tree: initial copy, repeated run, run after small changes."""
+
+    def __init__(self, work_dir: str, scale: float, encfs_mode: str, seed: int):
+        """
+        :param work_dir: Directory for the generated trees, logs and the application state.
+        :param scale: Multiplier of the tree sizes (number of the small files and size of the big ones).
+        :param encfs_mode: "stand-in" (plain directory), "real" (encfs mount) or "none" (not encrypted entry).
+        :param seed: Random seed of the tree generator.
+        """
+        self.work_dir = os.path.realpath(work_dir)
+        self.scale = scale
+        self.encfs_mode = encfs_mode
+        self.seed = seed
+        self.rsync_version = None
+        self.results = []
+
+    def generate_tree(self, tree_name: str, source_dir: str) -> dict:
+        """
+        Generates the synthetic tree (deterministic for the given seed and scale).
+        :return: Tree summary: number of files and total size.
+        """
+        small_count, small_size_range, big_count, big_size, max_depth = self.trees[tree_name]
+        small_count = int(small_count * self.scale)
+        big_size = int(big_size * self.scale)
+        generator = random.Random(f"{self.seed}-{tree_name}")
+
+        shutil.rmtree(source_dir, ignore_errors=True)
+        os.makedirs(source_dir)
+        total_bytes = 0
+        files_count = 0
+
+        # small files - spread over the nested directories, up to 100 files per directory
+        for dir_number in range((small_count + 99) // 100):
+            depth = generator.randint(1, max_depth)
+            dir_path = os.path.join(source_dir, *[f"d{dir_number}_{level}" for level in range(depth)])
+            os.makedirs(dir_path, exist_ok=True)
+            for file_number in range(min(100, small_count - dir_number * 100)):
+                total_bytes += self.__write_file(os.path.join(dir_path, f"f{file_number}.bin"),
+                                                 generator.randint(*small_size_range), generator)
+                files_count += 1
+
+        # big files - written in chunks
+        for file_number in range(big_count if big_size else 0):
+            total_bytes += self.__write_file(os.path.join(source_dir, f"big{file_number}.bin"), big_size, generator)
+            files_count += 1
+
+        return {"files": files_count, "bytes": total_bytes}
+
+    def apply_small_delta(self, source_dir: str, repeat: int) -> dict:
+        """
+        Changes ~1% of the files (same size, new content and mtime), adds and deletes ~0.5% of the files.
+        :return: Delta summary.
+        """
+        generator = random.Random(f"{self.seed}-delta-{repeat}")
+        file_paths = sorted(os.path.join(dir_path, file_name)
+                            for dir_path, _, file_names in os.walk(source_dir) for file_name in file_names)
+        changed_paths = generator.sample(file_paths, max(1, len(file_paths) // 100))
+        unchanged_paths = set(file_paths) - set(changed_paths)
+        deleted_paths = generator.sample(sorted(unchanged_paths),
+                                         max(1, len(file_paths) // 200))
+
+        for path in changed_paths:
+            file_size = os.path.getsize(path)
+            with open(path, 'r+b') as file:
+                file.seek(generator.randint(0, max(0, file_size - 4096)))
+                file.write(generator.randbytes(min(4096, file_size)))
+            os.utime(path, (self.file_mtime + 3600, self.file_mtime + 3600))
+        for path in deleted_paths:
+            os.remove(path)
+        for file_number in range(len(deleted_paths)):
+            new_path = os.path.join(os.path.dirname(generator.choice(changed_paths)), f"new{repeat}_{file_number}.bin")
+            self.__write_file(new_path, generator.randint(1024, 65536), generator)
+
+        return {"changed": len(changed_paths), "deleted": len(deleted_paths), "added": len(deleted_paths)}
+
+    def __write_file(self, path: str, size: int, generator: random.Random) -> int:
+        """
+        Writes the file with random content and the fixed modification time.
+        :return: The file size.
+        """
+        with open(path, 'wb') as file:
+            remaining = size
+            while remaining > 0:
+                chunk_size = min(remaining, 1024 * 1024)
+                file.write(generator.randbytes(chunk_size))
+                remaining -= chunk_size
+        os.utime(path, (self.file_mtime, self.file_mtime))
+        return size
+
+    def prepare_entry(self, tree_name: str, repeat: int) -> ConfigEntry:
+        """
+        Prepares the config entry (and the empty target directories) for the tree.
+        Target directories are named per repeat - the real EncFS mounts stay alive until the end of the process.
+        """
+        tree_dir = os.path.join(self.work_dir, "trees", tree_name)
+        os.makedirs(tree_dir, exist_ok=True)
+        if self.encfs_mode != "real":
+            for name in os.listdir(tree_dir):
+                if name != "source":
+                    shutil.rmtree(os.path.join(tree_dir, name))
+
+        entry = ConfigEntry()
+        entry.general_name = f"benchmark-{tree_name}"
+        entry.backup_source_dir = os.path.join(tree_dir, "source")
+        if self.encfs_mode == "none":
+            entry.backup_target_dir = os.path.join(tree_dir, f"target{repeat}")
+        else:
+            entry.encfs_enabled = True
+            entry.backup_target_dir = os.path.join(tree_dir, f"encrypted{repeat}")
+            entry.encfs_encryption_dir = entry.backup_target_dir
+            entry.encfs_decryption_dir = os.path.join(tree_dir, f"decrypted{repeat}")
+
+        for path in [entry.backup_target_dir, entry.encfs_decryption_dir]:
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+                os.makedirs(path)
+        return entry
+
+    def run_scenario(self, crypt_service, sync_service: SyncProvider) -> dict:
+        """
+        Runs a single (measured) backup: mount (stand-in: nothing), sync, release.
+        :return: Measurements: wall time, CPU time and block I/O (of this process and the child processes).
+        """
+        self_usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        time_start = time.perf_counter()
+
+        crypt_service.run(BackupAction.BACKUP)
+        mount_secs = time.perf_counter() - time_start
+        sync_result = sync_service.run(BackupAction.BACKUP)
+        crypt_service.cleanup()
+
+        wall_secs = time.perf_counter() - time_start
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        def usage_diff(field: str) -> float:
+            return (getattr(self_usage, field) - getattr(self_usage_start, field)
+                    + getattr(children_usage, field) - getattr(children_usage_start, field))
+
+        return {
+            "wall_secs": wall_secs,
+            "mount_secs": mount_secs,
+            "cpu_user_secs": usage_diff("ru_utime"),
+            "cpu_sys_secs": usage_diff("ru_stime"),
+            "io_read_bytes": int(usage_diff("ru_inblock")) * 512,
+            "io_write_bytes": int(usage_diff("ru_oublock")) * 512,
+            "return_code": sync_result.returncode,
+            "transfer_stats": sync_service.last_transfer_stats
+        }
+
+    @staticmethod
+    def drop_caches():
+        """
+        Flushes and drops the page cache (root only) - the scenarios start with the cold cache.
+        """
+        os.sync()
+        try:
+            with open("/proc/sys/vm/drop_caches", 'w') as file:
+                file.write("3\n")
+        except OSError as error:
+            raise SystemExit(f"Error! Cannot drop the page cache (root access required): {error}")
+
+    def run(self, tree_names: list, scenario_names: list, repeat_count: int, drop_caches: bool):
+        """
+        Runs the benchmark: for every tree and repeat - generates the tree, then runs the scenarios in order.
+        """
+        sync_service = SyncProvider()
+        sync_service.require_binary()
+        self.rsync_version = '.'.join(map(str, sync_service.detected_version))
+        crypt_service = CryptProvider() if self.encfs_mode == "real" else CryptStandIn()
+
+        for tree_name in tree_names:
+            for repeat in range(repeat_count):
+                entry = self.prepare_entry(tree_name, repeat)
+                print(f"[{tree_name} #{repeat + 1}] Generating the tree...")
+                tree_summary = self.generate_tree(tree_name, entry.backup_source_dir)
+                crypt_service.set_config(entry)
+                sync_service.set_config(entry)
+
+                for scenario_name in self.scenarios:
+                    delta_summary = None
+                    if scenario_name == "small_delta":
+                        delta_summary = self.apply_small_delta(entry.backup_source_dir, repeat)
+                    if scenario_name not in scenario_names and scenario_name != "seed":
+                        continue
+                    if drop_caches:
+                        self.drop_caches()
+
+                    print(f"[{tree_name} #{repeat + 1}] Scenario: {scenario_name}")
+                    measurements = self.run_scenario(crypt_service, sync_service)
+                    if scenario_name not in scenario_names:
+                        continue  # the seed run is required by the other scenarios, but not reported
+                    self.results.append({
+                        "tree": tree_name,
+                        "scenario": scenario_name,
+                        "repeat": repeat,
+                        "tree_summary": tree_summary,
+                        "delta_summary": delta_summary,
+                        **measurements
+                    })
+                    print(f"  {measurements['wall_secs']:.2f} sec, "
+                          + f"CPU {measurements['cpu_user_secs'] + measurements['cpu_sys_secs']:.2f} sec, "
+                          + f"exit code: {measurements['return_code']}")
+
+    def save(self, output_path: str, label: str):
+        """
+        Saves the results (with the environment and the settings used) to the JSON file.
+        """
+        result_document = {
+            "benchmark_version": self.benchmark_version,
+            "label": label,
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "environment": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "rsync_version": self.rsync_version,
+            },
+            "parameters": {"scale": self.scale, "encfs_mode": self.encfs_mode, "seed": self.seed},
+            "sync_rsync": GeneralSettings.sync_rsync,
+            "results": self.results,
+            "summary": self.summarize(self.results)
+        }
+        with open(output_path, 'w') as file:
+            json.dump(result_document, file, indent=4, sort_keys=True)
+        print(f"Results saved: {output_path}")
+
+    @staticmethod
+    def summarize(results: list) -> dict:
+        """
+        Median values per tree and scenario (the repeats are aggregated).
+        """
+        grouped = {}
+        for result in results:
+            grouped.setdefault(f"{result['tree']}/{result['scenario']}", []).append(result)
+        return {
+            key: {
+                "runs": len(group),
+                "wall_secs": statistics.median(result['wall_secs'] for result in group),
+                "cpu_secs": statistics.median(result['cpu_user_secs'] + result['cpu_sys_secs'] for result in group),
+                "io_bytes": statistics.median(result['io_read_bytes'] + result['io_write_bytes'] for result in group)
+            }
+            for key, group in sorted(grouped.items())
+        }
+
+    @staticmethod
+    def compare(baseline_path: str, current_summary: dict) -> str:
+        """
+        Compares the summary with the baseline result file.
+        """
+        with open(baseline_path) as file:
+            baseline_summary = json.load(file)["summary"]
+        report = f"Comparison with: {baseline_path}\n"
+        for key, current in current_summary.items():
+            baseline = baseline_summary.get(key)
+            if not baseline or not baseline['wall_secs']:
+                report += f"  {key}: {current['wall_secs']:.2f} sec (no baseline)\n"
+                continue
+            report += str(f"  {key}: {current['wall_secs']:.2f} sec vs {baseline['wall_secs']:.2f} sec "
+                          + f"({(current['wall_secs'] / baseline['wall_secs'] - 1) * 100:+.1f}%)\n")
+        return report
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="EESync sync throughput benchmark (local rsync).")
+    parser.add_argument("--work-dir", required=True,
+                        help="directory for the generated trees (its content gets overwritten)")
+    parser.add_argument("--output", default=None,
+                        help="result file, `<work-dir>/benchmark_<date>.json` by default")
+    parser.add_argument("--label", default='', help="free-text label saved with the results")
+    parser.add_argument("--trees", default=','.join(SyncBenchmark.trees),
+                        help="comma separated tree names: " + ', '.join(SyncBenchmark.trees))
+    parser.add_argument("--scenarios", default=','.join(SyncBenchmark.scenarios),
+                        help="comma separated scenario names: " + ', '.join(SyncBenchmark.scenarios))
+    parser.add_argument("--scale", type=float, default=0.1, help="tree size multiplier, 0.1 by default")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repeats, 3 by default")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the tree generator")
+    parser.add_argument("--encfs", choices=["auto", "stand-in", "real", "none"], default="auto",
+                        help="EncFS layer: real encfs mount (the volumes are created and mounted with "
+                             + "`encfs_mount_params` from the settings - must be non-interactive, e.g. "
+                             + "`--standard --extpass=...`), plain directory stand-in, or not encrypted entries. "
+                             + "Default 'auto': real if encfs is installed and `--extpass` is set, stand-in otherwise")
+    parser.add_argument("--drop-caches", action="store_true", help="drop the page cache before every scenario")
+    parser.add_argument("--sync-setting", action="append", default=[], metavar="KEY=JSON",
+                        help="overrides the `sync_rsync` setting, e.g. `rsync_shards=4` (can be repeated)")
+    parser.add_argument("--compare", metavar="RESULT_FILE", help="compare the results with a previous result file")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    tree_names = [name.strip() for name in arguments.trees.split(',')]
+    scenario_names = [name.strip() for name in arguments.scenarios.split(',')]
+    for name in tree_names + scenario_names:
+        if name not in SyncBenchmark.trees and name not in SyncBenchmark.scenarios:
+            raise SystemExit(f"Error! Unknown tree or scenario: {name}")
+
+    # the scenarios measure the sync itself - rsync logging can be enabled with `--sync-setting`
+    GeneralSettings.sync_rsync["rsync_logging_enabled"] = False
+    for setting in arguments.sync_setting:
+        key, _, value = setting.partition('=')
+        if key not in GeneralSettings.sync_rsync:
+            raise SystemExit(f"Error! Unknown sync_rsync setting: {key}")
+        GeneralSettings.sync_rsync[key] = json.loads(value)
+
+    encfs_mode = arguments.encfs
+    if encfs_mode == "auto":
+        extpass_set = any(param.startswith("--extpass") for param in GeneralSettings.crypt_encfs["encfs_mount_params"])
+        encfs_mode = "real" if shutil.which("encfs") and extpass_set else "stand-in"
+        print(f"EncFS layer: {encfs_mode}")
+
+    # unattended runs, isolated application state (logs, manifests, history) in the work directory
+    os.makedirs(os.path.join(arguments.work_dir, "SavedLogs"), exist_ok=True)
+    output_path = os.path.realpath(arguments.output) if arguments.output else None
+    compare_path = os.path.realpath(arguments.compare) if arguments.compare else None
+    os.chdir(arguments.work_dir)
+    GeneralSettings.runner["confirm_os_commands"] = False
+    GeneralSettings.run_history["enabled"] = False
+    UserInputConsole.interactive = False
+    Logger.init()
+
+    benchmark = SyncBenchmark(".", arguments.scale, encfs_mode, arguments.seed)
+    benchmark.run(tree_names, scenario_names, arguments.repeat, arguments.drop_caches)
+    benchmark.save(output_path or f"benchmark_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json",
+                   arguments.label)
+    if compare_path:
+        print(SyncBenchmark.compare(compare_path, SyncBenchmark.summarize(benchmark.results)))
+
+
+if __name__ == '__main__':
+    main()
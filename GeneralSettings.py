@@ -6,7 +6,60 @@ runner = {
     # Prints the external (backup) commands that are executed on your OS.
     # Asks for confirmation before running the command.
     # Possible values: "True" or "False".
-    "confirm_os_commands": True
+    "confirm_os_commands": True,
+
+    # Commands that exceed their deadline (or get cancelled) are stopped with SIGTERM.
+    # If still running after this many seconds, they are killed (SIGKILL).
+    "kill_grace_secs": 10.0
+}
+
+throttle = {
+    # Throttling of the external processes - the backups should not starve the other workloads of the host.
+    # Possible values: "True" or "False".
+    "enabled": False,
+
+    # Binaries started under `ionice` / `nice` (matched by the name).
+    "throttled_binaries": ["rsync", "encfs"],
+
+    # I/O scheduling class (see: `man ionice`): 1 - realtime, 2 - best-effort, 3 - idle. Value 0 means no change.
+    # The level (0 - highest priority, 7 - lowest) applies to the best-effort class only.
+    # NOTE: the I/O priorities are honored by the BFQ scheduler only (not by "none" / "mq-deadline").
+    "ionice_class": 2,
+    "ionice_level": 7,
+
+    # CPU priority (see: `man nice`): 1 to 19 lowers the priority. Value 0 means no change.
+    "nice_level": 10,
+
+    # Rsync bandwidth limit (`--bwlimit`), set from the measured load at every rsync start (incl. the shards).
+    # Rsync cannot change the limit of a running transfer - the limit follows the load from one run to another
+    # (e.g. watch mode, batch mode, sharded runs). Every change of the limit is logged.
+    # Possible values: "True" or "False".
+    "bwlimit_enabled": True,
+
+    # Measurements: I/O pressure - the share (%) of the time in which some tasks were stalled on I/O
+    # (`/proc/pressure/io`, 10 seconds average; if not available, only the load is used),
+    # and the system load (`/proc/loadavg`, 1 minute average) per CPU.
+    # No limit below the low thresholds. From the low to the high thresholds (the worse of the two wins),
+    # the limit goes down from the maximum to the minimum value. Limit is in KiB/s, shared by the shards.
+    "io_pressure_low": 10.0,
+    "io_pressure_high": 40.0,
+    "load_low": 0.7,
+    "load_high": 1.5,
+    "bwlimit_max_kbps": 102400,
+    "bwlimit_min_kbps": 4096
+}
+
+config_store = {
+    # Saved configuration (entries) storage.
+
+    # Choose the storage backend:
+    # "files" - one JSON file per entry in the `SavedConfig` folder (default).
+    # "sqlite" - single SQLite database file - recommended for large numbers of entries.
+    # Existing config files can be moved with: `./eesync.py --config-import <dir>` (and `--config-export <dir>`).
+    "backend": "files",
+
+    # SQLite database path. Blank value ("") means `SavedConfig/config_store.sqlite`.
+    "sqlite_path": ""
 }
 
 logger = {
@@ -23,10 +76,25 @@ logger = {
     # Blank value ("") means that logs will be saved in application directory ("./SavedLogs").
     "custom_log_dir_path": "",
 
+    # Log file lines are written by a background thread. This is the maximum number of lines waiting
+    # to be written - when it is reached, the application waits for the writer.
+    "file_buffer_max_lines": 10000,
+
+    # Log rotation - applies to EEsync and rsync logs ("eesync_*", "rsync_*" files in the logs directory).
+    # Rotation runs in the background. Logs of the current run are never touched.
+    # Note: for advanced logging control it is recommended to use a dedicated tool (like logrotate).
+
     # Allows to define number of days after which the logs will be deleted.
     # Empty value "" means than the feature is disabled (EEsync will not delete any logs on its own).
-    # Note: for advanced logging control it is recommended to use a dedicated tool (like logrotate).
-    "remove_logs_older_than_days": "14"
+    "remove_logs_older_than_days": "14",
+
+    # Allows to define the total size (in megabytes) of the logs. The oldest logs are deleted when exceeded.
+    # Empty value "" means than the feature is disabled.
+    "max_total_logs_size_mb": "",
+
+    # Compression of the logs from the previous runs.
+    # Possible values: "gzip", "zstd" (requires the `zstandard` Python module), "" (disabled).
+    "compress_logs": "gzip"
 }
 
 sync_rsync = {
@@ -44,6 +112,39 @@ sync_rsync = {
 
     # ----
 
+    # Parameter profiles - tuned for the file system type of the written location.
+    # File system type of the written location is detected (`/proc/self/mountinfo`): the target (the EncFS mount
+    # for the encrypted entries), or the source for the restore actions - the profile options (`--inplace`,
+    # `--preallocate`, `--modify-window`, ...) apply to the written side. The first profile (in the order of the
+    # "rsync_profile_filesystems") that matches it is used, "default" otherwise. Other locations are logged only.
+    # Profile parameters are added to the "rsync_base_params". The choice gets logged (and saved in the run history).
+    # The profile can be also set per entry: "rsync_profile" field in the config file.
+    # NOTE: the profiles change the rsync behavior (e.g. `--inplace` - no temporary copy), so they are opt-in.
+    # Possible values: "True" or "False".
+    "rsync_profiles_enabled": False,
+
+    "rsync_profiles": {
+        # network file systems: no delta-transfer (it would read the whole target over the network anyway),
+        # files updated in place (no temporary copy + rename), the file list is sent at once
+        "network": ["--whole-file", "--inplace", "--no-inc-recursive"],
+        # EncFS (FUSE): no delta-transfer reads through the decryption layer, no renames of encrypted names
+        "fuse_encfs": ["--whole-file", "--inplace"],
+        # USB sticks and disks with FAT/NTFS: 2-second timestamps, no unix permissions or owners
+        "removable_fat": ["--whole-file", "--modify-window=1", "--no-perms", "--no-owner", "--no-group"],
+        # local disks: less fragmentation of the big files
+        "local": ["--preallocate"],
+        "default": []
+    },
+
+    "rsync_profile_filesystems": {
+        "network": ["nfs", "nfs4", "cifs", "smb3", "fuse.sshfs", "9p"],
+        "fuse_encfs": ["fuse.encfs"],
+        "removable_fat": ["vfat", "msdos", "exfat", "fuseblk", "ntfs", "ntfs3"],
+        "local": ["ext4", "xfs"]
+    },
+
+    # ----
+
     # Rsync has a nice logging feature ('--log-file' parameter).
     # Here, you can decide if you would like to use it or not.
     # Possible values: "True" or "False".
@@ -60,5 +161,227 @@ sync_rsync = {
     # Parameters that are added only if dry run mode is selected.
     "rsync_dry_run_params": [
         "--dry-run"
-    ]
+    ],
+
+    # ----
+
+    # Live progress and transfer statistics.
+    # If enabled, rsync output is processed on the fly: the console gets a compact progress line,
+    # and the transfer statistics are passed to the logs and to the run report.
+    # Possible values: "True" or "False".
+    "rsync_progress_enabled": True,
+
+    # Parameters that are added only if the live progress is enabled.
+    "rsync_progress_params": [
+        "--info=progress2", "--stats"
+    ],
+
+    # ----
+
+    # Deadline of a single rsync run, in seconds (e.g. stalled network target). The run exceeding it
+    # gets stopped and reported as failed. Value 0 means no deadline.
+    # NOTE: runs with the deadline are handled by the asyncio runner - their resource usage is not measured
+    # (except the wall time).
+    "rsync_timeout_secs": 0,
+
+    # ----
+
+    # Retries of the transient rsync failures, with the exponential back-off: the delay doubles after every
+    # attempt (starting from the initial value, up to the maximum). The repeated run transfers only what is missing.
+    # Exit codes (see: `man rsync`): 23 - partial transfer due to error, 24 - vanished source files,
+    # 30 - timeout in data send/receive, 35 - timeout waiting for daemon connection.
+    # Value 1 of the "rsync_retry_max_attempts" means no retries.
+    "rsync_retry_exit_codes": [23, 24, 30, 35],
+    "rsync_retry_max_attempts": 3,
+    "rsync_retry_initial_delay_secs": 10.0,
+    "rsync_retry_max_delay_secs": 300.0,
+
+    # Partially transferred files are kept in this directory (`--partial-dir`, relative to the target directory
+    # of the file), so the interrupted transfer of a large file is resumed by the next run. Blank value ("")
+    # disables it. Not used with `--inplace` (e.g. the "network" and "fuse_encfs" profiles) - rsync does not
+    # allow it there; the partial data is kept in the file itself then.
+    "rsync_partial_dir": ".eesync-partial",
+
+    # Run journal (sharded mode, backup only): the top-level directories completed by the shards are saved
+    # (checkpoints). If the backup gets interrupted or fails, the retry or the next run skips the completed
+    # directories that did not change (same total size, number of files and latest mtime, measured by the
+    # planning scan) - only the unfinished work is synced again.
+    # Journals older than the maximum age are discarded (full run). Removed once the backup succeeds.
+    # Possible values: "True" or "False".
+    "rsync_journal_enabled": True,
+    "rsync_journal_max_age_secs": 86400,
+
+    # ----
+
+    # Change manifest (backup only).
+    # EEsync keeps a list of the source files (size, modification time, inode) from the last successful backup.
+    # Next backup compares the source tree with it: rsync is skipped if nothing has changed,
+    # otherwise only the changed and deleted paths are passed to rsync (no full comparison of both trees).
+    # NOTE: changes made directly in the backup location (outside EEsync) are not detected in this mode.
+    # Possible values: "True" or "False".
+    "rsync_manifest_enabled": False,
+
+    # ----
+
+    # Content index of the backup: the list of the backed up entries, saved after every successful backup
+    # (in the state directory). Partial restore (RESTORE_PARTIAL action) finds the paths to restore in it,
+    # without walking the whole backup. Without the index, the backup tree gets scanned.
+    # NOTE: the index reuses the source tree scan of the change manifest, the dry-run plan or the deduplication.
+    # If none of them is enabled, the source tree is scanned once more after every backup - so it is disabled
+    # by default.
+    # Possible values: "True" or "False".
+    "rsync_content_index_enabled": False,
+
+    # ----
+
+    # Dry-run plan (backup only).
+    # The backup dry run saves the list of the reported changes (the plan), along with the fingerprint
+    # of the source tree. The next real backup replays the plan - only the listed paths are passed to rsync,
+    # without a second comparison of both trees. The plan is used once, and only if the source tree
+    # has not changed since the dry run and the plan is not older than "rsync_plan_max_age_secs".
+    # Otherwise the backup runs as usual.
+    # NOTE: changes made in the backup location between the dry run and the backup are not detected.
+    # Possible values: "True" or "False".
+    "rsync_plan_enabled": False,
+    "rsync_plan_max_age_secs": 3600,
+
+    # ----
+
+    # Watch mode (continuous backup) - the changes are collected into batches.
+    # A batch gets synced when there were no new changes for "rsync_watch_debounce_secs",
+    # or when "rsync_watch_max_delay_secs" passed since the first change in the batch.
+    "rsync_watch_debounce_secs": 2.0,
+    "rsync_watch_max_delay_secs": 30.0,
+
+    # ----
+
+    # Sharded mode - for big source trees. Value greater than 1 enables the mode:
+    # top-level subdirectories of the source get split into (size-balanced) groups,
+    # and every group is synced by a separate rsync process - all of them running at the same time.
+    # Value 1 means a single rsync process (default).
+    "rsync_shards": 1,
+
+    # Number of threads used for scanning the source tree (sharded mode only).
+    "rsync_shards_scan_workers": 8
+}
+
+run_history = {
+    # Run history - every sync run (entry, action, duration, transfer statistics, exit code) is recorded
+    # in a local SQLite database. See the report: `./eesync.py --history-report`.
+    # Possible values: "True" or "False".
+    "enabled": True,
+
+    # Database path. Blank value ("") means `SavedState/run_history.sqlite`.
+    "database_path": "",
+
+    # Report: number of the latest runs listed for every entry and action.
+    "report_runs": 10,
+
+    # Slow run detection: the run duration is compared with the preceding successful runs (the baseline):
+    # "baseline_runs" - maximum number of the runs in the baseline,
+    # "baseline_min_runs" - no detection until the baseline has this many runs,
+    # "slowdown_z_score" - the run is marked as slow if its duration is higher than the baseline mean
+    # by more than this many standard deviations.
+    "baseline_runs": 20,
+    "baseline_min_runs": 5,
+    "slowdown_z_score": 2.0
+}
+
+metrics = {
+    # Metrics export for Prometheus (node_exporter textfile collector).
+    # After every run, the `eesync_<entry ID>.prom` file is (atomically) rewritten with the metrics of the entry:
+    # last run and last success time (per action), duration, exit code, transferred bytes and files, deleted files,
+    # rsync CPU time and storage I/O, phase durations (scan, rsync, dedup, ...), EncFS mount and unmount latency.
+    # The last success times are kept across the runs. Watch mode is not exported.
+    # Possible values: "True" or "False".
+    "enabled": False,
+
+    # Directory of the `.prom` files - the `--collector.textfile.directory` of node_exporter,
+    # e.g. "/var/lib/node_exporter/textfile_collector". Blank value ("") means `SavedState/metrics`.
+    "textfile_dir": ""
+}
+
+snapshots = {
+    # Snapshot mode - enabled per config entry ("snapshots_enabled" field in the config file).
+    # Every backup is saved into a new, timestamped directory inside the backup target
+    # (e.g. "2024-01-31_12-34-56"). Unchanged files are hard links to the previous snapshot (rsync `--link-dest`),
+    # so every snapshot is a complete copy, but only the changed files take the space.
+    # NOTE: the backup target must support hard links (e.g. not FAT).
+    # NOTE: the change manifest and the dry-run plan ("sync_rsync" settings) are not used in this mode.
+
+    # Retention - old snapshots are removed in the background, after every successful backup.
+    # Kept: the latest "keep_last" snapshots, the latest snapshot of each of the last "keep_daily" days
+    # and of each of the last "keep_weekly" weeks (days and weeks that have any snapshots).
+    # The latest snapshot is always kept.
+    "keep_last": 3,
+    "keep_daily": 7,
+    "keep_weekly": 4
+}
+
+dedup = {
+    # Duplicate detection (backup only).
+    # Before the backup, the source files with identical content are found (grouped by size, then hashed -
+    # see the `verify` section for the hashing settings). Only one copy of every group is transferred,
+    # the other copies are hard links to it in the backup. The metadata of the copies (permissions, owner,
+    # modification time) is saved in the backup (".eesync-dedup.json" file), so the restore brings back
+    # independent files with their own metadata.
+    # NOTE: the backup target must support hard links (e.g. not FAT, EncFS without "external IV chaining").
+    # The copies are transferred in full if linking fails. Do not add `-H` (`--hard-links`) to the rsync parameters.
+    # Possible values: "True" or "False".
+    "enabled": False,
+
+    # Only the files of at least this size (KiB) are checked.
+    "min_size_kb": 1024
+}
+
+verify = {
+    # Verification (VERIFY action): the files of the source and the backup are compared by their checksums.
+    # Reported: mismatches (content, type or symlink target), files missing in the backup, and extra files
+    # (present in the backup only). Works through the EncFS decrypted directory for the encrypted entries.
+
+    # Number of the hashing processes. Value 0 means the number of CPUs.
+    "workers": 0,
+
+    # Hash algorithm (any of the `hashlib` algorithms).
+    "hash_algorithm": "blake2b",
+
+    # Hash cache: file hashes are kept with the file identity (device, inode, size, modification time),
+    # so unchanged files are not hashed again. On FUSE file systems (e.g. EncFS) the path is used
+    # instead of the inode, as the inode numbers are not stable there.
+    # NOTE: the cache trusts the size and modification time - corruption that keeps both is only detected
+    # with the cache disabled.
+    # Possible values: "True" or "False".
+    "cache_enabled": True,
+
+    # Path to the cache database. Empty value means the default location (in the state directory).
+    "cache_path": "",
+
+    # Maximum number of the listed paths of every kind in the console report (the log has the full lists).
+    "report_max_paths": 20
+}
+
+crypt_encfs = {
+    # EncFS settings and parameters.
+
+    # Extra parameters that are provided for the encfs mount command.
+    # For the unattended (batch) runs you may want to provide the password non-interactively,
+    # e.g. with: "--extpass=/path/to/password/program" (see: `man encfs`).
+    "encfs_mount_params": [],
+
+    # Before the unmount, EEsync waits until no process uses the decrypted directory.
+    # The check is repeated with growing intervals (starting from the value below, up to 2 seconds),
+    # but no longer than the timeout. The unmount itself is also retried within the same timeout.
+    "unmount_busy_timeout_secs": 60.0,
+    "unmount_poll_interval_secs": 0.1
+}
+
+batch = {
+    # Batch (non-interactive) mode settings. See: `./eesync.py --help`.
+
+    # Maximum number of entries processed at the same time.
+    "max_workers": 4,
+
+    # Maximum number of entries processed at the same time on a single target device (disk).
+    # Value 1 means that the entries sharing the same target disk are processed one after another.
+    "max_jobs_per_device": 1
 }
@@ -7,6 +7,10 @@ class BackupAction(Enum):
     BACKUP_DRY = 2
     RESTORE = 3
     RESTORE_DRY = 4
+    WATCH = 5
+    RESTORE_PARTIAL = 6
+    RESTORE_PARTIAL_DRY = 7
+    VERIFY = 8
 
     @classmethod
     def describe_action(cls, action: "BackupAction"):
@@ -19,5 +23,13 @@ class BackupAction(Enum):
                 return "Restore from the backup"
             case cls.RESTORE_DRY.value:
                 return "Restore from the backup - dry run mode (only list the files)"
+            case cls.WATCH.value:
+                return "Continuous backup - watch the data directory and sync the changes (stop with Ctrl+C)"
+            case cls.RESTORE_PARTIAL.value:
+                return "Restore the selected paths only (glob patterns) from the backup"
+            case cls.RESTORE_PARTIAL_DRY.value:
+                return "Restore the selected paths only - dry run mode (only list the files)"
+            case cls.VERIFY.value:
+                return "Verify the backup - compare the files with the data directory (checksums)"
             case _:
                 raise Exception(f"Undefined value for unmatched action: {action.name}!")
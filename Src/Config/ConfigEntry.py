@@ -1,3 +1,4 @@
+import hashlib
 import json
 
 from Src.Config.ConfigVersion import ConfigVersion
@@ -19,6 +20,17 @@ class ConfigEntry:
         self.encfs_enabled: bool = False
         self.encfs_encryption_dir: str = ''
         self.encfs_decryption_dir: str = ''
+        self.rsync_profile: str = ''
+        self.snapshots_enabled: bool = False
+
+    def get_entry_id(self) -> str:
+        """
+        Returns a short, stable identifier of the entry (based on the backup locations).
+        Useful for naming the per-entry files (logs, state, etc).
+        """
+        id_source = '\n'.join([self.backup_source_dir, self.backup_target_dir,
+                               self.encfs_encryption_dir, self.encfs_decryption_dir])
+        return hashlib.sha1(id_source.encode()).hexdigest()[:12]
 
     def to_json(self) -> str:
         """
@@ -60,6 +72,8 @@ class ConfigEntry:
             # optional fields
             self.encfs_encryption_dir = read_json_field('encfs_encryption_dir', True)
             self.encfs_decryption_dir = read_json_field('encfs_decryption_dir', True)
+            self.rsync_profile = read_json_field('rsync_profile', True) or ''
+            self.snapshots_enabled = bool(read_json_field('snapshots_enabled', True))
         except KeyError:
             return False
 
@@ -85,4 +99,10 @@ class ConfigEntry:
                 summarize_line("EncFS: Decrypted (access) data directory", self.encfs_decryption_dir)
             ])
 
+        if self.rsync_profile:
+            summary += summarize_line("Rsync parameters profile", self.rsync_profile)
+
+        if self.snapshots_enabled:
+            summary += summarize_line("Snapshots (hard-linked, timestamped backups)", str(self.snapshots_enabled))
+
         return summary
@@ -1,26 +1,33 @@
+import json
 import os
 import re
 from datetime import datetime
 
+import GeneralSettings
 from Src.Config.ConfigEntry import ConfigEntry
+from Src.Config.ConfigStoreSqlite import ConfigStoreSqlite
 from Src.Config.ConfigVersion import ConfigVersion
+from Src.IO.FileSystem import FileSystem
 from Src.IO.UserInputConsole import UserInputConsole
 
 
 class ConfigManager:
     """
-    Config files provider.
+    Config files provider (one JSON file per entry, or the SQLite store - see: GeneralSettings).
     """
 
     config_directory: str
     """config files location."""
 
     config_list: list
-    """matched configs - file names."""
+    """matched configs - menu fields (see: search_config_entries())."""
 
     selected_entry: ConfigEntry
     """current entry to work with."""
 
+    config_store: ConfigStoreSqlite | None
+    """SQLite config store - if selected in the settings (None for the config files backend)."""
+
     def __init__(self):
         """
         Initialize the class.
@@ -32,6 +39,23 @@ class ConfigManager:
         if not os.path.isdir(self.config_directory):
             raise SystemExit("Wrong config directory! Not a directory: " + self.config_directory)
 
+        match GeneralSettings.config_store["backend"]:
+            case "files":
+                self.config_store = None
+            case "sqlite":
+                self.config_store = ConfigStoreSqlite(self.get_sqlite_path())
+            case backend:
+                raise SystemExit(f"Error! Wrong config store backend: {backend}")
+
+    @classmethod
+    def get_sqlite_path(cls) -> str:
+        """
+        Returns the SQLite config store path.
+        """
+        if GeneralSettings.config_store["sqlite_path"] != "":
+            return GeneralSettings.config_store["sqlite_path"]
+        return cls.get_config_directory() + "/config_store.sqlite"
+
     @classmethod
     def get_config_directory(cls):
         """
@@ -42,50 +66,190 @@ class ConfigManager:
 
     def search_config_entries(self):
         """
-        Search for the saved configurations.
+        Search for the saved configurations.\n
+        Only the menu fields are read - from the index cache, if the file did not change (same mtime and size).
+        Use get_config_entry() to load the full entry.
         """
         self.config_list.clear()
+        if self.config_store:
+            self.config_list += [self.__gen_store_item(*row) for row in self.config_store.list_entries()]
+            return
+
+        config_index = self.__load_index()
+        index_updated = False
+
         config_number = 0
         for file_name in sorted(os.listdir(self.config_directory)):
             if self.config_match_regex.match(file_name):
                 config_number += 1
 
                 file_path = self.config_directory + '/' + file_name
+                file_stat = os.stat(file_path)
 
-                with open(file_path, 'r') as file:
-                    file_content_lines = file.readlines()
-                    file_content = ''.join(file_content_lines)
-
-                loaded_entry = ConfigEntry()
-                if not loaded_entry.from_json(file_content):
-                    raise SystemExit('Failed to load data from config! Failed on file: ' + file_path)
+                index_item = config_index.get(file_name)
+                if not index_item or index_item['mtime_ns'] != file_stat.st_mtime_ns \
+                        or index_item['size'] != file_stat.st_size:
+                    index_item = self.__gen_index_item(self.__load_entry(file_path), file_stat)
+                    config_index[file_name] = index_item
+                    index_updated = True
 
                 self.config_list.append({
                     "config_number": config_number,
                     "file_name": file_name,
                     "file_path": file_path,
-                    "file_content": file_content,
-                    "general_name": loaded_entry.general_name,
-                    "config_object": loaded_entry
+                    "general_name": index_item['general_name']
                 })
 
+        # drop the removed files from the index
+        listed_files = [config_item['file_name'] for config_item in self.config_list]
+        for file_name in [file_name for file_name in config_index if file_name not in listed_files]:
+            del config_index[file_name]
+            index_updated = True
+
+        if index_updated:
+            self.__save_index(config_index)
+
+    def get_config_entry(self, config_item: dict) -> ConfigEntry:
+        """
+        Returns the full ConfigEntry for the item of the config list. The entry is loaded on the first call.
+        :param config_item: Item of the `config_list`.
+        """
+        if 'config_object' not in config_item:
+            if self.config_store:
+                config_item['config_object'] = self.config_store.get_entry(config_item['config_number'])
+            else:
+                config_item['config_object'] = self.__load_entry(config_item['file_path'])
+        return config_item['config_object']
+
+    def get_config_item(self, config_number: int) -> dict | None:
+        """
+        Returns the item of the config list by its number (None if not found).
+        """
+        for config_item in self.config_list:
+            if config_item['config_number'] == config_number:
+                return config_item
+        return None
+
+    def find_config_items(self, selector: str) -> list:
+        """
+        Finds the config items by number or by name.
+        Uses the indexed lookup of the SQLite store, or the config list (search_config_entries() required).
+        """
+        if self.config_store:
+            return [self.__gen_store_item(*row) for row in self.config_store.find_entries(selector)]
+        return [config_item for config_item in self.config_list
+                if str(config_item['config_number']) == selector or config_item['general_name'] == selector]
+
+    @staticmethod
+    def __gen_store_item(config_number: int, general_name: str) -> dict:
+        """
+        Prepares the config list item for the SQLite store entry.
+        """
+        return {
+            "config_number": config_number,
+            "file_name": None,
+            "file_path": None,
+            "general_name": general_name
+        }
+
+    @staticmethod
+    def __load_entry(file_path: str) -> ConfigEntry:
+        """
+        Loads the ConfigEntry from the file.
+        """
+        with open(file_path, 'r') as file:
+            file_content = file.read()
+
+        loaded_entry = ConfigEntry()
+        if not loaded_entry.from_json(file_content):
+            raise SystemExit('Failed to load data from config! Failed on file: ' + file_path)
+        return loaded_entry
+
+    @staticmethod
+    def __gen_index_item(entry: ConfigEntry, file_stat: os.stat_result) -> dict:
+        """
+        Prepares the index item: menu fields of the entry and the file's mtime and size.
+        """
+        return {
+            "mtime_ns": file_stat.st_mtime_ns,
+            "size": file_stat.st_size,
+            "general_name": entry.general_name
+        }
+
+    @staticmethod
+    def __get_index_path() -> str:
+        """
+        Returns the path of the config index cache.
+        """
+        return FileSystem.get_state_directory() + '/config_index.json'
+
+    def __load_index(self) -> dict:
+        """
+        Loads the config index cache. Broken or outdated cache is ignored (rebuilt).
+        :return: dict of file name -> index item.
+        """
+        try:
+            with open(self.__get_index_path(), 'r') as file:
+                index_content = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if index_content.get('config_directory') != self.config_directory \
+                or index_content.get('config_version') != ConfigVersion.config_version:
+            return {}
+        return index_content.get('entries', {})
+
+    def __save_index(self, config_index: dict):
+        """
+        Saves the config index cache (atomically - via a temporary file).
+        """
+        index_path = self.__get_index_path()
+        with open(index_path + '.tmp', 'w') as file:
+            json.dump({
+                "config_directory": self.config_directory,
+                "config_version": ConfigVersion.config_version,
+                "entries": config_index
+            }, file)
+        os.replace(index_path + '.tmp', index_path)
+
     def save_config_entry(self, entry: ConfigEntry):
         """
         Saves the ConfigEntry.
         """
+        if self.config_store:
+            self.config_store.save_entries([entry])
+            return
+
+        save_file_name = self.__write_config_file(entry, self.config_directory,
+                                                  datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+        save_path = str(self.config_directory + '/' + save_file_name)
+
+        # update the index cache
+        config_index = self.__load_index()
+        config_index[save_file_name] = self.__gen_index_item(entry, os.stat(save_path))
+        self.__save_index(config_index)
+
+    @staticmethod
+    def __write_config_file(entry: ConfigEntry, directory: str, file_name_prefix: str) -> str:
+        """
+        Writes the entry to a new config file.
+        :param entry: The entry to save.
+        :param directory: Target directory.
+        :param file_name_prefix: Prefix of the file name (followed by the entry name).
+        :return: The file name.
+        """
         # remove non-ASCII characters and spaces from the name
         filtered_name = ''
         for character in entry.general_name:
             if ord(character) < 128 and character != ' ':
                 filtered_name += character
 
-        save_file_name = str(datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        save_file_name = str(file_name_prefix
                              + '_' + filtered_name
                              + '.' + ConfigVersion.config_files_extension
                              )[:255]
 
         # prepare the location
-        save_path = str(self.config_directory + '/' + save_file_name)
+        save_path = str(directory + '/' + save_file_name)
 
         if os.path.isfile(save_path):
             raise SystemExit("File exists! Cannot save to: " + save_path)
@@ -94,6 +258,39 @@ class ConfigManager:
         with open(save_path, 'w') as file:
             file.write(entry.to_json())
 
+        return save_file_name
+
+    def import_config_files(self, source_directory: str) -> int:
+        """
+        Imports the config files (JSON format) into the SQLite store - in a single transaction.
+        Entries that are already stored (identical content) are skipped.
+        :param source_directory: Directory with the config files.
+        :return: Number of the imported entries.
+        """
+        if not self.config_store:
+            raise SystemExit("Error! Import requires the SQLite config store backend (see: GeneralSettings).")
+
+        entries = [self.__load_entry(source_directory + '/' + file_name)
+                   for file_name in sorted(os.listdir(source_directory))
+                   if self.config_match_regex.match(file_name)]
+        return len(self.config_store.save_entries(entries, skip_existing=True))
+
+    def export_config_files(self, target_directory: str) -> int:
+        """
+        Exports all the entries of the SQLite store to the config files (JSON format).
+        :param target_directory: Directory for the config files.
+        :return: Number of the exported entries.
+        """
+        if not self.config_store:
+            raise SystemExit("Error! Export requires the SQLite config store backend (see: GeneralSettings).")
+
+        exported_count = 0
+        for config_number, _ in self.config_store.list_entries():
+            self.__write_config_file(self.config_store.get_entry(config_number), target_directory,
+                                     f"{config_number:05d}")
+            exported_count += 1
+        return exported_count
+
     @staticmethod
     def new_entry_from_user() -> ConfigEntry:
         """
@@ -123,6 +320,9 @@ class ConfigManager:
         else:
             new_entry.encfs_enabled = False
 
+        print("Would you like to keep the backup history (timestamped snapshots, see: `snapshots` settings)? [y/n] ")
+        new_entry.snapshots_enabled = UserInputConsole.read_true_or_false()
+
         print("\nPlease review: \n" + new_entry.string_summarize()
               + "\n\nIs above correct?")
         if not UserInputConsole.read_true_or_false():
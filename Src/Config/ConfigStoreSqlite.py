@@ -0,0 +1,125 @@
+import sqlite3
+from datetime import datetime
+
+from Src.Config.ConfigEntry import ConfigEntry
+from Src.Config.ConfigVersion import ConfigVersion
+
+
+class ConfigStoreSqlite:
+    """
+    Single-file SQLite config store - an alternative to one JSON file per entry.
+    Entries are kept as JSON (the same format as the config files), with indexed number and name columns.
+    """
+
+    migrations: list = [
+        (1.0, [
+            "CREATE TABLE config_entries ("
+            " config_number INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " general_name TEXT NOT NULL,"
+            " config_version REAL NOT NULL,"
+            " entry_json TEXT NOT NULL,"
+            " saved_at TEXT NOT NULL)",
+            "CREATE INDEX config_entries_general_name ON config_entries (general_name)"
+        ]),
+    ]
+    """
+    Schema (and data) migrations: list of (config version, list of SQL statements or callables).
+    Callables receive the connection - useful for converting the stored JSON when the config format changes.
+    All the migrations newer than the stored version (up to the `ConfigVersion.config_version`) are applied.
+    """
+
+    def __init__(self, database_path: str):
+        """
+        Opens the store and applies the pending migrations.
+        :param database_path: Path to the SQLite database file (created if needed).
+        """
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        self.__migrate()
+
+    def close(self):
+        """
+        Closes the store.
+        """
+        self.connection.close()
+
+    def __migrate(self):
+        """
+        Applies the pending migrations (in a single transaction).
+        """
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS store_meta (meta_key TEXT PRIMARY KEY, meta_value)")
+            stored_row = self.connection.execute(
+                "SELECT meta_value FROM store_meta WHERE meta_key = 'config_version'").fetchone()
+            stored_version = float(stored_row[0]) if stored_row else 0.0
+
+            if stored_version > ConfigVersion.config_version:
+                raise SystemExit(f"Error! Config store {self.database_path} is newer ({stored_version}) "
+                                 + f"than supported ({ConfigVersion.config_version})!")
+
+            for migration_version, migration_steps in self.migrations:
+                if stored_version < migration_version <= ConfigVersion.config_version:
+                    for migration_step in migration_steps:
+                        if callable(migration_step):
+                            migration_step(self.connection)
+                        else:
+                            self.connection.execute(migration_step)
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO store_meta (meta_key, meta_value) VALUES ('config_version', ?)",
+                (ConfigVersion.config_version,))
+
+    def list_entries(self) -> list:
+        """
+        Returns the menu fields of all the entries.
+        :return: List of tuples: (config number, general name).
+        """
+        return self.connection.execute(
+            "SELECT config_number, general_name FROM config_entries ORDER BY config_number").fetchall()
+
+    def find_entries(self, selector: str) -> list:
+        """
+        Finds the entries by number or by name (indexed lookups).
+        :return: List of tuples: (config number, general name).
+        """
+        query = "SELECT config_number, general_name FROM config_entries WHERE general_name = ?"
+        parameters = [selector]
+        if selector.isdigit():
+            query += " OR config_number = ?"
+            parameters.append(int(selector))
+        return self.connection.execute(query + " ORDER BY config_number", parameters).fetchall()
+
+    def get_entry(self, config_number: int) -> ConfigEntry:
+        """
+        Loads the entry by its number.
+        """
+        row = self.connection.execute(
+            "SELECT entry_json FROM config_entries WHERE config_number = ?", (config_number,)).fetchone()
+        if not row:
+            raise SystemExit(f"Error! Config entry not found: {config_number}")
+
+        loaded_entry = ConfigEntry()
+        if not loaded_entry.from_json(row[0]):
+            raise SystemExit(f"Failed to load data from config! Failed on entry: {config_number}")
+        return loaded_entry
+
+    def save_entries(self, entries: list, skip_existing: bool = False) -> list:
+        """
+        Saves the new entries - all of them or none (single transaction).
+        :param entries: List of ConfigEntry objects.
+        :param skip_existing: Skip the entries that are already stored (identical content).
+        :return: List of the assigned config numbers (of the saved entries).
+        """
+        saved_at = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        config_numbers = []
+        with self.connection:
+            for entry in entries:
+                if skip_existing and self.connection.execute(
+                        "SELECT 1 FROM config_entries WHERE entry_json = ?", (entry.to_json(),)).fetchone():
+                    continue
+                cursor = self.connection.execute(
+                    "INSERT INTO config_entries (general_name, config_version, entry_json, saved_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (entry.general_name, entry.config_version, entry.to_json(), saved_at))
+                config_numbers.append(cursor.lastrowid)
+        return config_numbers
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
+import argparse
+
 from Src.Common.BackupAction import BackupAction
 from Src.Config.ConfigEntry import ConfigEntry
 from Src.Config.ConfigManager import ConfigManager
 from Src.IO.FileSystem import FileSystem
+from Src.IO.LogRotation import LogRotation
 from Src.IO.Logger import Logger
+from Src.IO.RunHistory import RunHistory
+from Src.IO.SnapshotStore import SnapshotStore
 from Src.IO.UserInputConsole import UserInputConsole
+from Src.Service.BatchScheduler import BatchScheduler
 from Src.Service.CryptProvider import CryptProvider
 from Src.Service.SyncProvider import SyncProvider
 
@@ -17,36 +23,95 @@ class EESync:
     crypt_service = CryptProvider()
     cm_object = None  # postpone initialization
 
-    def start(self):
+    def start(self, argv: list = None):
         """
         Starts the main process.
+        :param argv: Command line arguments. Taken from `sys.argv` if not provided.
         """
+        arguments = self.parse_arguments(argv)
+        if arguments.batch:
+            UserInputConsole.interactive = False
+        SyncProvider.restore_snapshot = arguments.snapshot
+        SyncProvider.restore_patterns = arguments.restore_path
+
         Logger.init()
         self.init_file_system()
         self.cm_object = ConfigManager()
 
         Logger.log(f"EESync {self.__version} started.")
+        LogRotation.start(Logger.get_log_path_dir(), Logger.get_start_time())
 
         print(f"~~ EESync {self.__version} ~~")
-        self.sync_service.version_check()
-        self.crypt_service.version_check()
+        if not (arguments.history_report or arguments.config_import or arguments.config_export):
+            # binaries are resolved on the first use (cached versions - no probe processes on repeated runs)
+            self.sync_service.version_check()
+            self.crypt_service.version_check()
         print()
 
-        self.interactive_user_menu()
+        if arguments.history_report:
+            print(RunHistory.gen_report())
+            exit_status = 0
+        elif arguments.config_import:
+            print(f"Imported entries: {self.cm_object.import_config_files(arguments.config_import)}")
+            exit_status = 0
+        elif arguments.config_export:
+            print(f"Exported entries: {self.cm_object.export_config_files(arguments.config_export)}")
+            exit_status = 0
+        elif arguments.batch:
+            exit_status = self.batch_run(arguments)
+        else:
+            self.interactive_user_menu()
+            exit_status = 0
 
         print("Cleanup actions...")
+        SnapshotStore.wait()
         Logger.cleanup()
 
         Logger.log("EESync finished.")
         print("EESync finished.")
 
+        if exit_status:
+            raise SystemExit(exit_status)
+
+    @classmethod
+    def parse_arguments(cls, argv: list = None) -> argparse.Namespace:
+        """
+        Parses the command line arguments.
+        """
+        parser = argparse.ArgumentParser(
+            description=f"EESync {cls.__version} - easy solution for encrypted backups. "
+                        + "Runs the interactive menu by default.")
+        parser.add_argument("--batch", action="store_true",
+                            help="non-interactive mode: run the action for the selected entries concurrently")
+        parser.add_argument("--entries", default="all",
+                            help="batch mode: comma separated config numbers or names, 'all' by default")
+        parser.add_argument("--action", default=BackupAction.BACKUP.name,
+                            help="batch mode: the action to run, BACKUP by default. Comma separated list runs "
+                                 + "the actions one after another (e.g. BACKUP_DRY,BACKUP). Available actions: "
+                                 + ', '.join(action.name for action in BackupAction))
+        parser.add_argument("--jobs", type=int, default=None,
+                            help="batch mode: maximum number of concurrent entries (overrides the GeneralSettings)")
+        parser.add_argument("--snapshot", metavar="NAME",
+                            help="restore from the given snapshot (entries with snapshots), the latest one "
+                                 + "by default in batch mode")
+        parser.add_argument("--restore-path", metavar="GLOB", action="append",
+                            help="partial restore: path to restore, relative to the data directory (glob patterns "
+                                 + "allowed, a directory is restored with its contents). Can be given multiple times")
+        parser.add_argument("--config-import", metavar="DIR",
+                            help="import the config files from the directory into the SQLite config store")
+        parser.add_argument("--config-export", metavar="DIR",
+                            help="export the SQLite config store entries to the config files in the directory")
+        parser.add_argument("--history-report", action="store_true",
+                            help="print the run history report: the latest runs, duration trends and slow runs")
+        return parser.parse_args(argv)
+
     @classmethod
     def init_file_system(cls):
         """
         Inits and creates (if needed) directories required by the application (logs dir, config dir, etc).
         """
-        FileSystem.require_created_directory(Logger.get_log_path_dir())
-        FileSystem.require_created_directory(ConfigManager.get_config_directory())
+        FileSystem.require_created_directory(Logger.get_log_path_dir(), UserInputConsole.interactive)
+        FileSystem.require_created_directory(ConfigManager.get_config_directory(), UserInputConsole.interactive)
 
     def interactive_user_menu(self):
         """
@@ -72,9 +137,11 @@ class EESync:
         match user_input:
             case number if user_input.isdigit():
                 print("Selected entry no. " + number + " ...")
-                selected_config = self.cm_object.config_list[int(number) - 1]
-                self.process_entry(selected_config['config_object'])
-                pass
+                selected_config = self.cm_object.get_config_item(int(number))
+                if not selected_config:
+                    print("Entry not found!")
+                    return self.interactive_user_menu()
+                self.process_entry(self.cm_object.get_config_entry(selected_config))
             case 'n':
                 print("Creating new config.")
                 new_config_entry = self.cm_object.new_entry_from_user()
@@ -84,6 +151,46 @@ class EESync:
                 print("Wrong command!")
                 raise SystemExit("Not supported mode!")
 
+    def batch_run(self, arguments: argparse.Namespace) -> int:
+        """
+        Handles the non-interactive (batch) mode.
+        :return: Aggregated exit status.
+        """
+        selected_configs = self.select_config_entries(arguments.entries)
+        if not selected_configs:
+            raise SystemExit("Error! No config entries selected for the batch run.")
+        for config_item in selected_configs:
+            self.cm_object.get_config_entry(config_item)
+
+        try:
+            actions = [BackupAction[action_name.strip()] for action_name in arguments.action.split(',')]
+        except KeyError as error:
+            raise SystemExit(f"Error! Unknown action: {error}")
+
+        print(f"Batch mode: running {arguments.action} for {len(selected_configs)} entries...")
+        return BatchScheduler(actions, arguments.jobs).run(selected_configs)
+
+    def select_config_entries(self, selection: str) -> list:
+        """
+        Selects the config entries by numbers or names.
+        :param selection: Comma separated config numbers or names, or 'all'.
+        :return: Selected items of the config list.
+        """
+        if selection == 'all':
+            self.cm_object.search_config_entries()
+            return list(self.cm_object.config_list)
+
+        if not self.cm_object.config_store:
+            self.cm_object.search_config_entries()
+
+        selected_configs = []
+        for selector in [item.strip() for item in selection.split(',') if item.strip()]:
+            matched = self.cm_object.find_config_items(selector)
+            if not matched:
+                raise SystemExit(f"Error! Config entry not found: {selector}")
+            selected_configs += [config_item for config_item in matched if config_item not in selected_configs]
+        return selected_configs
+
     def process_entry(self, entry: ConfigEntry):
         """
         Handles the interactive user menu - selected entry menu.
@@ -0,0 +1,81 @@
+import fnmatch
+import os
+import re
+
+from Src.IO.FileManifest import FileManifest
+from Src.IO.FileSystem import FileSystem
+
+
+class ContentIndex:
+    """
+    Content index of the backup: the backed up entries (FileManifest format), saved after every successful backup.
+    Partial restore resolves the path patterns against it - without walking the backup tree.
+    """
+
+    @staticmethod
+    def get_index_path(entry_id: str, snapshot_name: str = None) -> str:
+        """
+        Returns the index path of the entry (or of the entry snapshot).
+        """
+        if snapshot_name:
+            return FileSystem.get_state_directory(f"indexes/{entry_id}") + f"/{snapshot_name}.index"
+        return FileSystem.get_state_directory("indexes") + f"/{entry_id}.index"
+
+    @staticmethod
+    def invalidate(index_path: str):
+        """
+        Removes the index (the backup is about to change - the index would be stale until it is saved again).
+        """
+        try:
+            os.remove(index_path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def remove_stale(cls, entry_id: str, snapshots: list):
+        """
+        Removes the indexes of the snapshots that no longer exist.
+        :param snapshots: Names of the existing snapshots.
+        """
+        index_dir = os.path.dirname(cls.get_index_path(entry_id, "-"))
+        for file_name in os.listdir(index_dir):
+            if file_name.endswith(".index") and file_name[:-len(".index")] not in snapshots:
+                os.remove(os.path.join(index_dir, file_name))
+
+    @staticmethod
+    def compile_patterns(patterns: list) -> re.Pattern:
+        """
+        Compiles the path patterns (globs, relative to the backup root) into a single regex.
+        A pattern matching a directory matches its whole subtree too.
+        """
+        translated = []
+        for pattern in patterns:
+            pattern = pattern.strip().strip('/')
+            if pattern:
+                translated += [fnmatch.translate(pattern), fnmatch.translate(pattern + "/*")]
+        if not translated:
+            raise SystemExit("Error! No paths to restore given.")
+        return re.compile('|'.join(translated))
+
+    @classmethod
+    def resolve(cls, patterns: list, paths) -> list:
+        """
+        Finds the paths matching the patterns.
+        :param patterns: Path patterns (see: compile_patterns()).
+        :param paths: Iterable of the relative paths, e.g. the index paths (`FileManifest.items()`).
+        :return: Sorted list of the matching paths.
+        """
+        patterns_regex = cls.compile_patterns(patterns)
+        return sorted(path for path in paths if patterns_regex.match(path))
+
+    @classmethod
+    def resolve_in_index(cls, patterns: list, index_path: str) -> list:
+        """
+        Finds the indexed paths matching the patterns.
+        :return: Sorted list of the matching paths.
+        """
+        index = FileManifest(index_path)
+        try:
+            return cls.resolve(patterns, (path for path, _ in index.items()))
+        finally:
+            index.close()
@@ -0,0 +1,209 @@
+import hashlib
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FileManifest:
+    """
+    Compact, memory-mapped manifest of a directory tree: (path, size, mtime, inode, kind) per entry.\n
+    File format: header, fixed-size records sorted by the path hash (binary search), then the path strings.
+    """
+
+    KIND_FILE: int = 0
+    KIND_DIR: int = 1
+    KIND_SYMLINK: int = 2
+    KIND_OTHER: int = 3
+
+    __magic: bytes = b'EESM'
+    __format_version: int = 1
+    __header = struct.Struct('<4sIQ')
+    """Header: magic, format version, number of records."""
+    __record = struct.Struct('<QqqQQII')
+    """Record: path hash, size, mtime (ns), inode, path offset, path length, kind."""
+
+    def __init__(self, manifest_path: str):
+        """
+        Opens (memory-maps) the manifest file.
+        :param manifest_path: Path to the manifest file.
+        """
+        self.manifest_path = manifest_path
+        with open(manifest_path, 'rb') as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, self.__count = self.__header.unpack_from(self.__data, 0)
+        if magic != self.__magic or format_version != self.__format_version:
+            self.close()
+            raise SystemExit(f"Error! Unsupported manifest file: {manifest_path}")
+        self.__paths_offset = self.__header.size + self.__count * self.__record.size
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def close(self):
+        """
+        Closes the memory-mapped file.
+        """
+        self.__data.close()
+
+    @staticmethod
+    def path_hash(path: str) -> int:
+        """
+        Returns the 64-bit hash of the path (records are sorted by this value).
+        """
+        return int.from_bytes(hashlib.blake2b(os.fsencode(path), digest_size=8).digest(), 'little')
+
+    def __read_record(self, index: int) -> tuple:
+        """
+        Reads the record: (path hash, path, (size, mtime_ns, inode, kind)).
+        """
+        path_hash, size, mtime_ns, inode, path_offset, path_length, kind = self.__record.unpack_from(
+            self.__data, self.__header.size + index * self.__record.size)
+        path_start = self.__paths_offset + path_offset
+        path = os.fsdecode(self.__data[path_start:path_start + path_length])
+        return path_hash, path, (size, mtime_ns, inode, kind)
+
+    def lookup(self, path: str) -> tuple | None:
+        """
+        Finds the entry by its path (binary search).
+        :return: Tuple (size, mtime_ns, inode, kind) or None if not found.
+        """
+        searched_hash = self.path_hash(path)
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            middle_hash = self.__record.unpack_from(self.__data, self.__header.size + middle * self.__record.size)[0]
+            if middle_hash < searched_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        # hash collisions - check all the records with the same hash
+        while low < self.__count:
+            record_hash, record_path, record_values = self.__read_record(low)
+            if record_hash != searched_hash:
+                break
+            if record_path == path:
+                return record_values
+            low += 1
+        return None
+
+    def items(self):
+        """
+        Iterates over all the entries: (path, (size, mtime_ns, inode, kind)).
+        """
+        for index in range(self.__count):
+            _, path, values = self.__read_record(index)
+            yield path, values
+
+    def diff(self, current_entries: dict) -> tuple:
+        """
+        Compares the manifest with the current state of the tree.
+        :param current_entries: Result of the `scan()`.
+        :return: Tuple: (sorted list of new or changed paths, sorted list of deleted paths).
+        """
+        changed_paths = []
+        for path, values in current_entries.items():
+            stored_values = self.lookup(path)
+            if stored_values is None or stored_values != values:
+                changed_paths.append(path)
+
+        deleted_paths = [path for path, _ in self.items() if path not in current_entries]
+        return sorted(changed_paths), sorted(deleted_paths)
+
+    @staticmethod
+    def fingerprint(entries: dict) -> str:
+        """
+        Returns the fingerprint of the scanned tree - changes when any entry is added, removed or modified
+        (size, modification time or inode).
+        :param entries: Result of the `scan()`.
+        """
+        tree_hash = hashlib.blake2b(digest_size=16)
+        for path in sorted(entries):
+            tree_hash.update(os.fsencode(path) + b'\0' + repr(entries[path]).encode() + b'\0')
+        return tree_hash.hexdigest()
+
+    @classmethod
+    def save(cls, manifest_path: str, entries: dict):
+        """
+        Writes the manifest file (atomically - via a temporary file).
+        :param manifest_path: Path to the manifest file.
+        :param entries: Result of the `scan()`.
+        """
+        records = sorted((cls.path_hash(path), path, values) for path, values in entries.items())
+
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(cls.__header.pack(cls.__magic, cls.__format_version, len(records)))
+            encoded_paths = []
+            path_offset = 0
+            for path_hash, path, (size, mtime_ns, inode, kind) in records:
+                encoded_path = os.fsencode(path)
+                file.write(cls.__record.pack(path_hash, size, mtime_ns, inode, path_offset, len(encoded_path), kind))
+                encoded_paths.append(encoded_path)
+                path_offset += len(encoded_path)
+            file.write(b''.join(encoded_paths))
+        os.replace(temp_path, manifest_path)
+
+    @classmethod
+    def scan(cls, root_dir: str, max_workers: int = 8) -> dict:
+        """
+        Scans the tree. Top-level subdirectories are scanned concurrently. Symlinks are not followed.
+        :param root_dir: The directory to scan.
+        :param max_workers: Number of scanning threads.
+        :return: dict of relative path -> (size, mtime_ns, inode, kind).
+        """
+        entries = {}
+        top_level_dirs = []
+        with os.scandir(root_dir) as dir_entries:
+            for dir_entry in dir_entries:
+                cls.__add_entry(entries, dir_entry, dir_entry.name)
+                if dir_entry.is_dir(follow_symlinks=False):
+                    top_level_dirs.append(dir_entry.name)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for subtree_entries in executor.map(lambda name: cls.__scan_subtree(root_dir, name), top_level_dirs):
+                entries.update(subtree_entries)
+        return entries
+
+    @classmethod
+    def __scan_subtree(cls, root_dir: str, relative_dir: str) -> dict:
+        """
+        Scans the subtree (single thread).
+        """
+        entries = {}
+        pending_dirs = [relative_dir]
+        while pending_dirs:
+            current_dir = pending_dirs.pop()
+            try:
+                with os.scandir(os.path.join(root_dir, current_dir)) as dir_entries:
+                    for dir_entry in dir_entries:
+                        relative_path = current_dir + '/' + dir_entry.name
+                        if cls.__add_entry(entries, dir_entry, relative_path) == cls.KIND_DIR:
+                            pending_dirs.append(relative_path)
+            except OSError:
+                pass
+        return entries
+
+    @classmethod
+    def __add_entry(cls, entries: dict, dir_entry: os.DirEntry, relative_path: str) -> int | None:
+        """
+        Adds the scanned entry to the dict.
+        :return: Kind of the entry, None if it could not be read.
+        """
+        try:
+            entry_stat = dir_entry.stat(follow_symlinks=False)
+        except OSError:
+            return None
+        if dir_entry.is_dir(follow_symlinks=False):
+            kind = cls.KIND_DIR
+        elif dir_entry.is_symlink():
+            kind = cls.KIND_SYMLINK
+        elif dir_entry.is_file(follow_symlinks=False):
+            kind = cls.KIND_FILE
+        else:
+            kind = cls.KIND_OTHER
+        size = entry_stat.st_size if kind != cls.KIND_DIR else 0
+        entries[relative_path] = (size, entry_stat.st_mtime_ns, entry_stat.st_ino, kind)
+        return kind
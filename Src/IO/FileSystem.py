@@ -1,4 +1,5 @@
 import os
+import re
 
 from Src.IO.Logger import Logger
 from Src.IO.UserInputConsole import UserInputConsole
@@ -9,6 +10,21 @@ class FileSystem:
     File System (OS) level methods.
     """
 
+    @classmethod
+    def get_state_directory(cls, sub_directory: str = '') -> str:
+        """
+        Returns the application state directory (internal data: manifests, caches, etc).
+        The directory gets created (without user confirmation) if needed.
+        :param sub_directory: Optional subdirectory of the state directory.
+        :return: str: state directory path.
+        """
+        state_directory = os.getcwd() + "/SavedState"
+        if sub_directory:
+            state_directory += '/' + sub_directory
+        if not os.path.isdir(state_directory):
+            os.makedirs(state_directory, exist_ok=True)
+        return state_directory
+
     @classmethod
     def require_created_directory(cls, directory_path: str, interactive: bool = True):
         """
@@ -49,3 +65,76 @@ class FileSystem:
         else:
             os.makedirs(directory_path)
             Logger.log("Created a new directory at: \n" + directory_path)
+
+    @classmethod
+    def is_path_in_use(cls, directory_path: str) -> bool:
+        """
+        Checks if any process uses the given directory (or anything inside it): as the working directory,
+        as the root directory, or by an open file descriptor. Based on the `/proc/<pid>/` entries.\n
+        Note: processes that we are not allowed to inspect (other users, without root access) are skipped.
+        :param directory_path: The path to check (e.g. a mount point).
+        :return: bool value, True if the path is in use.
+        """
+        real_path = os.path.realpath(directory_path)
+        path_prefix = real_path.rstrip('/') + '/'
+
+        def is_inside(link_path: str) -> bool:
+            try:
+                link_target = os.readlink(link_path)
+            except OSError:
+                return False
+            return link_target == real_path or link_target.startswith(path_prefix)
+
+        try:
+            process_dirs = [dir_entry.path for dir_entry in os.scandir('/proc') if dir_entry.name.isdigit()]
+        except OSError:
+            return False
+
+        for process_dir in process_dirs:
+            if is_inside(process_dir + '/cwd') or is_inside(process_dir + '/root'):
+                return True
+            try:
+                with os.scandir(process_dir + '/fd') as fd_entries:
+                    if any(is_inside(fd_entry.path) for fd_entry in fd_entries):
+                        return True
+            except OSError:
+                pass
+        return False
+
+    @classmethod
+    def get_mount_info(cls, path: str) -> dict:
+        """
+        Finds the mount that holds the given path. Based on the `/proc/self/mountinfo`.
+        :param path: The path to check (symlinks are resolved).
+        :return: dict: mount point, file system type and the mount source (e.g. device or network share).
+        """
+        real_path = os.path.realpath(path)
+        mount_info = {"mount_point": '/', "fs_type": "unknown", "source": ''}
+        try:
+            with open('/proc/self/mountinfo', 'r') as mountinfo_file:
+                mountinfo_lines = mountinfo_file.readlines()
+        except OSError:
+            return mount_info
+
+        for line in mountinfo_lines:
+            # e.g: `36 35 98:0 /mnt1 /mnt/parent rw,noatime master:1 - ext3 /dev/root rw,errors=continue`
+            mount_fields, _, fs_fields = line.partition(' - ')
+            mount_fields = mount_fields.split()
+            fs_fields = fs_fields.split()
+            if len(mount_fields) < 5 or len(fs_fields) < 2:
+                continue
+            mount_point = cls.__unescape_mountinfo(mount_fields[4])
+            if real_path != mount_point and not real_path.startswith(mount_point.rstrip('/') + '/'):
+                continue
+            # the longest matching mount point wins, the later one if stacked (mounted over)
+            if len(mount_point) >= len(mount_info['mount_point']):
+                mount_info = {"mount_point": mount_point, "fs_type": fs_fields[0],
+                              "source": cls.__unescape_mountinfo(fs_fields[1])}
+        return mount_info
+
+    @staticmethod
+    def __unescape_mountinfo(value: str) -> str:
+        """
+        Decodes the octal escapes of the mountinfo fields (space, tab, new line, backslash - e.g. `\\040`).
+        """
+        return re.sub(r'\\([0-7]{3})', lambda matched: chr(int(matched.group(1), 8)), value)
@@ -0,0 +1,74 @@
+import sqlite3
+
+import GeneralSettings
+from Src.IO.FileSystem import FileSystem
+
+
+class HashCache:
+    """
+    File hash cache (SQLite): hash per file identity - volume, file ID (inode or path), size and modification time.
+    Entries are kept per volume (hashed tree) and replaced after every run - only the files that still exist are kept.
+    """
+
+    schema: list = [
+        "CREATE TABLE IF NOT EXISTS file_hashes ("
+        " volume TEXT NOT NULL,"
+        " file_id TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " mtime_ns INTEGER NOT NULL,"
+        " algorithm TEXT NOT NULL,"
+        " digest TEXT NOT NULL,"
+        " PRIMARY KEY (volume, file_id, size, mtime_ns, algorithm))"
+    ]
+
+    @staticmethod
+    def get_database_path() -> str:
+        """
+        Returns the cache database path (from the settings, or the default one in the state directory).
+        """
+        return GeneralSettings.verify["cache_path"] or FileSystem.get_state_directory() + "/hash_cache.sqlite"
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        """
+        Opens the cache database (creates the schema if needed).
+        Concurrent writers (batch mode) wait for each other - up to 30 seconds.
+        """
+        connection = sqlite3.connect(cls.get_database_path(), timeout=30)
+        with connection:
+            for statement in cls.schema:
+                connection.execute(statement)
+        return connection
+
+    @classmethod
+    def load(cls, volume: str, algorithm: str) -> dict:
+        """
+        Loads the cached hashes of the volume.
+        :return: dict of (file ID, size, mtime_ns) -> digest.
+        """
+        connection = cls.connect()
+        try:
+            rows = connection.execute(
+                "SELECT file_id, size, mtime_ns, digest FROM file_hashes WHERE volume = ? AND algorithm = ?",
+                (volume, algorithm)).fetchall()
+        finally:
+            connection.close()
+        return {(file_id, size, mtime_ns): digest for file_id, size, mtime_ns, digest in rows}
+
+    @classmethod
+    def replace(cls, volume: str, algorithm: str, hashes: dict):
+        """
+        Replaces the cached hashes of the volume.
+        :param hashes: dict of (file ID, size, mtime_ns) -> digest.
+        """
+        connection = cls.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM file_hashes WHERE volume = ? AND algorithm = ?", (volume, algorithm))
+                connection.executemany(
+                    "INSERT INTO file_hashes (volume, file_id, size, mtime_ns, algorithm, digest)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    ((volume, file_id, size, mtime_ns, algorithm, digest)
+                     for (file_id, size, mtime_ns), digest in hashes.items()))
+        finally:
+            connection.close()
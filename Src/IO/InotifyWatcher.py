@@ -0,0 +1,172 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+
+class InotifyWatcher:
+    """
+    Recursive directory watcher based on Linux inotify (via ctypes, no extra dependencies).
+    Collects the changed paths (relative to the watched root) into debounced batches.
+    """
+
+    IN_MODIFY: int = 0x00000002
+    IN_ATTRIB: int = 0x00000004
+    IN_CLOSE_WRITE: int = 0x00000008
+    IN_MOVED_FROM: int = 0x00000040
+    IN_MOVED_TO: int = 0x00000080
+    IN_CREATE: int = 0x00000100
+    IN_DELETE: int = 0x00000200
+    IN_Q_OVERFLOW: int = 0x00004000
+    IN_IGNORED: int = 0x00008000
+    IN_ONLYDIR: int = 0x01000000
+    IN_ISDIR: int = 0x40000000
+    IN_NONBLOCK: int = 0o4000
+    IN_CLOEXEC: int = 0o2000000
+
+    watch_mask: int = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    """Events that we are interested in."""
+
+    __event = struct.Struct('iIII')
+    """Event header: watch descriptor, mask, cookie, name length."""
+
+    def __init__(self, root_dir: str):
+        """
+        Starts watching the directory tree.
+        :param root_dir: The directory to watch (recursively).
+        """
+        self.root_dir = root_dir.rstrip('/') or '/'
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.__fd = self.__libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.__fd < 0:
+            raise SystemExit(f"Error! inotify is not available: {os.strerror(ctypes.get_errno())}")
+
+        self.__watches: dict = {}
+        """Watch descriptor -> relative directory path ('' for the root)."""
+
+        self.__add_watches('')
+
+    def close(self):
+        """
+        Stops watching.
+        """
+        os.close(self.__fd)
+
+    def __add_watches(self, relative_dir: str) -> list:
+        """
+        Adds the watches for the directory and all its subdirectories.
+        :return: List of all the (relative) paths found in the directory tree.
+        """
+        found_paths = []
+        pending_dirs = [relative_dir]
+        while pending_dirs:
+            current_dir = pending_dirs.pop()
+            full_path = os.path.join(self.root_dir, current_dir)
+            watch_descriptor = self.__libc.inotify_add_watch(self.__fd, os.fsencode(full_path),
+                                                             self.watch_mask | self.IN_ONLYDIR)
+            if watch_descriptor < 0:
+                error_number = ctypes.get_errno()
+                if error_number == 28:  # ENOSPC
+                    raise SystemExit("Error! inotify watch limit reached. "
+                                     + "Increase the limit: `sysctl fs.inotify.max_user_watches`.")
+                continue  # the directory is gone already
+            self.__watches[watch_descriptor] = current_dir
+
+            try:
+                with os.scandir(full_path) as dir_entries:
+                    for dir_entry in dir_entries:
+                        relative_path = os.path.join(current_dir, dir_entry.name)
+                        found_paths.append(relative_path)
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(relative_path)
+            except OSError:
+                pass
+        return found_paths
+
+    def __remove_watches(self, relative_dir: str):
+        """
+        Removes the watches of the directory and its subdirectories (e.g. the directory was moved away).
+        """
+        for watch_descriptor, watched_dir in list(self.__watches.items()):
+            if watched_dir == relative_dir or watched_dir.startswith(relative_dir + '/'):
+                self.__libc.inotify_rm_watch(self.__fd, watch_descriptor)
+                del self.__watches[watch_descriptor]
+
+    def __rebuild_watches(self):
+        """
+        Removes all the watches and adds them again for the whole tree (after the event queue overflow,
+        the watches of the directories created or moved meanwhile are missing).
+        """
+        for watch_descriptor in self.__watches:
+            self.__libc.inotify_rm_watch(self.__fd, watch_descriptor)
+        self.__watches.clear()
+        self.__add_watches('')
+
+    def __read_events(self, changed_paths: set) -> bool:
+        """
+        Reads the pending events and adds the changed paths to the set.
+        The watches are rebuilt if the event queue overflowed.
+        :return: bool value, True if the event queue overflowed (some events were lost).
+        """
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.__fd, 65536)
+            except BlockingIOError:
+                if overflow:
+                    self.__rebuild_watches()
+                return overflow
+
+            offset = 0
+            while offset < len(data):
+                watch_descriptor, mask, _, name_length = self.__event.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + self.__event.size:offset + self.__event.size + name_length]
+                                   .rstrip(b'\0'))
+                offset += self.__event.size + name_length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & self.IN_IGNORED:
+                    self.__watches.pop(watch_descriptor, None)
+                    continue
+                if watch_descriptor not in self.__watches or not name:
+                    continue
+
+                relative_path = os.path.join(self.__watches[watch_descriptor], name)
+                changed_paths.add(relative_path)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        # new directory - its content could be created before the watch was added
+                        changed_paths.update(self.__add_watches(relative_path))
+                    elif mask & self.IN_MOVED_FROM:
+                        self.__remove_watches(relative_path)
+
+    def read_batch(self, debounce_secs: float, max_delay_secs: float) -> tuple:
+        """
+        Waits for the changes and collects them into a batch. The batch is closed when there were no new events
+        for `debounce_secs`, or when `max_delay_secs` passed since the first event.
+        :return: Tuple: (set of the changed relative paths, overflow flag - True if some events were lost).
+        """
+        changed_paths = set()
+        overflow = False
+
+        # wait for the first event
+        while not changed_paths and not overflow:
+            select.select([self.__fd], [], [])
+            overflow = self.__read_events(changed_paths)
+
+        # debounce
+        batch_start = time.time()
+        while not overflow:
+            remaining_secs = max_delay_secs - (time.time() - batch_start)
+            if remaining_secs <= 0:
+                break
+            ready, _, _ = select.select([self.__fd], [], [], min(debounce_secs, remaining_secs))
+            if not ready:
+                break
+            overflow = self.__read_events(changed_paths)
+
+        return changed_paths, overflow
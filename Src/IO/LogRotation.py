@@ -0,0 +1,173 @@
+import fcntl
+import gzip
+import os
+import re
+import shutil
+import time
+from threading import Thread
+
+import GeneralSettings
+from Src.IO.Logger import Logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class LogRotation:
+    """
+    Log rotation for the `eesync_*` and `rsync_*` logs: age and total size budgets, compression of the closed logs.
+    Runs in a background (daemon) thread - the application does not wait for it.
+    The logs in use are locked by their owners (shared `flock`: see Logger, SyncProvider) and skipped here.
+    """
+
+    log_name_regex = re.compile(r"^(eesync|rsync)_.*[.]log([.]gz|[.]zst)?$")
+    """Files managed by the rotation."""
+
+    temp_suffix: str = ".rotation-tmp"
+    """Suffix of the files being compressed (leftovers of an interrupted rotation get removed)."""
+
+    __worker: Thread = None
+
+    @classmethod
+    def start(cls, log_dir: str, closed_before: float):
+        """
+        Starts the rotation in the background.
+        :param log_dir: The logs directory.
+        :param closed_before: Timestamp - only the logs modified before it are treated as closed
+        (compressed or deleted). Logs of the current run (and the locked logs of any other active run)
+        are never touched.
+        """
+        cls.__worker = Thread(target=cls.rotate, args=(log_dir, closed_before), name="LogRotation", daemon=True)
+        cls.__worker.start()
+
+    @classmethod
+    def rotate(cls, log_dir: str, closed_before: float):
+        """
+        Runs the rotation: removes the logs older than the age limit, compresses the closed logs,
+        then removes the oldest logs until the total size fits the size limit.
+        """
+        logger_settings = GeneralSettings.logger
+        max_age_days = cls.__read_limit(logger_settings["remove_logs_older_than_days"])
+        max_total_bytes = cls.__read_limit(logger_settings["max_total_logs_size_mb"]) * 1024 * 1024
+        compression = logger_settings["compress_logs"]
+        if compression == "zstd" and zstandard is None:
+            Logger.log("Log rotation: 'zstandard' module is not installed - using gzip compression instead.")
+            compression = "gzip"
+
+        time_start = time.time()
+        removed_files = []
+        compressed_count = 0
+
+        for dir_entry in cls.__scan(log_dir):
+            entry_stat = cls.__stat(dir_entry)
+            if entry_stat is None or entry_stat.st_mtime >= closed_before:
+                continue
+            if dir_entry.name.endswith(cls.temp_suffix):
+                cls.__remove(dir_entry.path, removed_files)
+            elif cls.__is_in_use(dir_entry.path):
+                continue
+            elif max_age_days and closed_before - entry_stat.st_mtime > max_age_days * 24 * 60 * 60:
+                cls.__remove(dir_entry.path, removed_files)
+            elif compression and dir_entry.name.endswith(".log"):
+                compressed_count += cls.__compress(dir_entry.path, compression)
+
+        if max_total_bytes:
+            entry_stats = [(cls.__stat(dir_entry), dir_entry.path) for dir_entry in cls.__scan(log_dir)]
+            log_files = sorted(((entry_stat.st_mtime, entry_stat.st_size, path)
+                                for entry_stat, path in entry_stats if entry_stat is not None), reverse=True)
+            total_bytes = sum(size for _, size, _ in log_files)
+            while total_bytes > max_total_bytes and log_files:
+                mtime, size, path = log_files.pop()
+                if mtime >= closed_before:
+                    break
+                if cls.__is_in_use(path):
+                    continue
+                cls.__remove(path, removed_files)
+                total_bytes -= size
+
+        Logger.log(f"Log rotation done in {time.time() - time_start:.2f} [sec]. "
+                   + f"Compressed: {compressed_count}, removed: {removed_files}")
+
+    @classmethod
+    def __scan(cls, log_dir: str) -> list:
+        """
+        Lists the files managed by the rotation (and the leftover temporary files).
+        """
+        try:
+            with os.scandir(log_dir) as dir_entries:
+                return [dir_entry for dir_entry in dir_entries
+                        if dir_entry.is_file(follow_symlinks=False)
+                        and (cls.log_name_regex.match(dir_entry.name) or dir_entry.name.endswith(cls.temp_suffix))]
+        except OSError:
+            return []
+
+    @staticmethod
+    def __stat(dir_entry: os.DirEntry) -> os.stat_result | None:
+        """
+        Returns the file status, None if the file is gone already (e.g. removed by the rotation of another run).
+        """
+        try:
+            return dir_entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def __is_in_use(path: str) -> bool:
+        """
+        Checks if the log file is in use - locked by its owner (see: Logger, SyncProvider).
+        """
+        try:
+            with open(path, 'rb') as file:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    @staticmethod
+    def __read_limit(value: str) -> int:
+        """
+        Reads the numeric limit from the settings. Empty (or invalid) value means "no limit" (0).
+        """
+        try:
+            return max(0, int(value))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def __remove(path: str, removed_files: list):
+        """
+        Removes the file (if it still exists).
+        """
+        try:
+            os.remove(path)
+            removed_files.append(path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def __compress(cls, path: str, compression: str) -> int:
+        """
+        Compresses the log file (the original is replaced, modification time is kept).
+        :return: 1 if compressed, 0 otherwise.
+        """
+        target_path = path + (".zst" if compression == "zstd" else ".gz")
+        temp_path = target_path + cls.temp_suffix
+        try:
+            with open(path, 'rb') as source_file:
+                if compression == "zstd":
+                    with open(temp_path, 'wb') as target_file:
+                        zstandard.ZstdCompressor().copy_stream(source_file, target_file)
+                else:
+                    with gzip.open(temp_path, 'wb') as target_file:
+                        shutil.copyfileobj(source_file, target_file)
+            shutil.copystat(path, temp_path)
+            os.replace(temp_path, target_path)
+            os.remove(path)
+        except OSError as error:
+            Logger.log(f"Log rotation: failed to compress {path}: {error}")
+            return 0
+        return 1
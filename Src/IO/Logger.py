@@ -1,7 +1,10 @@
+import atexit
+import fcntl
 from datetime import datetime
-from glob import glob
-from os import getcwd, stat, remove
+from os import getcwd
 from os.path import isdir, isfile
+from queue import Queue, Empty
+from threading import Lock, Thread, Event
 from time import mktime
 
 import GeneralSettings
@@ -15,6 +18,12 @@ class Logger:
     __start_time = None
     __log_dir = None
     __log_file_is_ready: bool = False
+    __log_lock: Lock = Lock()
+    __file_queue: Queue = None
+    __file_writer: Thread = None
+    __file_writer_error: Exception = None
+    __file_writer_stopped: bool = False
+    __file_batch_max_items: int = 1000
 
     @classmethod
     def init(cls):
@@ -33,6 +42,13 @@ class Logger:
         else:
             cls.__log_dir = default_logs_directory
 
+    @classmethod
+    def get_start_time(cls) -> float:
+        """
+        Returns the logger start time (timestamp).
+        """
+        return cls.__start_time
+
     @classmethod
     def get_log_path_dir(cls):
         """
@@ -65,19 +81,20 @@ class Logger:
         Internal log proxy.
         """
         log_method = GeneralSettings.logger["log_method"]
-        match log_method:
-            case "stdout":
-                print(text)
-            case "file":
-                cls.__handle_file(text)
-                pass
-            case "stdout_file":
-                cls.__handle_file(text)
-                print(text)
-            case "none":
-                pass
-            case _:
-                raise SystemExit(f"Error! Wrong logger type: {log_method}")
+        with cls.__log_lock:
+            match log_method:
+                case "stdout":
+                    print(text)
+                case "file":
+                    cls.__handle_file(text)
+                    pass
+                case "stdout_file":
+                    cls.__handle_file(text)
+                    print(text)
+                case "none":
+                    pass
+                case _:
+                    raise SystemExit(f"Error! Wrong logger type: {log_method}")
 
     @classmethod
     def __prepare_file_name_and_path(cls) -> tuple:
@@ -91,21 +108,93 @@ class Logger:
     @classmethod
     def __handle_file(cls, text):
         """
-        Writes to a file.
+        Writes to a file - the text is queued for the background writer thread.
+        The queue is bounded: if the writer falls behind, the caller waits (backpressure).
+        After the shutdown (e.g. the background threads logging at exit), the text is written directly.
         """
         if not cls.__log_file_is_ready:
             cls.__init_log_file()
+            cls.__start_file_writer()
+
+        if cls.__file_writer_error:
+            raise SystemExit(f"Error! Failed to write the log file: {cls.__file_writer_error}")
+
+        if cls.__file_writer_stopped:
+            _, save_path = cls.__prepare_file_name_and_path()
+            with open(save_path, 'a') as file:
+                file.write(f"\n{text}\n")
+            return
+
+        cls.__file_queue.put(f"\n{text}\n")
+
+    @classmethod
+    def __start_file_writer(cls):
+        """
+        Starts the background writer thread. It gets stopped (and the file flushed) at the end of execution.
+        """
         file_name, save_path = cls.__prepare_file_name_and_path()
+        cls.__file_queue = Queue(maxsize=GeneralSettings.logger["file_buffer_max_lines"])
+        cls.__file_writer = Thread(target=cls.__write_file, args=(save_path,), name="LoggerFileWriter", daemon=True)
+        cls.__file_writer.start()
+        atexit.register(cls.shutdown)
 
-        # file validation
-        if not isdir(cls.__log_dir):
-            raise SystemExit(f"Error! Wrong logs directory (not a directory): {cls.__log_dir}")
-        if not isfile(save_path):
-            raise SystemExit(f"Error! Tried to log to a file, but the file is gone: {save_path}")
+    @classmethod
+    def __write_file(cls, save_path: str):
+        """
+        Background writer: keeps the log file open (and locked - see: LogRotation) and writes the queued lines
+        in batches. Queue items: str - the text to write, Event - flush request, None - flush and stop.
+        """
+        try:
+            with open(save_path, 'a') as file:
+                fcntl.flock(file, fcntl.LOCK_SH)
+                while True:
+                    batch = [cls.__file_queue.get()]
+                    while len(batch) < cls.__file_batch_max_items:
+                        try:
+                            batch.append(cls.__file_queue.get_nowait())
+                        except Empty:
+                            break
+
+                    file.writelines(item for item in batch if isinstance(item, str))
+                    file.flush()
+                    for item in batch:
+                        if isinstance(item, Event):
+                            item.set()
+                    if None in batch:
+                        return
+        except OSError as error:
+            cls.__file_writer_error = error
+            # keep consuming the queue - nobody should wait forever for the dead writer
+            while True:
+                item = cls.__file_queue.get()
+                if isinstance(item, Event):
+                    item.set()
+                elif item is None:
+                    return
+
+    @classmethod
+    def flush(cls):
+        """
+        Waits until all the queued lines are written to the log file.
+        """
+        if cls.__file_writer and cls.__file_writer.is_alive():
+            flushed = Event()
+            cls.__file_queue.put(flushed)
+            while not flushed.wait(0.1) and cls.__file_writer.is_alive():
+                pass
 
-        # save the file - append mode
-        with open(save_path, 'a') as file:
-            file.write(f"\n{text}\n")
+    @classmethod
+    def shutdown(cls):
+        """
+        Flushes the log file and stops the writer thread. This method will be called automatically
+        at the end of execution (also on the SystemExit paths). The later logs are written directly.
+        """
+        # under the log lock - the queued lines are written before the direct ones
+        with cls.__log_lock:
+            if cls.__file_writer and cls.__file_writer.is_alive():
+                cls.__file_writer_stopped = True
+                cls.__file_queue.put(None)
+                cls.__file_writer.join()
 
     @classmethod
     def __init_log_file(cls):
@@ -131,27 +220,6 @@ class Logger:
     def cleanup(cls):
         """
         Handle the cleanup actions.
+        Note: old logs are handled by the LogRotation (in the background).
         """
-        try:
-            remove_logs_older_than_days = int(GeneralSettings.logger["remove_logs_older_than_days"])
-        except ValueError:
-            remove_logs_older_than_days = 0
-
-        if remove_logs_older_than_days > 0:
-            # remove old logs
-            cls.log(f"Rotating logs older than {remove_logs_older_than_days} days")
-
-            files_for_deletion = []
-            list_of_log_files = glob(f"{cls.__log_dir}/*.log")
-            for log_file in list_of_log_files:
-                # count time
-                file_time = stat(log_file).st_mtime
-                time_diff = cls.__start_time - file_time
-                days_diff = time_diff / 60 / 60 / 24
-                # register files for deletion
-                if days_diff > remove_logs_older_than_days:
-                    files_for_deletion.append(log_file)
-
-            cls.log(f"Processing list of files for deletion: {files_for_deletion}")
-            for file_to_delete in files_for_deletion:
-                remove(file_to_delete)
+        cls.flush()
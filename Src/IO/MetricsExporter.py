@@ -0,0 +1,197 @@
+import os
+import re
+import time
+from threading import Lock
+
+import GeneralSettings
+from Src.IO.FileSystem import FileSystem
+from Src.IO.Logger import Logger
+
+
+class MetricsExporter:
+    """
+    Metrics export for the Prometheus node_exporter (textfile collector): one `.prom` file per entry,
+    rewritten (atomically) after every run. The values are collected from the providers during the run,
+    merged per series (labels) with the ones read back from the existing file - the series of the other actions
+    (and of the previous runs) are kept.
+    """
+
+    metrics: dict = {
+        "last_run_timestamp_seconds": "Start time of the last run.",
+        "last_success_timestamp_seconds": "Start time of the last successful run of the action.",
+        "run_duration_seconds": "Duration of the last run.",
+        "run_exit_code": "Exit code of the last run (rsync exit code, 1 for the other failures).",
+        "transferred_bytes": "Bytes transferred by the last run (size of the transferred files).",
+        "transferred_files": "Files transferred by the last run.",
+        "deleted_files": "Files deleted by the last run.",
+        "rsync_cpu_seconds": "CPU time (user and system) of the rsync processes of the last run.",
+        "rsync_read_bytes": "Bytes read from the storage by the rsync processes of the last run.",
+        "rsync_write_bytes": "Bytes written to the storage by the rsync processes of the last run.",
+        "phase_seconds": "Duration of the phases of the last run.",
+        "mount_seconds": "EncFS mount latency (0 if the pooled mount was reused).",
+        "unmount_seconds": "EncFS unmount latency, including the wait for the idle mount."
+    }
+    """Exported metrics (`eesync_` prefix): name -> help text. All of them are gauges."""
+
+    __entries: dict = {}
+    """Entry ID -> {"general_name": str, "values": dict of metric name -> dict of label tuple -> value}."""
+
+    __lock: Lock = Lock()
+
+    @staticmethod
+    def get_file_path(entry_id: str) -> str:
+        """
+        Returns the metrics file path of the entry (the directory from the settings, or the state directory).
+        """
+        textfile_dir = GeneralSettings.metrics["textfile_dir"] or FileSystem.get_state_directory("metrics")
+        return os.path.join(textfile_dir, f"eesync_{entry_id}.prom")
+
+    @classmethod
+    def record_values(cls, entry_id: str, general_name: str, values: dict):
+        """
+        Records the values of the entry - merged per series: a value replaces the one with the same labels only.
+        :param values: dict of metric name -> value, or metric name -> dict of label tuple -> value
+        (e.g. "phase_seconds": {(("phase", "rsync"),): 1.5}).
+        """
+        if not GeneralSettings.metrics["enabled"]:
+            return
+        with cls.__lock:
+            entry = cls.__get_entry(entry_id)
+            entry["general_name"] = general_name
+            for metric_name, metric_values in values.items():
+                if not isinstance(metric_values, dict):
+                    metric_values = {(): metric_values}
+                entry["values"].setdefault(metric_name, {}).update(metric_values)
+
+    @classmethod
+    def record_run(cls, entry_id: str, general_name: str, action: str, started_at: float, return_code: int,
+                   transfer_stats: dict | None, resource_usage: dict | None, phase_times: dict):
+        """
+        Records the run and writes the metrics file of the entry.
+        :param transfer_stats: Transfer statistics (see: RsyncProgress.get_stats()), None if not known.
+        :param resource_usage: Resource usage of the rsync processes (see: CommandResult), None if not known.
+        :param phase_times: dict of phase name -> duration (seconds).
+        """
+        if not GeneralSettings.metrics["enabled"]:
+            return
+        stats = transfer_stats or {}
+        usage = resource_usage or {}
+        action_labels = (("action", action),)
+        run_values = {
+            "last_run_timestamp_seconds": {action_labels: started_at},
+            "run_duration_seconds": {action_labels: time.time() - started_at},
+            "run_exit_code": {action_labels: return_code},
+            "transferred_bytes": {action_labels: stats.get('total_transferred_file_size')},
+            "transferred_files": {action_labels: stats.get('number_of_regular_files_transferred')},
+            "deleted_files": {action_labels: stats.get('number_of_deleted_files')},
+            "rsync_cpu_seconds": {action_labels: usage.get('cpu_user_secs', 0) + usage.get('cpu_sys_secs', 0)
+                                  if 'cpu_user_secs' in usage else None},
+            "rsync_read_bytes": {action_labels: usage.get('read_bytes')},
+            "rsync_write_bytes": {action_labels: usage.get('write_bytes')},
+            "phase_seconds": {action_labels + (("phase", phase),): duration_secs
+                              for phase, duration_secs in phase_times.items()}
+        }
+        if return_code == 0:
+            run_values["last_success_timestamp_seconds"] = {action_labels: started_at}
+        with cls.__lock:
+            # the series of the previous run of the action are replaced as a whole (e.g. the phases not run now)
+            entry_values = cls.__get_entry(entry_id)["values"]
+            for metric_name in run_values:
+                if metric_name != "last_success_timestamp_seconds" and metric_name in entry_values:
+                    entry_values[metric_name] = {labels: value for labels, value in entry_values[metric_name].items()
+                                                 if labels[:1] != action_labels}
+        cls.record_values(entry_id, general_name, run_values)
+        cls.write(entry_id)
+
+    @classmethod
+    def __get_entry(cls, entry_id: str) -> dict:
+        """
+        Returns the collected values of the entry. A new entry starts with the values read from its metrics file
+        (previous runs). Called with the lock held.
+        """
+        if entry_id not in cls.__entries:
+            cls.__entries[entry_id] = {"general_name": "", "values": cls.__read_values(cls.get_file_path(entry_id))}
+        return cls.__entries[entry_id]
+
+    @classmethod
+    def __read_values(cls, file_path: str) -> dict:
+        """
+        Reads the samples of the known metrics from the metrics file (the entry labels are left out).
+        :return: dict of metric name -> dict of label tuple -> value, empty if there is no (readable) file.
+        """
+        values = {}
+        line_regex = re.compile(r'^eesync_(\w+)\{(.*)\} (\S+)$')
+        label_regex = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+        try:
+            with open(file_path, 'r') as file:
+                for line in file:
+                    matched_line = line_regex.match(line.strip())
+                    if not matched_line or matched_line.group(1) not in cls.metrics:
+                        continue
+                    labels = tuple((name, cls.__unescape_label(label_value))
+                                   for name, label_value in label_regex.findall(matched_line.group(2))
+                                   if name not in ("entry_id", "name"))
+                    values.setdefault(matched_line.group(1), {})[labels] = float(matched_line.group(3))
+        except (OSError, ValueError):
+            pass
+        return values
+
+    @classmethod
+    def write(cls, entry_id: str):
+        """
+        Writes the metrics file of the entry - atomically (via a temporary file in the same directory),
+        so the collector never reads a partial file. Failures are logged only.
+        """
+        if not GeneralSettings.metrics["enabled"]:
+            return
+        with cls.__lock:
+            entry = cls.__entries.get(entry_id)
+            if entry is None:
+                return
+            content = cls.gen_text(entry_id, entry["general_name"], entry["values"])
+
+            file_path = cls.get_file_path(entry_id)
+            temp_path = file_path + f".{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w') as file:
+                    file.write(content)
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, file_path)
+            except OSError as error:
+                Logger.log(f"Metrics: failed to write {file_path}: {error}")
+
+    @classmethod
+    def gen_text(cls, entry_id: str, general_name: str, values: dict) -> str:
+        """
+        Generates the metrics in the text exposition format. Unknown (None) values are skipped.
+        :param values: See: record_values().
+        """
+        entry_labels = (("entry_id", entry_id), ("name", general_name))
+        text = ''
+        for metric_name, help_text in cls.metrics.items():
+            metric_values = values.get(metric_name)
+            if not isinstance(metric_values, dict):
+                metric_values = {(): metric_values}
+            samples = [(entry_labels + labels, value) for labels, value in sorted(metric_values.items())
+                       if value is not None]
+            if not samples:
+                continue
+            text += f"# HELP eesync_{metric_name} {help_text}\n# TYPE eesync_{metric_name} gauge\n"
+            for labels, value in samples:
+                label_text = ','.join(f'{name}="{cls.__escape_label(label_value)}"' for name, label_value in labels)
+                text += f"eesync_{metric_name}{{{label_text}}} {round(value, 3)}\n"
+        return text
+
+    @staticmethod
+    def __escape_label(value: str) -> str:
+        """
+        Escapes the label value (backslash, double quote, line feed).
+        """
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def __unescape_label(value: str) -> str:
+        """
+        Reverts the label value escaping (see: __escape_label()).
+        """
+        return re.sub(r'\\(.)', lambda matched: '\n' if matched.group(1) == 'n' else matched.group(1), value)
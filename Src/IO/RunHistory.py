@@ -0,0 +1,159 @@
+import sqlite3
+import statistics
+from collections import deque
+from datetime import datetime
+
+import GeneralSettings
+from Src.IO.FileSystem import FileSystem
+
+
+class RunHistory:
+    """
+    Run history store (SQLite): one record per sync run - duration, transfer statistics and the exit code.
+    Source of the history report (trends, runs slower than their own baseline).
+    """
+
+    schema: list = [
+        "CREATE TABLE IF NOT EXISTS sync_runs ("
+        " run_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " entry_id TEXT NOT NULL,"
+        " general_name TEXT NOT NULL,"
+        " action TEXT NOT NULL,"
+        " started_at REAL NOT NULL,"
+        " duration_secs REAL NOT NULL,"
+        " bytes_transferred INTEGER,"
+        " files_transferred INTEGER,"
+        " files_deleted INTEGER,"
+        " return_code INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS sync_runs_entry_action ON sync_runs (entry_id, action, started_at)"
+    ]
+
+    added_columns: dict = {
+        "rsync_profile": "TEXT"
+    }
+    """Columns added after the first release of the schema: name -> type (added to the existing databases)."""
+
+    @staticmethod
+    def get_database_path() -> str:
+        """
+        Returns the history database path (from the settings, or the default one in the state directory).
+        """
+        return GeneralSettings.run_history["database_path"] \
+            or FileSystem.get_state_directory() + "/run_history.sqlite"
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        """
+        Opens the history database (creates the schema if needed).
+        Concurrent writers (batch mode) wait for each other - up to 30 seconds.
+        """
+        connection = sqlite3.connect(cls.get_database_path(), timeout=30)
+        with connection:
+            for statement in cls.schema:
+                connection.execute(statement)
+            existing_columns = [row[1] for row in connection.execute("PRAGMA table_info(sync_runs)")]
+            for column_name, column_type in cls.added_columns.items():
+                if column_name not in existing_columns:
+                    connection.execute(f"ALTER TABLE sync_runs ADD COLUMN {column_name} {column_type}")
+        return connection
+
+    @classmethod
+    def record(cls, entry_id: str, general_name: str, action: str, started_at: float, duration_secs: float,
+               transfer_stats: dict | None, return_code: int, rsync_profile: str = None):
+        """
+        Saves the run record. Transfer values are NULL if not known (no `--stats` output nor rsync log).
+        :param transfer_stats: Transfer statistics (see: RsyncProgress.get_stats(), RsyncProgress.parse_log_file()).
+        :param rsync_profile: Name of the rsync parameters profile used.
+        """
+        stats = transfer_stats or {}
+        connection = cls.connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO sync_runs (entry_id, general_name, action, started_at, duration_secs,"
+                    " bytes_transferred, files_transferred, files_deleted, return_code, rsync_profile)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry_id, general_name, action, started_at, duration_secs,
+                     stats.get('total_transferred_file_size'), stats.get('number_of_regular_files_transferred'),
+                     stats.get('number_of_deleted_files'), return_code, rsync_profile))
+        finally:
+            connection.close()
+
+    @classmethod
+    def gen_report(cls) -> str:
+        """
+        Generates the history report: the latest runs of every entry and action, the duration trend,
+        and the runs that were significantly slower than their baseline (z-score of the duration,
+        compared with the preceding successful runs).
+        """
+        history_settings = GeneralSettings.run_history
+        report_runs = history_settings["report_runs"]
+        baseline_runs = history_settings["baseline_runs"]
+        baseline_min_runs = history_settings["baseline_min_runs"]
+        slowdown_z_score = history_settings["slowdown_z_score"]
+
+        connection = cls.connect()
+        try:
+            rows = connection.execute(
+                "SELECT entry_id, general_name, action, started_at, duration_secs, bytes_transferred,"
+                " files_transferred, files_deleted, return_code, rsync_profile"
+                " FROM sync_runs ORDER BY entry_id, action, started_at"
+            ).fetchall()
+        finally:
+            connection.close()
+
+        if not rows:
+            return "Run history is empty."
+
+        grouped_runs = {}
+        for row in rows:
+            grouped_runs.setdefault((row[0], row[2]), []).append(row)
+
+        report = "Run history report:\n"
+        slow_runs_count = 0
+        for (entry_id, action), runs in grouped_runs.items():
+            report += f"\n{runs[-1][1]} ({entry_id}) - {action}: {len(runs)} runs\n"
+
+            # mark the slow runs (baseline: the preceding successful runs - a running window, single pass)
+            flags = []
+            baseline = deque(maxlen=baseline_runs or None)
+            first_listed_index = len(runs) - len(runs[-report_runs:])
+            for index, run in enumerate(runs):
+                flag = ''
+                if index >= first_listed_index and len(baseline) >= max(2, baseline_min_runs):
+                    baseline_stdev = statistics.stdev(baseline)
+                    if baseline_stdev > 0:
+                        z_score = (run[4] - statistics.mean(baseline)) / baseline_stdev
+                        if z_score > slowdown_z_score:
+                            flag = f"SLOW (z={z_score:.1f})"
+                flags.append(flag)
+                if run[8] == 0:
+                    baseline.append(run[4])
+
+            for run, flag in list(zip(runs, flags))[-report_runs:]:
+                slow_runs_count += 1 if flag else 0
+                report += str(f"  {datetime.fromtimestamp(run[3]).strftime('%Y-%m-%d %H:%M:%S')}"
+                              + f"  {run[4]:10.2f} sec"
+                              + f"  {cls.__format_value(run[5]):>10} bytes"
+                              + f"  {cls.__format_value(run[6]):>8} files"
+                              + f"  {cls.__format_value(run[7]):>8} deleted"
+                              + f"  exit {run[8]:<3}  {cls.__format_value(run[9]):<13} {flag}").rstrip() + '\n'
+
+            successful_durations = [run[4] for run in runs if run[8] == 0]
+            if len(successful_durations) >= 2 * baseline_min_runs:
+                recent_mean = statistics.mean(successful_durations[-baseline_min_runs:])
+                previous_mean = statistics.mean(successful_durations[-2 * baseline_min_runs:-baseline_min_runs])
+                if previous_mean > 0:
+                    report += str(f"  Trend: {(recent_mean / previous_mean - 1) * 100:+.1f}% "
+                                  + f"(mean duration of the last {baseline_min_runs} runs vs the previous "
+                                  + f"{baseline_min_runs})\n")
+
+        report += f"\nSlow runs (among the listed): {slow_runs_count}."
+        return report
+
+    @staticmethod
+    def __format_value(value) -> str:
+        """
+        Formats the optional (NULL) value.
+        """
+        return '-' if value is None else str(value)
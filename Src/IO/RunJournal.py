@@ -0,0 +1,86 @@
+import json
+import os
+import time
+from threading import Lock
+
+from Src.IO.Logger import Logger
+
+
+class RunJournal:
+    """
+    Run journal of the sharded backup: checkpoints of the completed top-level subtrees (name and fingerprint:
+    total size, number of files and the latest mtime - see: TreeScanner.get_tree_fingerprint()).
+    If the run gets interrupted or fails, the next run of the same backup (retry or the next EEsync run)
+    skips the checkpointed subtrees that did not change - only the unfinished work is synced.
+    The journal is removed once the whole backup succeeds.
+    """
+
+    def __init__(self, journal_path: str, source_dir: str, target_dir: str):
+        """
+        Starts a new (empty) journal. See: open() - resumes the existing one.
+        """
+        self.journal_path = journal_path
+        self.source_dir = source_dir
+        self.target_dir = target_dir
+        self.started_at: float = time.time()
+        self.completed: dict = {}
+        """Completed subtree name -> its fingerprint at the time of the sync."""
+        self.__lock = Lock()
+
+    @classmethod
+    def open(cls, journal_path: str, source_dir: str, target_dir: str, max_age_secs: float) -> 'RunJournal':
+        """
+        Opens the journal of the backup: resumes the saved one if it is valid (same directories, not older than
+        the limit), starts a new one otherwise.
+        """
+        journal = cls(journal_path, source_dir, target_dir)
+        try:
+            with open(journal_path, 'r') as file:
+                saved_journal = json.load(file)
+        except FileNotFoundError:
+            return journal
+        except (OSError, ValueError) as error:
+            Logger.log(f"Run journal discarded (unreadable: {error}): {journal_path}")
+            return journal
+
+        if saved_journal.get('source_dir') != source_dir or saved_journal.get('target_dir') != target_dir:
+            Logger.log(f"Run journal discarded (made for different directories): {journal_path}")
+        elif time.time() - saved_journal.get('started_at', 0) > max_age_secs:
+            Logger.log(f"Run journal discarded (too old): {journal_path}")
+        else:
+            journal.started_at = saved_journal['started_at']
+            journal.completed = {name: tuple(fingerprint) if isinstance(fingerprint, list) else fingerprint
+                                 for name, fingerprint in saved_journal.get('completed', {}).items()}
+            Logger.log(f"Run journal resumed: {len(journal.completed)} completed subtrees: {journal_path}")
+        return journal
+
+    def is_completed(self, name: str, fingerprint: tuple) -> bool:
+        """
+        Checks if the subtree is completed - and unchanged since (same size, number of files and latest mtime).
+        """
+        return self.completed.get(name) == tuple(fingerprint)
+
+    def complete(self, subtree_fingerprints: dict):
+        """
+        Checkpoints the completed subtrees (saves the journal atomically). Called by the concurrent shards.
+        :param subtree_fingerprints: dict of subtree name -> fingerprint.
+        """
+        with self.__lock:
+            self.completed.update({name: tuple(fingerprint) for name, fingerprint in subtree_fingerprints.items()})
+            with open(self.journal_path + '.tmp', 'w') as file:
+                json.dump({
+                    "source_dir": self.source_dir,
+                    "target_dir": self.target_dir,
+                    "started_at": self.started_at,
+                    "completed": self.completed
+                }, file)
+            os.replace(self.journal_path + '.tmp', self.journal_path)
+
+    def remove(self):
+        """
+        Removes the journal (the backup is complete).
+        """
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
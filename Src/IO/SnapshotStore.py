@@ -0,0 +1,176 @@
+import os
+import re
+import shutil
+import stat
+import time
+from datetime import datetime
+from threading import Lock, Thread
+
+import GeneralSettings
+from Src.IO.Logger import Logger
+
+
+class SnapshotStore:
+    """
+    Snapshot directories of the backup target: `<target>/<timestamp>` per backup.\n
+    A new snapshot is written into the `<timestamp>.partial` directory and renamed once the backup succeeds,
+    so only the complete snapshots are listed (and used as the `--link-dest` base).
+    Snapshots selected for removal are renamed to `<timestamp>.deleting` first, then removed.
+    """
+
+    name_format: str = "%Y-%m-%d_%H-%M-%S"
+    """Snapshot directory name (creation time)."""
+
+    name_regex = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}$")
+
+    partial_suffix: str = ".partial"
+    deleting_suffix: str = ".deleting"
+
+    __workers: list = []
+    __workers_lock: Lock = Lock()
+
+    @classmethod
+    def list_snapshots(cls, target_dir: str) -> list:
+        """
+        Lists the complete snapshots.
+        :param target_dir: The backup target directory.
+        :return: List of the snapshot names, the oldest first.
+        """
+        try:
+            with os.scandir(target_dir) as dir_entries:
+                return sorted(dir_entry.name for dir_entry in dir_entries
+                              if cls.name_regex.match(dir_entry.name) and dir_entry.is_dir(follow_symlinks=False))
+        except OSError:
+            return []
+
+    @classmethod
+    def get_latest(cls, target_dir: str) -> str | None:
+        """
+        Returns the path to the latest complete snapshot, None if there are no snapshots.
+        """
+        snapshots = cls.list_snapshots(target_dir)
+        return os.path.join(target_dir, snapshots[-1]) if snapshots else None
+
+    @classmethod
+    def create_partial(cls, target_dir: str) -> str:
+        """
+        Creates the directory of the new (partial) snapshot.
+        :return: Path to the partial snapshot directory.
+        """
+        snapshot_name = datetime.now().strftime(cls.name_format)
+        if os.path.exists(os.path.join(target_dir, snapshot_name)):
+            raise SystemExit(f"Error! Snapshot already exists: {snapshot_name}")
+        partial_path = os.path.join(target_dir, snapshot_name + cls.partial_suffix)
+        os.makedirs(partial_path)
+        return partial_path
+
+    @classmethod
+    def complete(cls, partial_path: str) -> str:
+        """
+        Marks the partial snapshot as complete (renames the directory).
+        :return: Path to the complete snapshot.
+        """
+        snapshot_path = partial_path[:-len(cls.partial_suffix)]
+        os.rename(partial_path, snapshot_path)
+        return snapshot_path
+
+    @staticmethod
+    def select_retained(snapshots: list, keep_last: int, keep_daily: int, keep_weekly: int) -> set:
+        """
+        Selects the snapshots kept by the retention policy (see: `snapshots` in the settings).
+        :param snapshots: Snapshot names (see: list_snapshots()).
+        :return: Set of the retained names. The latest snapshot is always retained.
+        """
+        newest_first = sorted(snapshots, reverse=True)
+        retained = set(newest_first[:max(1, keep_last)])
+        for keep_periods, period_format in ((keep_daily, "%Y-%m-%d"), (keep_weekly, "%G-W%V")):
+            periods = []
+            for snapshot_name in newest_first:
+                period = datetime.strptime(snapshot_name, SnapshotStore.name_format).strftime(period_format)
+                if period in periods:
+                    continue
+                if len(periods) >= keep_periods:
+                    break
+                periods.append(period)
+                retained.add(snapshot_name)
+        return retained
+
+    @classmethod
+    def start_pruning(cls, target_dir: str):
+        """
+        Starts the retention in the background. The application waits for it at the end (see: wait()),
+        so the target is not unmounted during the removal.
+        """
+        worker = Thread(target=cls.prune, args=(target_dir,), name="SnapshotPruning")
+        with cls.__workers_lock:
+            cls.__workers.append(worker)
+        worker.start()
+
+    @classmethod
+    def wait(cls):
+        """
+        Waits for the background retention runs.
+        """
+        with cls.__workers_lock:
+            workers, cls.__workers = cls.__workers, []
+        for worker in workers:
+            worker.join()
+
+    @classmethod
+    def prune(cls, target_dir: str):
+        """
+        Removes the snapshots that are not retained, the leftovers of the interrupted removals,
+        and the partial snapshots older than the latest complete one (failed or interrupted backups).
+        """
+        snapshot_settings = GeneralSettings.snapshots
+        time_start = time.time()
+        snapshots = cls.list_snapshots(target_dir)
+        if not snapshots:
+            return
+        retained = cls.select_retained(snapshots, snapshot_settings["keep_last"], snapshot_settings["keep_daily"],
+                                       snapshot_settings["keep_weekly"])
+
+        removed_names = []
+        for snapshot_name in snapshots:
+            if snapshot_name not in retained:
+                deleting_path = os.path.join(target_dir, snapshot_name + cls.deleting_suffix)
+                try:
+                    os.rename(os.path.join(target_dir, snapshot_name), deleting_path)
+                except OSError as error:
+                    Logger.log(f"Snapshot retention: failed to remove {snapshot_name}: {error}")
+                    continue
+                cls.__remove_tree(deleting_path)
+                removed_names.append(snapshot_name)
+
+        with os.scandir(target_dir) as dir_entries:
+            leftover_paths = [dir_entry.path for dir_entry in dir_entries if dir_entry.is_dir(follow_symlinks=False)
+                              and (dir_entry.name.endswith(cls.deleting_suffix)
+                                   or dir_entry.name.endswith(cls.partial_suffix)
+                                   and dir_entry.name[:-len(cls.partial_suffix)] < snapshots[-1])]
+        for leftover_path in leftover_paths:
+            cls.__remove_tree(leftover_path)
+            removed_names.append(os.path.basename(leftover_path))
+
+        Logger.log(f"Snapshot retention done in {time.time() - time_start:.2f} [sec]: {target_dir}. "
+                   + f"Kept: {len(retained)}, removed: {removed_names}")
+
+    @staticmethod
+    def __remove_tree(path: str):
+        """
+        Removes the directory tree - including the read-only directories (copied with their permissions).
+        """
+        try:
+            shutil.rmtree(path)
+            return
+        except OSError:
+            pass
+
+        try:
+            os.chmod(path, stat.S_IRWXU)
+            for root, dir_names, _ in os.walk(path):
+                for dir_name in dir_names:
+                    if not os.path.islink(os.path.join(root, dir_name)):
+                        os.chmod(os.path.join(root, dir_name), stat.S_IRWXU)
+            shutil.rmtree(path)
+        except OSError as error:
+            Logger.log(f"Snapshot retention: failed to remove {path}: {error}")
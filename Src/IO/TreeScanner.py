@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TreeScanner:
+    """
+    Fast (parallel) directory tree scanning based on `os.scandir`.
+    """
+
+    @classmethod
+    def get_tree_size(cls, directory_path: str) -> int:
+        """
+        Returns the total size (in bytes) of the files in given directory (recursively).
+        Symlinks are not followed.
+        :param directory_path: The directory to scan.
+        """
+        return cls.get_tree_fingerprint(directory_path)[0]
+
+    @classmethod
+    def get_tree_fingerprint(cls, directory_path: str) -> tuple:
+        """
+        Returns the fingerprint of given directory tree (recursively), measured by a single scan.
+        Symlinks are not followed. The mtime covers the directories too (deleted and renamed entries).
+        :param directory_path: The directory to scan.
+        :return: Tuple: (total size of the files in bytes, number of the files, the latest mtime in nanoseconds).
+        """
+        total_size = 0
+        files_count = 0
+        max_mtime_ns = 0
+        try:
+            max_mtime_ns = os.stat(directory_path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            pass
+        pending_dirs = [directory_path]
+        while pending_dirs:
+            try:
+                with os.scandir(pending_dirs.pop()) as dir_entries:
+                    for dir_entry in dir_entries:
+                        try:
+                            entry_stat = dir_entry.stat(follow_symlinks=False)
+                            max_mtime_ns = max(max_mtime_ns, entry_stat.st_mtime_ns)
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                pending_dirs.append(dir_entry.path)
+                            else:
+                                total_size += entry_stat.st_size
+                                files_count += 1
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+        return total_size, files_count, max_mtime_ns
+
+    @classmethod
+    def scan_top_level(cls, directory_path: str, max_workers: int = 8) -> tuple:
+        """
+        Scans the top level of the directory. The subdirectories are measured concurrently.
+        :param directory_path: The directory to scan.
+        :param max_workers: Number of scanning threads.
+        :return: Tuple: (dict of subdirectory name -> fingerprint (see: get_tree_fingerprint()),
+        list of other top-level entry names).
+        """
+        sub_dirs = []
+        other_entries = []
+        with os.scandir(directory_path) as dir_entries:
+            for dir_entry in dir_entries:
+                if dir_entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(dir_entry.name)
+                else:
+                    other_entries.append(dir_entry.name)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fingerprints = executor.map(cls.get_tree_fingerprint,
+                                        [os.path.join(directory_path, name) for name in sub_dirs])
+            sub_dir_fingerprints = dict(zip(sub_dirs, fingerprints))
+
+        return sub_dir_fingerprints, other_entries
+
+    @staticmethod
+    def plan_balanced_groups(item_sizes: dict, groups_count: int) -> list:
+        """
+        Splits the items into size-balanced groups (greedy: the largest item goes to the smallest group).
+        :param item_sizes: dict of item name -> size.
+        :param groups_count: Requested number of groups. Empty groups are not returned.
+        :return: List of the groups (lists of item names), the biggest group first.
+        """
+        groups = [{"size": 0, "items": []} for _ in range(max(1, groups_count))]
+        for name, size in sorted(item_sizes.items(), key=lambda item: (-item[1], item[0])):
+            smallest_group = min(groups, key=lambda group: group["size"])
+            smallest_group["items"].append(name)
+            smallest_group["size"] += size
+
+        groups.sort(key=lambda group: -group["size"])
+        return [group["items"] for group in groups if group["items"]]
@@ -12,11 +12,24 @@ class UserInputConsole:
 
     input_caret = '> '
 
+    interactive: bool = True
+    """Set to False in headless (batch) mode - any attempt to read the user input terminates the program."""
+
+    @classmethod
+    def require_interactive(cls):
+        """
+        Terminates the program if the user input is requested in headless (batch) mode.
+        """
+        if not cls.interactive:
+            Logger.log("User input requested in non-interactive mode. Terminating.")
+            raise SystemExit("Error! User input requested in non-interactive mode.")
+
     @classmethod
     def general_input_int(cls):
         """
         General input - restricted only to integer values.
         """
+        cls.require_interactive()
         try:
             user_input = int(input(cls.input_caret))
         except ValueError:
@@ -32,6 +45,7 @@ class UserInputConsole:
         """
         General input.
         """
+        cls.require_interactive()
         try:
             user_input = input(cls.input_caret)
         except (KeyboardInterrupt, EOFError):
@@ -114,3 +128,36 @@ class UserInputConsole:
             user_input = UserInputConsole.general_input()
 
         return user_input
+
+    @classmethod
+    def read_snapshot(cls, snapshots: list) -> str:
+        """
+        Reads the snapshot choice: number from the list (printed), or empty value for the latest one.
+        :param snapshots: Snapshot names, the oldest first.
+        """
+        snapshot_list = ''.join(f"\n  {number} - {name}" for number, name in enumerate(snapshots, start=1))
+        print(f"Please select the snapshot to restore (empty value - the latest one): {snapshot_list}")
+        user_input = UserInputConsole.general_input().strip()
+
+        while user_input and not (user_input.isdigit() and 1 <= int(user_input) <= len(snapshots)):
+            print(f"Wrong value! Valid options are: 1 - {len(snapshots)}, or empty value. ")
+            user_input = UserInputConsole.general_input().strip()
+
+        return snapshots[int(user_input) - 1] if user_input else snapshots[-1]
+
+    @classmethod
+    def read_path_patterns(cls) -> list:
+        """
+        Reads the paths to restore: glob patterns relative to the data directory, one per line.
+        An empty line ends the list.
+        """
+        print("Please provide the paths to restore (relative to the data directory, glob patterns allowed, "
+              + "e.g. `documents/*.pdf`), one per line. Empty line ends the list.")
+        patterns = []
+        user_input = UserInputConsole.general_input().strip()
+        while user_input or not patterns:
+            if user_input:
+                patterns.append(user_input)
+            user_input = UserInputConsole.general_input().strip()
+
+        return patterns
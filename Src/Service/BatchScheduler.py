@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import GeneralSettings
+from Src.Config.ConfigEntry import ConfigEntry
+from Src.IO.Logger import Logger
+from Src.Service.CryptProvider import CryptProvider
+from Src.Service.SyncProvider import SyncProvider
+
+
+class BatchScheduler:
+    """
+    Runs multiple config entries concurrently (non-interactive mode).
+    Entries that share the same target device are limited by the `max_jobs_per_device` setting,
+    so the jobs on a single disk are serialized, while jobs on different disks overlap.
+    """
+
+    def __init__(self, actions: list, max_workers: int = None):
+        """
+        Initializes the scheduler.
+        :param actions: The actions (BackupAction) to run for every entry - one after another.
+        :param max_workers: Maximum number of concurrent jobs. Taken from GeneralSettings if not provided.
+        """
+        self.actions = actions
+        self.actions_label = ','.join(action.name for action in actions)
+        self.max_workers = max_workers or GeneralSettings.batch["max_workers"]
+        self.max_jobs_per_device = GeneralSettings.batch["max_jobs_per_device"]
+        self.results = []
+
+        if self.max_workers < 1 or self.max_jobs_per_device < 1:
+            raise SystemExit("Error! Batch settings misconfigured (limits lower than 1)!")
+
+    @staticmethod
+    def get_target_device(entry: ConfigEntry) -> int:
+        """
+        Returns the device ID of the backup storage (the place where the backup data is physically stored).
+        """
+        storage_dir = entry.encfs_encryption_dir if entry.encfs_enabled else entry.backup_target_dir
+        return os.stat(storage_dir).st_dev
+
+    def run(self, config_list: list) -> int:
+        """
+        Runs the actions for all given entries.
+        :param config_list: Selected items of the `ConfigManager.config_list` (loaded with `get_config_entry()`).
+        :return: Aggregated exit status - 0 if all the entries succeeded, 1 otherwise.
+        """
+        Logger.log(f"Batch run started. Actions: {self.actions_label}, entries: {len(config_list)}, "
+                   + f"workers: {self.max_workers}, jobs per device: {self.max_jobs_per_device}.")
+
+        # resolve the devices first - broken entries fail immediately
+        pending = []
+        for config_item in config_list:
+            try:
+                pending.append((config_item, self.get_target_device(config_item['config_object'])))
+            except OSError as error:
+                self.results.append(self.__gen_result(config_item, 1, 0.0, f"Target not available: {error}"))
+
+        running = {}
+        device_jobs = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # dispatch the jobs that fit into the worker and device limits
+                for job in list(pending):
+                    config_item, device = job
+                    if len(running) >= self.max_workers:
+                        break
+                    if device_jobs.get(device, 0) >= self.max_jobs_per_device:
+                        continue
+                    pending.remove(job)
+                    device_jobs[device] = device_jobs.get(device, 0) + 1
+                    running[executor.submit(self.run_entry, config_item)] = device
+
+                # wait for any job to finish
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    device_jobs[running.pop(future)] -= 1
+                    self.results.append(future.result())
+
+        self.print_summary()
+        return 0 if all(result['return_code'] == 0 for result in self.results) else 1
+
+    def run_entry(self, config_item: dict) -> dict:
+        """
+        Runs the actions for a single entry. Executed by the worker thread.\n
+        The EncFS mount is shared between the actions (see: EncfsMountPool).
+        :return: The result dictionary.
+        """
+        entry: ConfigEntry = config_item['config_object']
+        Logger.log(f"Batch job started: {config_item['config_number']} - {entry.general_name}")
+
+        crypt_service = CryptProvider()
+        sync_service = SyncProvider()
+        return_code = 1
+        message = ''
+        time_start = time.time()
+        try:
+            crypt_service.set_config(entry)
+            sync_service.set_config(entry)
+            for action in self.actions:
+                crypt_service.run(action)
+                sync_result = sync_service.run(action)
+                return_code = sync_result.returncode
+                crypt_service.cleanup()
+                if return_code != 0:
+                    message = f"{action.name}: rsync exited with code {return_code}"
+                    break
+        except (Exception, SystemExit) as error:
+            # the failed action fails the entry - even if the previous actions succeeded
+            return_code = 1
+            message = str(error)
+        finally:
+            try:
+                crypt_service.cleanup()
+            except (Exception, SystemExit) as error:
+                return_code = return_code or 1
+                message += f" Cleanup failed: {error}"
+
+        result = self.__gen_result(config_item, return_code, time.time() - time_start, message.strip())
+        Logger.log(f"Batch job finished: {config_item['config_number']} - {entry.general_name} "
+                   + f"({result['status']}) {result['message']}")
+        return result
+
+    @staticmethod
+    def __gen_result(config_item: dict, return_code: int, duration_secs: float, message: str) -> dict:
+        """
+        Prepares the result dictionary.
+        """
+        return {
+            "config_number": config_item['config_number'],
+            "general_name": config_item['general_name'],
+            "status": "OK" if return_code == 0 else "FAILED",
+            "return_code": return_code,
+            "duration_secs": duration_secs,
+            "message": message
+        }
+
+    def print_summary(self):
+        """
+        Prints (and logs) the summary of the batch run.
+        """
+        summary = f"Batch summary (actions: {self.actions_label}):\n"
+        for result in sorted(self.results, key=lambda item: item['config_number']):
+            summary += str(f"  [{result['status']}] {result['config_number']} - {result['general_name']} "
+                           + f"({result['duration_secs']:.2f} sec)")
+            if result['message']:
+                summary += f": {result['message']}"
+            summary += '\n'
+
+        failed_count = len([result for result in self.results if result['return_code'] != 0])
+        summary += f"Finished: {len(self.results) - failed_count} OK, {failed_count} failed."
+
+        print(summary)
+        Logger.log(summary)
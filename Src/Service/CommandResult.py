@@ -0,0 +1,41 @@
+import subprocess
+
+
+class CommandResult(subprocess.CompletedProcess):
+    """
+    Result of the command run by the CommandRunner: CompletedProcess extended with the exec ID
+    and the resource usage of the process (and its children).
+    """
+
+    def __init__(self, args, returncode: int, stdout=None, stderr=None, resource_usage: dict = None):
+        super().__init__(args, returncode, stdout, stderr)
+
+        self.exec_id: str = None
+        """Exec ID of the run (see the logs). Set by the CommandRunner."""
+
+        self.timed_out: bool = False
+        """True if the process was stopped because it exceeded its deadline (asyncio runner)."""
+
+        self.resource_usage: dict = resource_usage or {}
+        """
+        Resource usage: CPU time (user/sys, sec), max RSS (KiB), voluntary/involuntary context switches
+        (from the `wait4` rusage), read/write bytes and read/write characters (from the `/proc/<pid>/io`),
+        and the wall time. The asyncio runner provides the wall time only.
+        """
+
+    @staticmethod
+    def merge_resource_usage(results: list) -> dict:
+        """
+        Merges the resource usage of multiple (concurrent) runs: the counters are summed up,
+        max RSS and wall time are the highest ones.
+        """
+        merged_usage = {}
+        for result in results:
+            for key, value in getattr(result, 'resource_usage', {}).items():
+                if value is None:
+                    continue
+                if key in ('max_rss_kb', 'wall_secs'):
+                    merged_usage[key] = max(merged_usage.get(key, 0), value)
+                else:
+                    merged_usage[key] = merged_usage.get(key, 0) + value
+        return merged_usage
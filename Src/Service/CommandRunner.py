@@ -1,14 +1,25 @@
+import asyncio
 import atexit
+import json
+import os
 import random
+import re
+import shutil
+import signal
 import string
 import subprocess
+import threading
 import time
 from os import environ
 from sys import getdefaultencoding
+from typing import Callable
 
 import GeneralSettings
+from Src.IO.FileSystem import FileSystem
 from Src.IO.Logger import Logger
 from Src.IO.UserInputConsole import UserInputConsole
+from Src.Service.CommandResult import CommandResult
+from Src.Service.ProcessThrottle import ProcessThrottle
 
 
 class CommandRunner:
@@ -20,7 +31,7 @@ class CommandRunner:
     """External binary name."""
 
     binary_path: str = None
-    """Full binary path - should be auto-set on init."""
+    """Full binary path - auto-set on the first use (see: `require_binary()`)."""
 
     accepted_version: tuple = None
     """Minimal accepted version."""
@@ -28,21 +39,92 @@ class CommandRunner:
     detected_version: tuple = None
     """Actual binary version."""
 
+    __confirmation_lock: threading.Lock = threading.Lock()
+    """Serializes the confirmation prompts (concurrent runs)."""
+
+    __version_cache_lock: threading.Lock = threading.Lock()
+    """Serializes the version cache updates (concurrent providers in batch mode)."""
+
     def __init__(self):
         """
-        Initialize the module.
+        Initialize the module. The binary is not probed here - see: `require_binary()`.
         """
-        self.version_detect()
         atexit.register(self.cleanup)
 
+    def require_binary(self):
+        """
+        Resolves the binary path and its version - once, on the first use of the binary.
+        The path is resolved in-process (PATH lookup), the version is taken from the version cache
+        if the binary did not change (same path, inode and mtime), otherwise it is detected and cached.
+        """
+        if self.binary_path:
+            return
+
+        binary_path = shutil.which(self.binary_name)
+        if not binary_path:
+            raise SystemExit(f"Error! Required binary not found: {self.binary_name}")
+        binary_stat = os.stat(binary_path)
+        cache_item = {"inode": binary_stat.st_ino, "mtime_ns": binary_stat.st_mtime_ns}
+
+        with CommandRunner.__version_cache_lock:
+            version_cache = self.__load_version_cache()
+            cached_item = version_cache.get(binary_path, {})
+            if {key: cached_item.get(key) for key in cache_item} == cache_item and cached_item.get('version'):
+                detected_version = tuple(cached_item['version'])
+            else:
+                # `version_detect()` runs the binary from `binary_path` - reset if the detection fails,
+                # so the next call does not skip the detection
+                self.binary_path = binary_path
+                try:
+                    detected_version = self.version_detect()
+                except (Exception, SystemExit):
+                    self.binary_path = None
+                    raise
+                version_cache[binary_path] = dict(cache_item, version=list(detected_version))
+                self.__save_version_cache(version_cache)
+
+        self.binary_path = binary_path
+        self.detected_version = detected_version
+
+    @staticmethod
+    def __get_version_cache_path() -> str:
+        """
+        Returns the path of the binary version cache.
+        """
+        return FileSystem.get_state_directory() + '/binary_versions.json'
+
+    @classmethod
+    def __load_version_cache(cls) -> dict:
+        """
+        Loads the binary version cache. Broken cache is ignored (rebuilt).
+        :return: dict of binary path -> {inode, mtime_ns, version}.
+        """
+        try:
+            with open(cls.__get_version_cache_path(), 'r') as file:
+                version_cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return version_cache if isinstance(version_cache, dict) else {}
+
+    @classmethod
+    def __save_version_cache(cls, version_cache: dict):
+        """
+        Saves the binary version cache (atomically - via a temporary file).
+        """
+        cache_path = cls.__get_version_cache_path()
+        with open(cache_path + f'.{os.getpid()}.tmp', 'w') as file:
+            json.dump(version_cache, file, indent=4, sort_keys=True)
+        os.replace(cache_path + f'.{os.getpid()}.tmp', cache_path)
+
     @staticmethod
     def os_exec(command: list, confirmation_required: bool = False, silent: bool = False, capture_output: bool = True,
                 logging_enabled: bool = True, logging_enabled_runtime: bool = False, continue_on_failure: bool = False
-                ) -> subprocess.CompletedProcess:
+                ) -> CommandResult:
         """
         A runner method. Throws exception when returncode is not 0.
         :param command: Command and the parameters in the form of a list.
         :param confirmation_required: bool value, False by default. Decide if we should ask user for the confirmation.
+        Ignored in non-interactive (batch) mode.
         :param silent: bool value, False by default. Allows to suppress printing the binary name that gets executed.
         :param capture_output: bool value, True by default. Allows to control whether the command output is captured.
         :param logging_enabled: bool value, True by default. Allows to control whether the logging feature is enabled.
@@ -50,47 +132,201 @@ class CommandRunner:
         Allows to capture the command run time.
         :param continue_on_failure: bool value, False by default. Allows to continue normal execution on failures
         (allows to accept non-zero result codes).
-        :return: CompletedProcess object.
+        :return: CommandResult object (CompletedProcess with the exec ID and the resource usage).
+        """
+        return CommandRunner.__exec_command(
+            command,
+            lambda exec_command, process_env: CommandRunner.__run_captured(exec_command, capture_output, process_env),
+            confirmation_required, silent, logging_enabled, logging_enabled_runtime, continue_on_failure
+        )
+
+    @staticmethod
+    def os_exec_stream(command: list, line_handler: Callable[[str], None], confirmation_required: bool = False,
+                       silent: bool = False, logging_enabled: bool = True, logging_enabled_runtime: bool = False,
+                       continue_on_failure: bool = False) -> CommandResult:
+        """
+        A streaming runner method. Works like os_exec(), but the standard output is passed to the `line_handler`
+        as it arrives (line by line), instead of being buffered or passed to the terminal.\n
+        Both LF and CR characters are treated as line endings (progress indicators use the latter).
+        :param command: Command and the parameters in the form of a list.
+        :param line_handler: Callable that receives every output line (without the line ending).
+        :param confirmation_required: See: os_exec().
+        :param silent: See: os_exec().
+        :param logging_enabled: See: os_exec().
+        :param logging_enabled_runtime: See: os_exec().
+        :param continue_on_failure: See: os_exec().
+        :return: CommandResult object. The `stdout` is None (consumed by the handler), `stderr` is captured.
+        """
+        return CommandRunner.__exec_command(
+            command,
+            lambda exec_command, process_env: CommandRunner.__run_streamed(exec_command, line_handler, process_env),
+            confirmation_required, silent, logging_enabled, logging_enabled_runtime, continue_on_failure
+        )
+
+    @staticmethod
+    async def os_exec_async(command: list, line_handler: Callable[[str], None] = None, timeout_secs: float = None,
+                            confirmation_required: bool = False, silent: bool = False, logging_enabled: bool = True,
+                            logging_enabled_runtime: bool = False, continue_on_failure: bool = False
+                            ) -> CommandResult:
+        """
+        asyncio runner method (coroutine). Many commands can run concurrently in a single event loop,
+        e.g. with `asyncio.gather()`. Logging, exec ID, confirmation and failure handling work like in os_exec().\n
+        The output is read incrementally. The process gets stopped when it exceeds the deadline or when the
+        coroutine is cancelled: SIGTERM first, then SIGKILL after the `kill_grace_secs` (see the settings).
+        :param command: Command and the parameters in the form of a list.
+        :param line_handler: Optional callable that receives every standard output line (LF and CR are treated as
+        line endings - see: os_exec_stream()). If not provided, the standard output is captured.
+        :param timeout_secs: Optional deadline of the run (seconds). Timed out run is a failed run (see the
+        `continue_on_failure`), the result has `timed_out` set.
+        :param confirmation_required: See: os_exec().
+        :param silent: See: os_exec().
+        :param logging_enabled: See: os_exec().
+        :param logging_enabled_runtime: See: os_exec().
+        :param continue_on_failure: See: os_exec().
+        :return: CommandResult object. The resource usage contains the wall time only.
+        """
+        # the confirmation waits for the user input - not in the event loop thread
+        exec_id, process_env, exec_command = await asyncio.to_thread(
+            CommandRunner.__prepare_exec, command, confirmation_required, silent, logging_enabled)
+        processing_time_start = time.time()
+        command_result = await CommandRunner.__run_async(exec_command, line_handler, timeout_secs, process_env)
+        if command_result.timed_out and logging_enabled:
+            Logger.log(f"{exec_id} Command timed out after {timeout_secs} [sec] - stopped.")
+        return CommandRunner.__finish_exec(command, exec_id, command_result, time.time() - processing_time_start,
+                                           logging_enabled, logging_enabled_runtime, continue_on_failure)
+
+    @staticmethod
+    async def __run_async(command: list, line_handler: Callable[[str], None] | None, timeout_secs: float | None,
+                          process_env: dict) -> CommandResult:
+        """
+        Runs the process in the event loop: reads its output, enforces the deadline, stops it on cancellation.
+        """
+        encoding = getdefaultencoding()
+        # own process group - the process gets stopped together with its children
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE, env=process_env,
+                                                       start_new_session=True)
+        stdout_chunks = []
+        stderr_chunks = []
+
+        async def read_stdout():
+            line_buffer = b''
+            while chunk := await process.stdout.read(65536):
+                if line_handler:
+                    line_buffer = CommandRunner.__handle_output_chunk(line_buffer + chunk, line_handler, encoding)
+                else:
+                    stdout_chunks.append(chunk)
+            if line_buffer:
+                line_handler(line_buffer.decode(encoding, errors='replace'))
+
+        async def read_stderr():
+            while chunk := await process.stderr.read(65536):
+                stderr_chunks.append(chunk)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(read_stdout(), read_stderr(), process.wait()), timeout_secs)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await CommandRunner.__stop_process_async(process)
+        except asyncio.CancelledError:
+            await CommandRunner.__stop_process_async(process)
+            raise
+
+        command_result = CommandResult(
+            args=command,
+            returncode=process.returncode,
+            stdout=None if line_handler else b''.join(stdout_chunks).decode(encoding, errors='replace'),
+            stderr=b''.join(stderr_chunks).decode(encoding, errors='replace')
+        )
+        command_result.timed_out = timed_out
+        return command_result
+
+    @staticmethod
+    async def __stop_process_async(process: asyncio.subprocess.Process):
+        """
+        Stops the process (and its process group) gracefully: SIGTERM, then SIGKILL if it is still running
+        after the grace period.
+        """
+        kill_grace_secs = GeneralSettings.runner["kill_grace_secs"]
+        for stop_signal in [signal.SIGTERM, signal.SIGKILL]:
+            if process.returncode is not None:
+                return
+            try:
+                os.killpg(process.pid, stop_signal)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(asyncio.shield(process.wait()), kill_grace_secs)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def __exec_command(command: list, run_process: Callable[[list, dict], CommandResult],
+                       confirmation_required: bool, silent: bool, logging_enabled: bool,
+                       logging_enabled_runtime: bool, continue_on_failure: bool) -> CommandResult:
+        """
+        Common part of the runner methods: confirmation, logging, run time and resource usage measurement,
+        and the result validation.
+        :param run_process: Callable that runs the process (receives the command to execute and the environment).
+        :return: CommandResult object.
+        """
+        exec_id, process_env, exec_command = CommandRunner.__prepare_exec(command, confirmation_required, silent,
+                                                                          logging_enabled)
+        processing_time_start = time.time()
+        command_result = run_process(exec_command, process_env)
+        return CommandRunner.__finish_exec(command, exec_id, command_result, time.time() - processing_time_start,
+                                           logging_enabled, logging_enabled_runtime, continue_on_failure)
+
+    @staticmethod
+    def __prepare_exec(command: list, confirmation_required: bool, silent: bool, logging_enabled: bool) -> tuple:
+        """
+        Runner methods - before the run: exec ID, throttling, confirmation and logging.
+        :return: Tuple: (exec ID, process environment, command to execute - see: ProcessThrottle.wrap_command()).
         """
         process_env = dict(environ)
         process_env['LC_ALL'] = 'C'
+        exec_command = ProcessThrottle.wrap_command(command)
 
         # prepare exec ID (for the logging purpose)
         exec_id = '[' + ''.join(
             random.choice(string.ascii_letters + string.digits) for _ in range(6)
         ) + ']'
 
-        if confirmation_required and GeneralSettings.runner["confirm_os_commands"]:
-            print("About to execute the command: \n"
-                  + ' '.join(command)
-                  + "\nPlease confirm.")
-            user_confirmed = UserInputConsole.read_true_or_false()
+        if confirmation_required:
+            user_confirmed = CommandRunner.request_confirmation([exec_command])
         else:
             user_confirmed = True
 
-        if user_confirmed:
-            if logging_enabled:
-                Logger.log(exec_id + " Executing command: \n" + ' '.join(command))
-            if not silent:
-                print(f"( Running: {command[0]} ... )")
-            processing_time_start = time.time()
-            command_result = subprocess.run(
-                command,
-                capture_output=capture_output,
-                encoding=getdefaultencoding(),
-                env=process_env
-            )
-            processing_time_stop = time.time()
-            time_diff_secs = processing_time_stop - processing_time_start
-            if logging_enabled and logging_enabled_runtime:
-                Logger.log(f"{exec_id} Command run time: {time_diff_secs:.2f} [sec].")
-        else:
+        if not user_confirmed:
             if logging_enabled:
-                Logger.log(exec_id + " Skipped command / execution aborted: \n" + ' '.join(command))
+                Logger.log(exec_id + " Skipped command / execution aborted: \n" + ' '.join(exec_command))
             raise SystemExit("Aborted.")
 
+        if logging_enabled:
+            Logger.log(exec_id + " Executing command: \n" + ' '.join(exec_command))
+        if not silent:
+            print(f"( Running: {command[0]} ... )")
+        return exec_id, process_env, exec_command
+
+    @staticmethod
+    def __finish_exec(command: list, exec_id: str, command_result: CommandResult, time_diff_secs: float,
+                      logging_enabled: bool, logging_enabled_runtime: bool, continue_on_failure: bool
+                      ) -> CommandResult:
+        """
+        Runner methods - after the run: run time and resource usage logging, the result validation.
+        :return: CommandResult object.
+        """
+        if logging_enabled and logging_enabled_runtime:
+            Logger.log(f"{exec_id} Command run time: {time_diff_secs:.2f} [sec].")
+        command_result.exec_id = exec_id
+        command_result.resource_usage['wall_secs'] = time_diff_secs
+        if logging_enabled:
+            Logger.log(f"{exec_id} Resource usage: {json.dumps(command_result.resource_usage, sort_keys=True)}")
+
         if command_result.returncode != 0:
             failed_msg = str(f"{exec_id} Error: Failed to run: {command} "
+                             + (" (timed out)" if command_result.timed_out else "")
                              + f"\nDetails: \nSTDOUT: {command_result.stdout}\nSTDERR: {command_result.stderr}\n")
             if logging_enabled:
                 Logger.log(failed_msg)
@@ -99,6 +335,156 @@ class CommandRunner:
 
         return command_result
 
+    @staticmethod
+    def __run_captured(command: list, capture_output: bool, process_env: dict) -> CommandResult:
+        """
+        Runs the process (like `subprocess.run()`). The output (if captured) is read in the background.
+        """
+        pipe = subprocess.PIPE if capture_output else None
+        process = subprocess.Popen(command, stdout=pipe, stderr=pipe, encoding=getdefaultencoding(), env=process_env)
+
+        captured_output = {}
+        output_readers = []
+        if capture_output:
+            for stream_name, stream in [("stdout", process.stdout), ("stderr", process.stderr)]:
+                output_reader = threading.Thread(
+                    target=lambda name=stream_name, source=stream: captured_output.update({name: source.read()}),
+                    daemon=True)
+                output_reader.start()
+                output_readers.append(output_reader)
+
+        return_code, resource_usage = CommandRunner.__wait_with_usage(process)
+        for output_reader in output_readers:
+            output_reader.join()
+        if capture_output:
+            process.stdout.close()
+            process.stderr.close()
+
+        return CommandResult(
+            args=command,
+            returncode=return_code,
+            stdout=captured_output.get("stdout"),
+            stderr=captured_output.get("stderr"),
+            resource_usage=resource_usage
+        )
+
+    @staticmethod
+    def __wait_with_usage(process: subprocess.Popen) -> tuple:
+        """
+        Waits for the process and collects its resource usage: the I/O counters are read from the `/proc/<pid>/io`
+        while the finished process is not reaped yet (`waitid` with WNOWAIT), then it gets reaped with `wait4`
+        (rusage of the process, including its own waited-for children).
+        The process is killed if the waiting gets interrupted (e.g. KeyboardInterrupt) - like in `subprocess.run()`.
+        :return: Tuple: (return code, resource usage dict).
+        """
+        try:
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            resource_usage = CommandRunner.__read_process_io(process.pid)
+            _, wait_status, rusage = os.wait4(process.pid, 0)
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+        resource_usage.update({
+            "cpu_user_secs": rusage.ru_utime,
+            "cpu_sys_secs": rusage.ru_stime,
+            "max_rss_kb": rusage.ru_maxrss,
+            "voluntary_ctx_switches": rusage.ru_nvcsw,
+            "involuntary_ctx_switches": rusage.ru_nivcsw
+        })
+        return process.returncode, resource_usage
+
+    @staticmethod
+    def __read_process_io(pid: int) -> dict:
+        """
+        Reads the I/O counters of the process: bytes read from / written to the storage, and all the characters
+        read / written (including pipes, sockets and the page cache hits). Empty if not available.
+        """
+        io_counters = {}
+        try:
+            with open(f"/proc/{pid}/io", 'r') as io_file:
+                for line in io_file:
+                    key, _, value = line.partition(':')
+                    io_counters[key] = int(value)
+        except (OSError, ValueError):
+            return {}
+        return {
+            "read_bytes": io_counters.get("read_bytes"),
+            "write_bytes": io_counters.get("write_bytes"),
+            "read_chars": io_counters.get("rchar"),
+            "write_chars": io_counters.get("wchar")
+        }
+
+    @staticmethod
+    def __run_streamed(command: list, line_handler: Callable[[str], None],
+                       process_env: dict) -> CommandResult:
+        """
+        Runs the process and passes its standard output to the handler, line by line.
+        The standard error output is collected in the background.
+        """
+        encoding = getdefaultencoding()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=process_env)
+
+        stderr_chunks = []
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+
+        line_buffer = b''
+        while chunk := process.stdout.read1(65536):
+            line_buffer = CommandRunner.__handle_output_chunk(line_buffer + chunk, line_handler, encoding)
+        if line_buffer:
+            line_handler(line_buffer.decode(encoding, errors='replace'))
+
+        return_code, resource_usage = CommandRunner.__wait_with_usage(process)
+        stderr_reader.join()
+        process.stdout.close()
+        process.stderr.close()
+        return CommandResult(
+            args=command,
+            returncode=return_code,
+            stdout=None,
+            stderr=b''.join(stderr_chunks).decode(encoding, errors='replace'),
+            resource_usage=resource_usage
+        )
+
+    @staticmethod
+    def __handle_output_chunk(line_buffer: bytes, line_handler: Callable[[str], None], encoding: str) -> bytes:
+        """
+        Passes the complete lines of the buffer to the handler (LF and CR are the line endings).
+        :return: The rest of the buffer (incomplete line).
+        """
+        lines = re.split(b'[\r\n]', line_buffer)
+        line_buffer = lines.pop()
+        for line in lines:
+            if line:
+                line_handler(line.decode(encoding, errors='replace'))
+        return line_buffer
+
+    @staticmethod
+    def request_confirmation(commands: list) -> bool:
+        """
+        Asks the user for the confirmation of the command(s) - if enabled in the settings.
+        Always confirmed in non-interactive (batch) mode.
+        :param commands: List of commands (each command in the form of a list).
+        :return: bool value, True if confirmed.
+        """
+        if not GeneralSettings.runner["confirm_os_commands"] or not UserInputConsole.interactive:
+            return True
+
+        # one prompt at a time (concurrent runs)
+        with CommandRunner.__confirmation_lock:
+            if len(commands) == 1:
+                print("About to execute the command: \n"
+                      + ' '.join(commands[0])
+                      + "\nPlease confirm.")
+            else:
+                print(f"About to execute {len(commands)} commands: \n"
+                      + '\n'.join(' '.join(command) for command in commands)
+                      + "\nPlease confirm.")
+            return UserInputConsole.read_true_or_false()
+
     @staticmethod
     def gen_run_report(exec_command, stdout, stderr, logging_enabled: bool = True) -> str:
         """
@@ -126,6 +512,7 @@ class CommandRunner:
         Prints info about detected binary version.
         Validates the version and throws an exception if it is not correct.
         """
+        self.require_binary()
         print_detected_version = '.'.join(map(str, self.detected_version))
         print_accepted_version = '.'.join(map(str, self.accepted_version))
 
@@ -149,9 +536,10 @@ class CommandRunner:
         """
         pass
 
-    def version_detect(self):
+    def version_detect(self) -> tuple:
         """
-        Detects the binary's version and pre-sets required variables.
+        Detects the binary's version (runs the binary, `binary_path` is already set).
+        :return: The version tuple, e.g. (3, 2, 7).
         """
         raise Exception(f" (( {self.__class__} Not implemented! )) ")
 
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
 import re
+import shutil
 import time
 from functools import wraps
+from threading import Lock
+
+import GeneralSettings
 
 from Src.Common.BackupAction import BackupAction
 from Src.Config.ConfigEntry import ConfigEntry
+from Src.IO.FileSystem import FileSystem
+from Src.IO.Logger import Logger
+from Src.IO.MetricsExporter import MetricsExporter
 from Src.Service.CommandRunner import CommandRunner
+from Src.Service.EncfsMountPool import EncfsMountPool
 
 
 def validate_config(method):
@@ -34,15 +42,20 @@ class CryptProvider(CommandRunner):
 
     __resource_mounted: bool = False
     """
-    Mount flag to tell us if we have the resource mounted or not.
+    Mount flag to tell us if we hold a reference to the (pooled) mount or not.
     This should be managed automatically by the functions.
     """
 
-    def version_detect(self):
-        # detect binary path
-        which_result = self.os_exec(["which", self.binary_name], silent=True, logging_enabled=False)
-        self.binary_path = str(which_result.stdout).strip()
+    __mount_key: tuple = None
+    """Key of the pooled mount that we hold: (encryption dir, decryption dir)."""
+
+    __max_poll_interval_secs: float = 2.0
+    """Upper limit of the (growing) interval between the busy-mount checks."""
+
+    __mount_lock: Lock = Lock()
+    """Serializes the mount commands, so the password prompts of concurrent runs do not interleave."""
 
+    def version_detect(self) -> tuple:
         # detect/parse the version
         version_check_result = self.os_exec([self.binary_path, "--version"], silent=True, logging_enabled=False)
         result_string = str(version_check_result.stderr).strip()
@@ -50,34 +63,64 @@ class CryptProvider(CommandRunner):
         if not matched_string:
             raise SystemExit(f"Error! Unmatched version string for: {self.binary_path}!\n{version_check_result}")
         version_string = matched_string.groups()[0]
-        self.detected_version = tuple([
+        return tuple([
             int(num) for num in version_string.split('.')
         ])
 
     def cleanup(self):
-        self.__unmount_encfs()
+        self.__release_encfs()
 
-    @validate_config
-    def __unmount_encfs(self):
+    def __release_encfs(self):
         """
-        Unmounts the data access directory.
+        Releases the pooled mount. The actual unmount is done by the pool at the end of the process.
         """
-        print("Unmounting EncFS...")
         if not self.__resource_mounted:
-            print("... skipped - already unmounted!")
             return
+        EncfsMountPool.release(self.__mount_key)
+        self.__resource_mounted = False
 
-        # It is very likely that the target is still busy.
-        # Sleep is surely a bad solution, but for now - it's enough.
-        # TODO: check if target is busy, get rid of sleep()
-        time.sleep(10.0)
+    def __unmount_encfs(self, config: ConfigEntry, decryption_dir: str):
+        """
+        Unmounts the data access directory. Called by the mount pool.
+        :param config: Config of the entry that mounted the directory (metrics).
+        :param decryption_dir: The mount point.
+        """
+        print("Unmounting EncFS...")
 
-        which_result = self.os_exec(["which", "umount"], silent=True, logging_enabled=False)
-        umount_binary = str(which_result.stdout).strip()
-        exec_command: list = [umount_binary, self.config.encfs_decryption_dir]
+        # It is very likely that the target is still busy - wait until it is idle, then unmount.
+        # Unmount gets retried (with back-off) until the timeout, as the "busy" state can be missed by the check.
+        crypt_settings = GeneralSettings.crypt_encfs
+        timeout_secs = crypt_settings["unmount_busy_timeout_secs"]
+        poll_interval_secs = crypt_settings["unmount_poll_interval_secs"]
+        time_start = time.time()
+
+        while FileSystem.is_path_in_use(decryption_dir) and time.time() - time_start < timeout_secs:
+            time.sleep(poll_interval_secs)
+            poll_interval_secs = min(poll_interval_secs * 2, self.__max_poll_interval_secs)
+        Logger.log(f"Waited {time.time() - time_start:.2f} [sec] for the idle mount: {decryption_dir}")
+
+        umount_binary = shutil.which("umount")
+        if not umount_binary:
+            raise SystemExit("Error! Required binary not found: umount")
+        exec_command: list = [umount_binary, decryption_dir]
+
+        confirmation_required = True
+        while True:
+            umount_result = self.os_exec(exec_command, confirmation_required=confirmation_required,
+                                         continue_on_failure=True)
+            confirmation_required = False
+            if umount_result.returncode == 0 or time.time() - time_start >= timeout_secs:
+                break
+            time.sleep(poll_interval_secs)
+            poll_interval_secs = min(poll_interval_secs * 2, self.__max_poll_interval_secs)
+
+        if umount_result.returncode != 0:
+            raise SystemExit(f"Error! Failed to unmount: {decryption_dir}\n{umount_result.stderr}")
+        Logger.log(f"Unmounted after {time.time() - time_start:.2f} [sec]: {decryption_dir}")
+        MetricsExporter.record_values(config.get_entry_id(), config.general_name,
+                                      {"unmount_seconds": time.time() - time_start})
+        MetricsExporter.write(config.get_entry_id())
 
-        umount_result = self.os_exec(exec_command, confirmation_required=True)
-        self.__resource_mounted = False
         self.gen_run_report(exec_command, umount_result.stdout, umount_result.stderr)
 
     @validate_config
@@ -90,10 +133,24 @@ class CryptProvider(CommandRunner):
             print("... skipped - already mounted!")
             return
 
-        exec_command: list = [self.binary_path, self.config.encfs_encryption_dir, self.config.encfs_decryption_dir]
-        mount_result = self.os_exec(exec_command, confirmation_required=True, capture_output=False)
-        self.__resource_mounted = True
-        self.gen_run_report(exec_command, mount_result.stdout, mount_result.stderr)
+        self.require_binary()
+        mount_key = (self.config.encfs_encryption_dir, self.config.encfs_decryption_dir)
+        with self.__mount_lock:
+            if EncfsMountPool.acquire(mount_key):
+                print("... reusing the existing mount.")
+                mount_secs = 0.0
+            else:
+                exec_command: list = [self.binary_path] + GeneralSettings.crypt_encfs["encfs_mount_params"] \
+                    + list(mount_key)
+                mount_result = self.os_exec(exec_command, confirmation_required=True, capture_output=False)
+                config = self.config
+                EncfsMountPool.register(mount_key, lambda: self.__unmount_encfs(config, mount_key[1]))
+                self.gen_run_report(exec_command, mount_result.stdout, mount_result.stderr)
+                mount_secs = mount_result.resource_usage['wall_secs']
+            MetricsExporter.record_values(self.config.get_entry_id(), self.config.general_name,
+                                          {"mount_seconds": mount_secs})
+            self.__mount_key = mount_key
+            self.__resource_mounted = True
 
     def set_config(self, config: ConfigEntry):
         """
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import time
+
+import GeneralSettings
+from Src.IO.FileManifest import FileManifest
+from Src.IO.Logger import Logger
+from Src.Service.TreeVerifier import TreeVerifier
+
+
+class DuplicateLinker:
+    """
+    Duplicate content handling of the backup: the source files with identical content are found before the sync,
+    only one copy of every group (the first path) gets transferred, and the other copies are hard-linked to it
+    in the backup. The metadata of the copies is saved in the backup (map file), to be restored with the files.
+    """
+
+    map_file_name: str = ".eesync-dedup.json"
+    """Map file (in the backup root): duplicate path -> copy path and the own metadata of the duplicate."""
+
+    temp_suffix: str = ".eesync-link"
+
+    def __init__(self, source_dir: str, target_dir: str):
+        """
+        Initializes the linker.
+        :param source_dir: Source directory (data).
+        :param target_dir: Target directory (backup root).
+        """
+        self.source_dir = source_dir
+        self.target_dir = target_dir
+        self.entries: dict = {}
+        self.duplicates: dict = {}
+        """Duplicate path -> path of the transferred copy (first path of the group)."""
+        self.saved_bytes: int = 0
+
+    def find(self, entries: dict = None):
+        """
+        Finds the duplicates: files of the same size (above the limit) are hashed, then grouped by the hash.
+        :param entries: Source tree already scanned by the caller (see: FileManifest.scan()), optional.
+        """
+        time_start = time.time()
+        if entries is None:
+            entries = FileManifest.scan(self.source_dir, GeneralSettings.sync_rsync["rsync_shards_scan_workers"])
+        self.entries = entries
+
+        min_size = GeneralSettings.dedup["min_size_kb"] * 1024
+        size_groups = {}
+        for path, (size, _, _, kind) in entries.items():
+            if kind == FileManifest.KIND_FILE and size >= max(min_size, 1):
+                size_groups.setdefault(size, []).append(path)
+        candidates = [path for paths in size_groups.values() if len(paths) > 1 for path in paths]
+
+        content_groups = {}
+        if candidates:
+            hashes = TreeVerifier().hash_trees([(self.source_dir, entries)], candidates)[0]
+            for path in candidates:
+                if hashes[path] is not None:
+                    content_groups.setdefault((entries[path][0], hashes[path]), []).append(path)
+
+        self.duplicates = {}
+        self.saved_bytes = 0
+        for (size, _), paths in content_groups.items():
+            copy_path, *duplicate_paths = sorted(paths)
+            for duplicate_path in duplicate_paths:
+                self.duplicates[duplicate_path] = copy_path
+                self.saved_bytes += size
+
+        Logger.log(f"Duplicates: {len(self.duplicates)} files ({self.saved_bytes} bytes), "
+                   + f"{len(candidates)} candidates hashed, done in {time.time() - time_start:.2f} [sec].")
+
+    def write_filter(self, filter_path: str):
+        """
+        Writes the rsync exclude rules (NUL separated, for `--exclude-from` with `--from0`): the duplicates
+        and the map file. Excluded paths are not deleted on the target either.
+        """
+        with open(filter_path, 'wb') as file:
+            file.write(b''.join(os.fsencode(self.get_exclude_rule(path)) + b'\0'
+                                for path in [self.map_file_name] + sorted(self.duplicates)))
+
+    @staticmethod
+    def get_exclude_rule(path: str) -> str:
+        """
+        Returns the rsync exclude rule matching exactly the given path (anchored at the transfer root).
+        Backslash escapes the wildcard characters - only if the rule has any wildcards.
+        """
+        if any(character in path for character in "*?["):
+            path = ''.join('\\' + character if character in "*?[\\" else character for character in path)
+        return '/' + path
+
+    def prepare_target(self):
+        """
+        Removes the links of the previous backup that are not duplicates (of the same copy) anymore.
+        The files are transferred again by rsync - as independent files.
+        """
+        previous_map = self.load_map(self.target_dir)
+        for path, duplicate_info in previous_map.items():
+            if self.duplicates.get(path) != duplicate_info["copy"]:
+                try:
+                    os.remove(os.path.join(self.target_dir, path))
+                except FileNotFoundError:
+                    pass
+
+    def link_target(self) -> dict:
+        """
+        Links the duplicates to their copies in the backup (after a successful sync) and saves the map file.
+        Duplicates changed since the scan, and the ones that could not be linked, are copied from the source.
+        :return: dict with the counts: linked, already linked, copied.
+        """
+        counts = {"linked": 0, "already_linked": 0, "copied": 0}
+        duplicates_map = {}
+        for path, copy_path in sorted(self.duplicates.items()):
+            source_path = os.path.join(self.source_dir, path)
+            target_path = os.path.join(self.target_dir, path)
+            try:
+                source_stat = os.lstat(source_path)
+            except FileNotFoundError:
+                continue
+            scanned_size, scanned_mtime_ns, _, _ = self.entries[path]
+            try:
+                if (source_stat.st_size, source_stat.st_mtime_ns) != (scanned_size, scanned_mtime_ns):
+                    raise OSError("changed since the scan")
+                if os.path.exists(target_path) \
+                        and os.path.samestat(os.lstat(target_path), os.lstat(os.path.join(self.target_dir, copy_path))):
+                    counts["already_linked"] += 1
+                else:
+                    os.link(os.path.join(self.target_dir, copy_path), target_path + self.temp_suffix)
+                    os.replace(target_path + self.temp_suffix, target_path)
+                    counts["linked"] += 1
+            except OSError as error:
+                Logger.log(f"Duplicates: copying {path} instead of linking ({error}).")
+                try:
+                    os.remove(target_path + self.temp_suffix)
+                except FileNotFoundError:
+                    pass
+                # the target may be a link - shared with the copy, so it is replaced (not overwritten)
+                if os.path.lexists(target_path):
+                    os.remove(target_path)
+                shutil.copy2(source_path, target_path)
+                counts["copied"] += 1
+                continue
+            duplicates_map[path] = {
+                "copy": copy_path,
+                "mode": source_stat.st_mode & 0o7777,
+                "uid": source_stat.st_uid,
+                "gid": source_stat.st_gid,
+                "atime_ns": source_stat.st_atime_ns,
+                "mtime_ns": source_stat.st_mtime_ns
+            }
+
+        map_path = os.path.join(self.target_dir, self.map_file_name)
+        with open(map_path + '.tmp', 'w') as file:
+            json.dump({"duplicates": duplicates_map}, file)
+        os.replace(map_path + '.tmp', map_path)
+        return counts
+
+    @classmethod
+    def load_map(cls, backup_dir: str) -> dict:
+        """
+        Loads the map of the backup.
+        :return: dict of duplicate path -> info (copy path and metadata), empty if there is no map.
+        """
+        try:
+            with open(os.path.join(backup_dir, cls.map_file_name), 'r') as file:
+                return json.load(file)["duplicates"]
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError) as error:
+            raise SystemExit(f"Error! Broken duplicates map in: {backup_dir} ({error})")
+
+    @classmethod
+    def restore_metadata(cls, backup_dir: str, data_dir: str, paths: list = None) -> int:
+        """
+        Restores the own metadata of the duplicates (restored by rsync from the shared, hard-linked files).
+        Ownership is restored only if permitted.
+        :param paths: Restored paths (partial restore), None - all the duplicates.
+        :return: Number of the updated files.
+        """
+        duplicates_map = cls.load_map(backup_dir)
+        selected_paths = set(paths) if paths is not None else None
+        updated_count = 0
+        for path, duplicate_info in duplicates_map.items():
+            if selected_paths is not None and path not in selected_paths:
+                continue
+            data_path = os.path.join(data_dir, path)
+            try:
+                try:
+                    os.chown(data_path, duplicate_info["uid"], duplicate_info["gid"], follow_symlinks=False)
+                except PermissionError:
+                    pass
+                os.chmod(data_path, duplicate_info["mode"])
+                os.utime(data_path, ns=(duplicate_info["atime_ns"], duplicate_info["mtime_ns"]))
+                updated_count += 1
+            except FileNotFoundError:
+                continue
+        return updated_count
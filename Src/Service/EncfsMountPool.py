@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import atexit
+import os
+from threading import Lock
+from typing import Callable
+
+from Src.IO.Logger import Logger
+
+
+class EncfsMountPool:
+    """
+    Process-wide pool of the EncFS mounts, keyed by (encryption dir, decryption dir).
+    A live mount is shared (reference counted) by all the users of the same directories,
+    and it gets unmounted only once - at the end of the process.
+    """
+
+    __mounts: dict = {}
+    """Pooled mounts: key -> {"ref_count": int, "unmount": callable}."""
+
+    __lock: Lock = Lock()
+    __cleanup_registered: bool = False
+
+    @classmethod
+    def acquire(cls, mount_key: tuple) -> bool:
+        """
+        Tries to reuse a pooled mount. The mount must be still alive (checked with `os.path.ismount`).
+        :param mount_key: Tuple: (encryption dir, decryption dir).
+        :return: bool value, True if the mount was reused (reference taken), False if it has to be mounted.
+        """
+        with cls.__lock:
+            mount = cls.__mounts.get(mount_key)
+            if mount is None:
+                return False
+            if not os.path.ismount(mount_key[1]):
+                Logger.log(f"Pooled EncFS mount is gone (not a mount point anymore): {mount_key[1]}")
+                del cls.__mounts[mount_key]
+                return False
+            mount['ref_count'] += 1
+            Logger.log(f"Reusing pooled EncFS mount (references: {mount['ref_count']}): {mount_key[1]}")
+            return True
+
+    @classmethod
+    def register(cls, mount_key: tuple, unmount_method: Callable[[], None]):
+        """
+        Adds a fresh mount to the pool (with one reference taken).
+        :param mount_key: Tuple: (encryption dir, decryption dir).
+        :param unmount_method: Callable that unmounts the resource. Called once, at the end of the process.
+        """
+        with cls.__lock:
+            cls.__mounts[mount_key] = {"ref_count": 1, "unmount": unmount_method}
+            if not cls.__cleanup_registered:
+                atexit.register(cls.cleanup)
+                cls.__cleanup_registered = True
+
+    @classmethod
+    def release(cls, mount_key: tuple):
+        """
+        Releases the reference. The resource stays mounted (until the end of the process).
+        :param mount_key: Tuple: (encryption dir, decryption dir).
+        """
+        with cls.__lock:
+            mount = cls.__mounts.get(mount_key)
+            if mount is not None:
+                mount['ref_count'] = max(0, mount['ref_count'] - 1)
+
+    @classmethod
+    def cleanup(cls):
+        """
+        Unmounts all the pooled mounts. This method will be called automatically at the end of execution.
+        """
+        with cls.__lock:
+            mounts = list(cls.__mounts.items())
+            cls.__mounts.clear()
+
+        for mount_key, mount in mounts:
+            if mount['ref_count'] > 0:
+                Logger.log(f"EncFS mount still referenced ({mount['ref_count']}) at exit: {mount_key[1]}")
+            try:
+                mount['unmount']()
+            except (Exception, SystemExit) as error:
+                print(f"Failed to unmount: {mount_key[1]}")
+                Logger.log(f"Failed to unmount: {mount_key[1]}\n{error}")
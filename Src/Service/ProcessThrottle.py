@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+from threading import Lock
+
+import GeneralSettings
+from Src.IO.Logger import Logger
+
+
+class ProcessThrottle:
+    """
+    Throttling of the external processes (see: `throttle` in the settings), so the backups do not starve
+    the other workloads of the host:\n
+    - the selected binaries (rsync, encfs) are started under `ionice` and `nice` (command prefix),\n
+    - the rsync bandwidth limit (`--bwlimit`) is set from the measured system load and I/O pressure
+      at every rsync start.
+    """
+
+    __bwlimit_kbps: int = 0
+    """Bandwidth limit of the latest rsync start (per process, KiB/s). Value 0 means no limit."""
+
+    __lock: Lock = Lock()
+    __missing_binaries: set = set()
+    __pressure_unavailable: bool = False
+
+    @classmethod
+    def wrap_command(cls, command: list) -> list:
+        """
+        Prefixes the command with `ionice` / `nice` - if the command binary is one of the throttled ones.
+        Missing prefix binaries are skipped (logged once).
+        :param command: Command and the parameters in the form of a list.
+        :return: The (possibly prefixed) command.
+        """
+        throttle_settings = GeneralSettings.throttle
+        if not throttle_settings["enabled"] \
+                or os.path.basename(command[0]) not in throttle_settings["throttled_binaries"]:
+            return command
+
+        prefix = []
+        if throttle_settings["ionice_class"] and cls.__has_binary("ionice"):
+            prefix += ["ionice", "-c", str(throttle_settings["ionice_class"])]
+            if throttle_settings["ionice_class"] == 2:
+                prefix += ["-n", str(throttle_settings["ionice_level"])]
+        if throttle_settings["nice_level"] and cls.__has_binary("nice"):
+            prefix += ["nice", "-n", str(throttle_settings["nice_level"])]
+        return prefix + command
+
+    @classmethod
+    def __has_binary(cls, binary_name: str) -> bool:
+        """
+        Checks if the binary is available (the missing one is logged once).
+        """
+        if shutil.which(binary_name):
+            return True
+        with cls.__lock:
+            if binary_name not in cls.__missing_binaries:
+                cls.__missing_binaries.add(binary_name)
+                Logger.log(f"Throttling: `{binary_name}` not found - skipped.")
+        return False
+
+    @classmethod
+    def get_bwlimit_params(cls, concurrent_runs: int = 1) -> list:
+        """
+        Measures the load and returns the rsync bandwidth limit parameters. Changes of the limit are logged.
+        :param concurrent_runs: Number of the rsync processes started together (e.g. shards) - they share the limit.
+        :return: List of the parameters, empty if there is no limit (or the throttling is disabled).
+        """
+        throttle_settings = GeneralSettings.throttle
+        if not throttle_settings["enabled"] or not throttle_settings["bwlimit_enabled"]:
+            return []
+
+        io_pressure = cls.read_io_pressure()
+        load_per_cpu = cls.read_load_per_cpu()
+        bwlimit_kbps = cls.compute_bwlimit(io_pressure, load_per_cpu)
+        with cls.__lock:
+            if bwlimit_kbps != cls.__bwlimit_kbps:
+                Logger.log(f"Throttling: rsync bandwidth limit changed: {cls.__format_limit(cls.__bwlimit_kbps)} -> "
+                           + f"{cls.__format_limit(bwlimit_kbps)} (I/O pressure: "
+                           + (f"{io_pressure:.1f}%" if io_pressure is not None else "n/a")
+                           + f", load per CPU: {load_per_cpu:.2f})")
+                cls.__bwlimit_kbps = bwlimit_kbps
+        if not bwlimit_kbps:
+            return []
+        return [f"--bwlimit={max(1, bwlimit_kbps // max(1, concurrent_runs))}"]
+
+    @staticmethod
+    def compute_bwlimit(io_pressure: float | None, load_per_cpu: float) -> int:
+        """
+        Maps the measurements to the bandwidth limit: no limit below the low thresholds, the maximum limit
+        at the low thresholds, lowered linearly down to the minimum limit at the high thresholds.
+        The higher of the two measurements (relative to its thresholds) wins.
+        :param io_pressure: I/O pressure (%), None if not available - the load only is used then.
+        :param load_per_cpu: System load (1 minute average) per CPU.
+        :return: The limit (KiB/s), 0 - no limit.
+        """
+        throttle_settings = GeneralSettings.throttle
+        severities = [(load_per_cpu - throttle_settings["load_low"])
+                      / max(throttle_settings["load_high"] - throttle_settings["load_low"], 0.01)]
+        if io_pressure is not None:
+            severities.append((io_pressure - throttle_settings["io_pressure_low"])
+                              / max(throttle_settings["io_pressure_high"] - throttle_settings["io_pressure_low"], 0.01))
+        severity = max(severities)
+        if severity < 0:
+            return 0
+        max_kbps = throttle_settings["bwlimit_max_kbps"]
+        min_kbps = min(throttle_settings["bwlimit_min_kbps"], max_kbps)
+        return int(max_kbps - min(severity, 1.0) * (max_kbps - min_kbps))
+
+    @classmethod
+    def read_io_pressure(cls) -> float | None:
+        """
+        Reads the I/O pressure: the share of the time (%) in which some tasks were stalled on I/O
+        (`/proc/pressure/io`, 10 seconds average).
+        :return: The pressure, None if not available (kernel without PSI) - logged once.
+        """
+        try:
+            with open("/proc/pressure/io", 'r') as pressure_file:
+                for line in pressure_file:
+                    kind, *values = line.split()
+                    if kind == "some":
+                        return float(dict(value.split('=') for value in values)["avg10"])
+        except (OSError, ValueError, KeyError):
+            pass
+        with cls.__lock:
+            if not cls.__pressure_unavailable:
+                cls.__pressure_unavailable = True
+                Logger.log("Throttling: I/O pressure (/proc/pressure/io) not available - using the system load only.")
+        return None
+
+    @staticmethod
+    def read_load_per_cpu() -> float:
+        """
+        Reads the system load (`/proc/loadavg`, 1 minute average) divided by the number of CPUs.
+        """
+        try:
+            load_average = os.getloadavg()[0]
+        except OSError:
+            return 0.0
+        return load_average / (os.cpu_count() or 1)
+
+    @staticmethod
+    def __format_limit(bwlimit_kbps: int) -> str:
+        """
+        Formats the limit for the log.
+        """
+        return f"{bwlimit_kbps} KiB/s" if bwlimit_kbps else "no limit"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import time
+
+
+class RsyncPlan:
+    """
+    Dry-run plan: the changes reported by the rsync dry run (itemized output), with the counts and bytes
+    per change type. The plan can be replayed by the real run (`--files-from`), which skips the second
+    comparison of the trees.
+    """
+
+    out_format_params: list = ["--out-format=%i %l %n%L"]
+    """Rsync parameters of the itemized output (change flags, file length, name)."""
+
+    change_types: list = ["new_file", "updated_file", "deleted", "created", "hard_link", "attributes"]
+    """Change types of the summary."""
+
+    escape_regex = re.compile(r"\\#([0-7]{3})")
+    """Rsync escapes of the unprintable characters in the names, e.g. `\\#012`."""
+
+    def __init__(self):
+        self.paths: set = set()
+        self.summary: dict = {change_type: {"count": 0, "bytes": 0} for change_type in self.change_types}
+
+    def handle_line(self, line: str) -> bool:
+        """
+        Processes the rsync output line.
+        :return: bool value, True if it was an itemized change line (consumed by the plan).
+        """
+        if line.startswith("*deleting"):
+            change_type = "deleted"
+            length_and_name = line[len("*deleting"):].lstrip()
+        elif len(line) > 12 and line[11] == ' ' and line[0] in "<>ch." and line[1] in "fdLDS":
+            change_flags = line[:11]
+            length_and_name = line[12:]
+            match change_flags[0]:
+                case '<' | '>':
+                    change_type = "new_file" if change_flags[2:].strip('+') == '' else "updated_file"
+                case 'c':
+                    change_type = "created"
+                case 'h':
+                    change_type = "hard_link"
+                case _:
+                    change_type = "attributes"
+            if change_flags[1] == 'L' or change_type == "hard_link":
+                length_and_name = re.split(r" [-=]> ", length_and_name, maxsplit=1)[0]
+        else:
+            return False
+
+        length, _, name = length_and_name.partition(' ')
+        if not length.isdigit():
+            if change_type != "deleted":
+                return False
+            length, name = '0', length_and_name
+        if not name:
+            return False
+
+        self.summary[change_type]["count"] += 1
+        if change_type in ["new_file", "updated_file"]:
+            self.summary[change_type]["bytes"] += int(length)
+        path = self.escape_regex.sub(lambda matched: chr(int(matched.group(1), 8)), name).rstrip('/')
+        if path:
+            self.paths.add(path)
+        return True
+
+    def gen_summary(self) -> str:
+        """
+        Returns the summary of the plan (for the console and the logs).
+        """
+        summary = f"Dry-run plan: {len(self.paths)} paths to sync.\n"
+        for change_type, values in self.summary.items():
+            if values["count"]:
+                summary += f"  {change_type.replace('_', ' ')}: {values['count']}"
+                if change_type in ["new_file", "updated_file"]:
+                    summary += f" ({values['bytes']} bytes)"
+                summary += '\n'
+        return summary.rstrip('\n')
+
+    def save(self, plan_path: str, source_dir: str, target_dir: str, source_fingerprint: str):
+        """
+        Saves the plan (atomically - via a temporary file).
+        :param source_fingerprint: Fingerprint of the source tree at the time of the dry run.
+        """
+        with open(plan_path + '.tmp', 'w') as file:
+            json.dump({
+                "created_at": time.time(),
+                "source_dir": source_dir,
+                "target_dir": target_dir,
+                "source_fingerprint": source_fingerprint,
+                "summary": self.summary,
+                "paths": sorted(self.paths)
+            }, file)
+        os.replace(plan_path + '.tmp', plan_path)
+
+    @classmethod
+    def load(cls, plan_path: str) -> dict | None:
+        """
+        Loads the saved plan.
+        :return: dict with the plan data, None if it is missing or broken.
+        """
+        try:
+            with open(plan_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
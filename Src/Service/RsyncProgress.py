@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import re
+import time
+
+
+class RsyncProgress:
+    """
+    Rsync output parser: live progress (`--info=progress2`) and final transfer statistics (`--stats`).
+    Feed it with the output lines using `handle_line()`.
+    """
+
+    progress_regex = re.compile(
+        r"^\s*([\d.,]+[KMGTP]?)\s+(\d+)%\s+([\d.,]+[KMGTP]?)B/s\s+(\d+:\d{2}:\d{2})"
+        r"(?:\s+\(xfr#(\d+),\s+\w+-chk=(\d+)/(\d+)\))?"
+    )
+    """Progress line, e.g: `  1.23G  45%  12.34MB/s  0:01:23 (xfr#12, to-chk=345/1000)`."""
+
+    stats_regex = re.compile(r"^((?:Number of|Total|Literal|Matched|File list)[\w ]*):\s+([\d.,]+[KMGTP]?)")
+    """Stats line, e.g: `Total transferred file size: 12.34M bytes`."""
+
+    summary_regex = re.compile(r"^sent\s+([\d.,]+[KMGTP]?) bytes\s+received\s+([\d.,]+[KMGTP]?) bytes\s+"
+                               r"([\d.,]+[KMGTP]?) bytes/sec")
+    """Summary line, e.g: `sent 12.35M bytes  received 234 bytes  2.47M bytes/sec`."""
+
+    log_prefix_regex = re.compile(r"^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2} \[\d+\] ")
+    """Rsync log file line prefix, e.g: `2024/01/31 12:34:56 [1234] `."""
+
+    log_operation_regex = re.compile(r"\b(send|recv|del\.)\s+(.*)\s(\d+)\"?$")
+    """Rsync log file line (`--log-file-format` with the `%o` operation, ending with the `%l` length)."""
+
+    def __init__(self, print_progress: bool = True, console_refresh_secs: float = 0.5):
+        """
+        Initializes the parser.
+        :param print_progress: Print the compact live progress line to the console.
+        :param console_refresh_secs: Minimal interval between the console progress updates.
+        """
+        self.print_progress = print_progress
+        self.console_refresh_secs = console_refresh_secs
+        self.time_start = time.time()
+        self.progress: dict = {}
+        self.stats: dict = {}
+        self.other_lines: list = []
+        self.__progress_printed_at: float = 0.0
+        self.__progress_line_visible: bool = False
+
+    @staticmethod
+    def parse_size(value: str) -> int:
+        """
+        Parses the rsync number (with digit separators or with the `-h` unit suffix - units of 1000).
+        """
+        value = value.replace(',', '')
+        multiplier = 1
+        if value[-1] in "KMGTP":
+            multiplier = 1000 ** ("KMGTP".index(value[-1]) + 1)
+            value = value[:-1]
+        return int(float(value) * multiplier)
+
+    @staticmethod
+    def parse_time(value: str) -> int:
+        """
+        Parses the rsync time (`h:mm:ss`) to seconds.
+        """
+        hours, minutes, seconds = value.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+    def handle_line(self, line: str):
+        """
+        Processes a single output line.
+        """
+        if matched := self.progress_regex.match(line):
+            elapsed_secs = max(time.time() - self.time_start, 0.001)
+            files_transferred = int(matched.group(5)) if matched.group(5) else self.progress.get('files_transferred', 0)
+            self.progress = {
+                "bytes_transferred": self.parse_size(matched.group(1)),
+                "percent": int(matched.group(2)),
+                "bytes_per_sec": self.parse_size(matched.group(3)),
+                "eta_secs": self.parse_time(matched.group(4)),
+                "files_transferred": files_transferred,
+                "files_per_sec": files_transferred / elapsed_secs,
+                "files_to_check": int(matched.group(6)) if matched.group(6) else None,
+                "files_total": int(matched.group(7)) if matched.group(7) else None
+            }
+            self.__print_progress()
+            return
+
+        if matched := self.stats_regex.match(line):
+            key = re.sub(r"\W+", '_', matched.group(1).strip().lower())
+            if key.endswith('_time'):
+                self.stats[key] = float(matched.group(2).replace(',', ''))
+            else:
+                self.stats[key] = self.parse_size(matched.group(2))
+        elif matched := self.summary_regex.match(line):
+            self.stats['bytes_sent'] = self.parse_size(matched.group(1))
+            self.stats['bytes_received'] = self.parse_size(matched.group(2))
+            self.stats['average_bytes_per_sec'] = self.parse_size(matched.group(3))
+
+        self.other_lines.append(line)
+        if self.print_progress:
+            self.__clear_progress_line()
+            print(line)
+
+    def __print_progress(self):
+        """
+        Prints the compact progress line (overwritten in place).
+        """
+        if not self.print_progress or time.time() - self.__progress_printed_at < self.console_refresh_secs:
+            return
+        self.__progress_printed_at = time.time()
+        print(f"\r  {self.progress['percent']:3d}% | {self.format_size(self.progress['bytes_per_sec'])}B/s "
+              + f"| {self.progress['files_transferred']} files ({self.progress['files_per_sec']:.1f} files/s) "
+              + f"| ETA {self.progress['eta_secs'] // 3600}:{self.progress['eta_secs'] // 60 % 60:02d}"
+              + f":{self.progress['eta_secs'] % 60:02d}   ", end='', flush=True)
+        self.__progress_line_visible = True
+
+    def __clear_progress_line(self):
+        """
+        Moves the console to a new line if the progress line is visible.
+        """
+        if self.__progress_line_visible:
+            print()
+            self.__progress_line_visible = False
+
+    def finish(self):
+        """
+        Finishes the console output. Call it after the process is done.
+        """
+        if self.print_progress:
+            self.__clear_progress_line()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the structured transfer statistics: the final `--stats` values and the last progress sample.
+        """
+        stats = dict(self.stats)
+        stats['elapsed_secs'] = time.time() - self.time_start
+        if self.progress:
+            stats['files_per_sec'] = self.progress['files_per_sec']
+            stats['last_bytes_per_sec'] = self.progress['bytes_per_sec']
+        return stats
+
+    def gen_report(self) -> str:
+        """
+        Returns the output for the run report (other than the progress lines).
+        """
+        return ''.join(f"{line}\n" for line in self.other_lines)
+
+    @staticmethod
+    def format_size(value: float) -> str:
+        """
+        Formats the number with the unit suffix (units of 1000).
+        """
+        for unit in ['', 'K', 'M', 'G', 'T']:
+            if value < 1000:
+                return f"{value:.2f}{unit}"
+            value /= 1000
+        return f"{value:.2f}P"
+
+    @classmethod
+    def parse_log_file(cls, log_path: str) -> dict:
+        """
+        Reads the transfer statistics from the rsync log file (`--log-file`) - when `--stats` output is not available.
+        Uses the same keys as the `--stats` values (transferred and deleted files, transferred size, sent/received).
+        """
+        stats = {
+            "number_of_regular_files_transferred": 0,
+            "number_of_deleted_files": 0,
+            "total_transferred_file_size": 0
+        }
+        with open(log_path, 'r', errors='replace') as log_file:
+            for line in log_file:
+                line = cls.log_prefix_regex.sub('', line.rstrip('\n'))
+                if matched := cls.summary_regex.match(line):
+                    stats['bytes_sent'] = cls.parse_size(matched.group(1))
+                    stats['bytes_received'] = cls.parse_size(matched.group(2))
+                elif matched := cls.log_operation_regex.search(line):
+                    if matched.group(1) == 'del.':
+                        stats['number_of_deleted_files'] += 1
+                    elif not matched.group(2).endswith('/'):
+                        stats['number_of_regular_files_transferred'] += 1
+                        stats['total_transferred_file_size'] += int(matched.group(3))
+        return stats
+
+    @staticmethod
+    def merge_stats(stats_list: list) -> dict:
+        """
+        Merges the statistics of multiple (concurrent) runs - the values are summed up.
+        Rates are summed too (the runs were concurrent), elapsed time is the longest one.
+        """
+        merged_stats = {}
+        for stats in stats_list:
+            for key, value in stats.items():
+                if key == 'elapsed_secs':
+                    merged_stats[key] = max(merged_stats.get(key, 0), value)
+                else:
+                    merged_stats[key] = merged_stats.get(key, 0) + value
+        return merged_stats
@@ -1,14 +1,38 @@
 #!/usr/bin/env python3
 
+import asyncio
+import fcntl
+import json
 import os
 import re
+import sqlite3
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import GeneralSettings
 from Src.Common.BackupAction import BackupAction
 from Src.Config.ConfigEntry import ConfigEntry
+from Src.IO.ContentIndex import ContentIndex
+from Src.IO.FileManifest import FileManifest
+from Src.IO.FileSystem import FileSystem
+from Src.IO.InotifyWatcher import InotifyWatcher
 from Src.IO.Logger import Logger
+from Src.IO.MetricsExporter import MetricsExporter
+from Src.IO.RunHistory import RunHistory
+from Src.IO.RunJournal import RunJournal
+from Src.IO.SnapshotStore import SnapshotStore
+from Src.IO.TreeScanner import TreeScanner
+from Src.IO.UserInputConsole import UserInputConsole
+from Src.Service.CommandResult import CommandResult
 from Src.Service.CommandRunner import CommandRunner
+from Src.Service.DuplicateLinker import DuplicateLinker
+from Src.Service.ProcessThrottle import ProcessThrottle
+from Src.Service.RsyncPlan import RsyncPlan
+from Src.Service.RsyncProgress import RsyncProgress
+from Src.Service.TreeVerifier import TreeVerifier
 
 
 class SyncProvider(CommandRunner):
@@ -21,11 +45,58 @@ class SyncProvider(CommandRunner):
     config: ConfigEntry = None
     """Config to be set manually with `set_config()` method."""
 
-    def version_detect(self):
-        # detect binary path
-        which_result = self.os_exec(["which", self.binary_name], silent=True, logging_enabled=False)
-        self.binary_path = str(which_result.stdout).strip()
+    last_transfer_stats: dict = None
+    """Structured transfer statistics of the last run (see: RsyncProgress.get_stats())."""
 
+    rsync_profile: str = None
+    """Name of the parameters profile chosen for the current action (see: `rsync_profiles` in the settings)."""
+
+    restore_snapshot: str = None
+    """Snapshot to restore from (snapshot mode). None - chosen by the user, or the latest one (batch mode)."""
+
+    restore_patterns: list = None
+    """Paths to restore (partial restore), glob patterns. None - asked for in interactive mode."""
+
+    rsync_exit_codes: dict = {
+        1: "syntax or usage error",
+        11: "error in file I/O",
+        12: "error in rsync protocol data stream",
+        20: "received SIGUSR1 or SIGINT",
+        23: "partial transfer due to error",
+        24: "partial transfer due to vanished source files",
+        30: "timeout in data send/receive",
+        35: "timeout waiting for daemon connection"
+    }
+    """Descriptions of the common rsync exit codes (see: `man rsync`)."""
+
+    __phase_times: dict = {}
+    """Durations of the phases of the current action: phase name -> seconds (see: MetricsExporter)."""
+
+    __source_entries: dict = None
+    """Source tree scanned during the current backup (see: FileManifest.scan()), reused by the content index."""
+
+    __filter_path: str = None
+    """Rsync exclude rules of the current action (`--exclude-from`), e.g. the duplicates."""
+
+    __link_dest_dir: str = None
+    """Previous snapshot - unchanged files are hard-linked from it (`--link-dest`), snapshot backup only."""
+
+    __rsync_profile_params: list = []
+    """Parameters of the chosen profile."""
+
+    __rsync_log_paths: list = []
+    """Rsync log files (`--log-file`) of the current action."""
+
+    __rsync_log_locks: list = []
+    """Open (shared-locked) descriptors of the rsync log files in use - the log rotation skips them."""
+
+    __plan_capture: RsyncPlan = None
+    """Dry-run plan being captured (backup dry run with the `rsync_plan_enabled` setting), None otherwise."""
+
+    __confirmation_required: bool = True
+    """Ask for the rsync command confirmation. Disabled for the repeated runs (watch mode) once confirmed."""
+
+    def version_detect(self) -> tuple:
         # detect/parse the version
         version_check_result = self.os_exec([self.binary_path, "--version"], silent=True, logging_enabled=False)
         result_string = str(version_check_result.stdout).strip()
@@ -33,7 +104,7 @@ class SyncProvider(CommandRunner):
         if not matched_string:
             raise SystemExit(f"Error! Unmatched version string for: {self.binary_path}!\n{version_check_result}")
         version_string = matched_string.groups()[0]
-        self.detected_version = tuple([
+        return tuple([
             int(num) for num in version_string.split('.')
         ])
 
@@ -43,11 +114,12 @@ class SyncProvider(CommandRunner):
         """
         self.config = config
 
-    def run(self, action: BackupAction):
+    def run(self, action: BackupAction) -> subprocess.CompletedProcess:
 
         # require config to be set before the run() is fired
         if not self.config:
             raise SystemExit(f"Internal Error! Action: {action} requested before config is set!")
+        self.require_binary()
 
         # encrypted entries support
         if self.config.encfs_enabled:
@@ -57,62 +129,990 @@ class SyncProvider(CommandRunner):
 
         effective_source_dir = str(self.config.backup_source_dir + '/')
 
-        # action mapping
+        time_start = time.time()
+        self.last_transfer_stats = None
+        self.__rsync_log_paths = []
+        self.__release_rsync_logs()
+        self.__source_entries = None
+        self.__phase_times = {}
+        try:
+            self.__select_rsync_profile(action, effective_source_dir, effective_target_dir)
+            self.__add_phase_time("profile", time_start)
+
+            # action mapping
+            if self.config.snapshots_enabled:
+                rsync_result = self.__run_snapshot_action(action, effective_source_dir, effective_target_dir)
+            elif action == BackupAction.WATCH:
+                # continuous mode - a single record would not be comparable with the other runs;
+                # the content index is not kept up to date by the watch mode
+                ContentIndex.invalidate(ContentIndex.get_index_path(self.config.get_entry_id()))
+                return self.__watch(effective_source_dir, effective_target_dir)
+            else:
+                rsync_result = self.__run_action(action, effective_source_dir, effective_target_dir)
+        except (Exception, SystemExit):
+            # the failed run is recorded too (exit code 1) - the history and the metrics count the failures
+            if action != BackupAction.WATCH:
+                if GeneralSettings.run_history["enabled"]:
+                    self.__record_run(action, time_start, 1, None)
+                self.__export_metrics(action, time_start, 1, None)
+            self.__release_rsync_logs()
+            raise
+
+        transfer_stats = self.__get_transfer_stats()
+        self.__release_rsync_logs()
+        if GeneralSettings.run_history["enabled"]:
+            self.__record_run(action, time_start, rsync_result.returncode, transfer_stats)
+        self.__export_metrics(action, time_start, rsync_result.returncode, transfer_stats,
+                              getattr(rsync_result, 'resource_usage', None))
+        return rsync_result
+
+    def __run_action(self, action: BackupAction, effective_source_dir: str, effective_target_dir: str
+                     ) -> subprocess.CompletedProcess:
+        """
+        Runs the action (regular mode - no snapshots).
+        :param effective_source_dir: Source directory (data).
+        :param effective_target_dir: Target directory (the EncFS decrypted directory for the encrypted entries).
+        :return: CompletedProcess object of the rsync run.
+        """
         match action:
             case BackupAction.BACKUP:
-                self.__exec_rsync(effective_source_dir, effective_target_dir, False)
+                # the index is saved again only after the successful backup (and if enabled)
+                index_path = ContentIndex.get_index_path(self.config.get_entry_id())
+                ContentIndex.invalidate(index_path)
+                rsync_result = self.__exec_with_dedup(
+                    effective_source_dir, effective_target_dir, False,
+                    lambda: self.__exec_backup(effective_source_dir, effective_target_dir, False))
+                if rsync_result.returncode == 0:
+                    self.__save_content_index(effective_source_dir, index_path)
             case BackupAction.BACKUP_DRY:
-                self.__exec_rsync(effective_source_dir, effective_target_dir, True)
+                rsync_result = self.__exec_with_dedup(
+                    effective_source_dir, effective_target_dir, True,
+                    lambda: self.__exec_backup(effective_source_dir, effective_target_dir, True))
             case BackupAction.RESTORE:
-                self.__exec_rsync(effective_target_dir, effective_source_dir, False)
+                rsync_result = self.__exec_restore(effective_target_dir, effective_source_dir, False)
             case BackupAction.RESTORE_DRY:
-                self.__exec_rsync(effective_target_dir, effective_source_dir, True)
+                rsync_result = self.__exec_restore(effective_target_dir, effective_source_dir, True)
+            case BackupAction.RESTORE_PARTIAL | BackupAction.RESTORE_PARTIAL_DRY:
+                rsync_result = self.__exec_restore(effective_target_dir, effective_source_dir,
+                                                   action == BackupAction.RESTORE_PARTIAL_DRY,
+                                                   ContentIndex.get_index_path(self.config.get_entry_id()))
+            case BackupAction.VERIFY:
+                rsync_result = self.__verify(effective_source_dir, effective_target_dir)
             case _:
                 raise SystemExit("Error! Wrong action: " + action.name)
+        return rsync_result
 
-    def __exec_rsync(self, source_dir: str, target_dir: str, dry_run: bool):
+    def __run_snapshot_action(self, action: BackupAction, source_dir: str, target_dir: str
+                              ) -> subprocess.CompletedProcess:
         """
-        Executes the rsync command.
+        Snapshot mode: every backup goes into a new timestamped directory of the target, unchanged files
+        are hard links to the latest snapshot (`--link-dest`). Old snapshots are pruned in the background
+        (see: `snapshots` in the settings). Restore uses the chosen snapshot.
+        :param source_dir: Source directory (data).
+        :param target_dir: Target directory (the snapshots root).
+        :return: CompletedProcess object of the rsync run.
+        """
+        latest_snapshot = SnapshotStore.get_latest(target_dir)
+        match action:
+            case BackupAction.BACKUP:
+                partial_path = SnapshotStore.create_partial(target_dir)
+                self.__link_dest_dir = os.path.abspath(latest_snapshot) if latest_snapshot else None
+                print(f"Snapshot backup: {os.path.basename(partial_path)}, "
+                      + f"linked to: {os.path.basename(latest_snapshot) if latest_snapshot else '(none)'}")
+                try:
+                    rsync_result = self.__exec_with_dedup(
+                        source_dir, partial_path + '/', False,
+                        lambda: self.__exec_rsync(source_dir, partial_path + '/', False))
+                finally:
+                    self.__link_dest_dir = None
+                if rsync_result.returncode != 0:
+                    Logger.log(f"Snapshot backup failed - left incomplete: {partial_path}")
+                    return rsync_result
+                snapshot_path = SnapshotStore.complete(partial_path)
+                Logger.log(f"Snapshot saved: {snapshot_path}")
+                entry_id = self.config.get_entry_id()
+                self.__save_content_index(source_dir, ContentIndex.get_index_path(entry_id,
+                                                                                  os.path.basename(snapshot_path)))
+                ContentIndex.remove_stale(entry_id, SnapshotStore.list_snapshots(target_dir))
+                SnapshotStore.start_pruning(target_dir)
+                return rsync_result
+            case BackupAction.BACKUP_DRY:
+                # changes since the latest snapshot (an empty directory stands in for the first one)
+                if latest_snapshot:
+                    print(f"Snapshot backup (dry run) - changes since: {os.path.basename(latest_snapshot)}")
+                    return self.__exec_with_dedup(source_dir, latest_snapshot + '/', True,
+                                                  lambda: self.__exec_rsync(source_dir, latest_snapshot + '/', True))
+                partial_path = SnapshotStore.create_partial(target_dir)
+                try:
+                    return self.__exec_with_dedup(source_dir, partial_path + '/', True,
+                                                  lambda: self.__exec_rsync(source_dir, partial_path + '/', True))
+                finally:
+                    os.rmdir(partial_path)
+            case BackupAction.RESTORE | BackupAction.RESTORE_DRY:
+                snapshot_name = self.__choose_snapshot(target_dir)
+                print(f"Restoring the snapshot: {snapshot_name}")
+                Logger.log(f"Restoring the snapshot: {snapshot_name}")
+                return self.__exec_restore(os.path.join(target_dir, snapshot_name) + '/', source_dir,
+                                           action == BackupAction.RESTORE_DRY)
+            case BackupAction.RESTORE_PARTIAL | BackupAction.RESTORE_PARTIAL_DRY:
+                snapshot_name = self.__choose_snapshot(target_dir)
+                print(f"Restoring from the snapshot: {snapshot_name}")
+                return self.__exec_restore(os.path.join(target_dir, snapshot_name) + '/', source_dir,
+                                           action == BackupAction.RESTORE_PARTIAL_DRY,
+                                           ContentIndex.get_index_path(self.config.get_entry_id(), snapshot_name))
+            case BackupAction.VERIFY:
+                snapshot_name = self.__choose_snapshot(target_dir)
+                print(f"Verifying the snapshot: {snapshot_name}")
+                return self.__verify(source_dir, os.path.join(target_dir, snapshot_name) + '/')
+            case BackupAction.WATCH:
+                raise SystemExit("Error! Watch mode is not supported for the entries with snapshots.")
+            case _:
+                raise SystemExit("Error! Wrong action: " + action.name)
+
+    def __save_content_index(self, source_dir: str, index_path: str):
+        """
+        Saves the content index of the backup (if enabled in the settings) - the source tree scanned
+        during the backup, or scanned now.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        if not rsync_settings["rsync_content_index_enabled"]:
+            return
+        time_start = time.time()
+        entries = self.__source_entries
+        if entries is None:
+            entries = self.__scan_tree(source_dir)
+        FileManifest.save(index_path, entries)
+        Logger.log(f"Content index saved: {index_path} ({len(entries)} entries, {time.time() - time_start:.2f} [sec])")
+        self.__add_phase_time("content_index", time_start)
+
+    def __exec_with_dedup(self, source_dir: str, target_dir: str, dry_run: bool, exec_backup
+                          ) -> subprocess.CompletedProcess:
+        """
+        Executes the backup with the duplicates handling (if enabled in the settings): the duplicates found
+        in the source are excluded from the sync, then hard-linked to their copies in the backup (see: DuplicateLinker).
         :param source_dir: Source directory - what to copy?
         :param target_dir: Target directory - where to save a copy?
-        :param dry_run: Should we do a test run? True means that rsync will only list the changes
-        (but will not do anything to the files)
+        :param dry_run: Is it a test run? Nothing gets linked then.
+        :param exec_backup: Callable that runs the backup (returns the CompletedProcess object).
+        :return: CompletedProcess object of the rsync run.
         """
+        if not GeneralSettings.dedup["enabled"]:
+            return exec_backup()
 
-        # validate source and target directories
-        for path in (source_dir, target_dir):
-            if not os.path.isdir(path):
-                raise SystemExit("Error! Not a directory: " + path)
+        if self.__source_entries is None:
+            self.__source_entries = self.__scan_tree(source_dir)
+        time_start = time.time()
+        duplicate_linker = DuplicateLinker(source_dir, target_dir)
+        duplicate_linker.find(self.__source_entries)
+        self.__add_phase_time("dedup", time_start)
+        print(f"Duplicates: {len(duplicate_linker.duplicates)} files, {duplicate_linker.saved_bytes} bytes "
+              + "not transferred (hard-linked in the backup).")
+
+        filter_path = self.__create_temp_file("exclude")
+        duplicate_linker.write_filter(filter_path)
+        if not dry_run:
+            duplicate_linker.prepare_target()
+        self.__filter_path = filter_path
+        try:
+            rsync_result = exec_backup()
+        finally:
+            self.__filter_path = None
+            os.remove(filter_path)
+
+        if rsync_result.returncode == 0 and not dry_run:
+            time_start = time.time()
+            link_counts = duplicate_linker.link_target()
+            Logger.log(f"Duplicates linked in the backup: {link_counts}")
+            self.__add_phase_time("dedup", time_start)
+        return rsync_result
+
+    def __exec_restore(self, backup_dir: str, data_dir: str, dry_run: bool, index_path: str = None
+                       ) -> subprocess.CompletedProcess:
+        """
+        Executes the restore - of the whole backup, or of the selected paths only (partial restore).
+        The duplicates (hard-linked in the backup) are restored as independent files, with their own metadata.
+        :param backup_dir: Backup directory (restore source).
+        :param data_dir: Data directory (restore target).
+        :param dry_run: Should we do a test run?
+        :param index_path: Content index of the backup - partial restore only.
+        :return: CompletedProcess object of the rsync run.
+        """
+        restored_paths = None
+        if index_path:
+            restored_paths = self.__resolve_restore_paths(backup_dir, index_path)
+            if not restored_paths:
+                print("No backed up entries match the given paths - nothing to restore.")
+                return subprocess.CompletedProcess(args=[], returncode=1, stdout=None, stderr=None)
+            print(f"Restoring {len(restored_paths)} entries...")
+
+        has_duplicates_map = os.path.isfile(os.path.join(backup_dir, DuplicateLinker.map_file_name))
+        if has_duplicates_map:
+            self.__filter_path = self.__create_temp_file("exclude")
+            with open(self.__filter_path, 'wb') as file:
+                file.write(os.fsencode(DuplicateLinker.get_exclude_rule(DuplicateLinker.map_file_name)) + b'\0')
+        try:
+            if restored_paths is None:
+                rsync_result = self.__exec_rsync(backup_dir, data_dir, dry_run)
+            else:
+                rsync_result = self.__exec_rsync(backup_dir, data_dir, dry_run, restored_paths, delete_missing=False)
+        finally:
+            if self.__filter_path:
+                os.remove(self.__filter_path)
+                self.__filter_path = None
+
+        if has_duplicates_map and rsync_result.returncode == 0 and not dry_run:
+            updated_count = DuplicateLinker.restore_metadata(backup_dir, data_dir, restored_paths)
+            Logger.log(f"Duplicates: metadata restored for {updated_count} files.")
+        return rsync_result
+
+    def __resolve_restore_paths(self, backup_dir: str, index_path: str) -> list:
+        """
+        Resolves the paths of the partial restore: the path patterns are resolved against the content index
+        of the backup (or against the backup tree, if the index is disabled or missing). The matching entries
+        are restored with `--files-from`, nothing gets deleted on the data side.
+        :param backup_dir: Backup directory (restore source).
+        :param index_path: Content index of the backup.
+        :return: Sorted list of the matching paths.
+        """
+        patterns = self.restore_patterns
+        if not patterns:
+            if not UserInputConsole.interactive:
+                raise SystemExit("Error! Partial restore requires the paths to restore (`--restore-path`).")
+            patterns = UserInputConsole.read_path_patterns()
+
+        time_start = time.time()
+        if GeneralSettings.sync_rsync["rsync_content_index_enabled"] and os.path.isfile(index_path):
+            matched_paths = ContentIndex.resolve_in_index(patterns, index_path)
+        else:
+            print("No content index of the backup - scanning the backup tree...")
+            matched_paths = ContentIndex.resolve(
+                patterns, self.__scan_tree(backup_dir))
+        Logger.log(f"Partial restore: {len(matched_paths)} entries match {patterns} "
+                   + f"(resolved in {time.time() - time_start:.2f} [sec]).")
+
+        return matched_paths
+
+    def __verify(self, source_dir: str, backup_dir: str) -> subprocess.CompletedProcess:
+        """
+        Verifies the backup: compares the files of the source and the backup by their checksums
+        (see: TreeVerifier, `verify` in the settings).
+        :return: CompletedProcess object - exit code 0 if the backup matches the source, 1 otherwise.
+        The report is in the `stdout`.
+        """
+        print("Verifying the backup...")
+        time_start = time.time()
+        verifier = TreeVerifier()
+        result = verifier.verify(source_dir, backup_dir, [DuplicateLinker.map_file_name])
+        self.__add_phase_time("verify", time_start)
+        print(verifier.gen_report(result, GeneralSettings.verify["report_max_paths"]))
+        report = verifier.gen_report(result)
+        Logger.log(report)
+        return subprocess.CompletedProcess(args=[], returncode=0 if TreeVerifier.is_clean(result) else 1,
+                                           stdout=report, stderr=None)
+
+    def __choose_snapshot(self, target_dir: str) -> str:
+        """
+        Chooses the snapshot to restore: given with `restore_snapshot`, chosen by the user (interactive mode),
+        or the latest one.
+        :return: Snapshot name.
+        """
+        snapshots = SnapshotStore.list_snapshots(target_dir)
+        if not snapshots:
+            raise SystemExit(f"Error! No snapshots found in: {target_dir}")
+        if self.restore_snapshot:
+            if self.restore_snapshot not in snapshots:
+                raise SystemExit(f"Error! Snapshot not found: {self.restore_snapshot}")
+            return self.restore_snapshot
+        if UserInputConsole.interactive:
+            return UserInputConsole.read_snapshot(snapshots)
+        return snapshots[-1]
+
+    def __select_rsync_profile(self, action: BackupAction, source_dir: str, target_dir: str):
+        """
+        Chooses the rsync parameters profile: set in the config entry, or matched by the file system type
+        of the written location - the target, or the source for the restore actions (the profile options apply
+        to the written side, see: `rsync_profiles` in the settings).
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        self.rsync_profile = None
+        self.__rsync_profile_params = []
+        if not rsync_settings["rsync_profiles_enabled"]:
+            return
+
+        profiles = rsync_settings["rsync_profiles"]
+        checked_dirs = {"source": source_dir, "target": target_dir}
+        if self.config.encfs_enabled:
+            checked_dirs["encrypted data"] = self.config.encfs_encryption_dir
+        fs_types = {name: FileSystem.get_mount_info(path)['fs_type'] for name, path in checked_dirs.items()}
+
+        if self.config.rsync_profile:
+            profile_name = self.config.rsync_profile
+            if profile_name not in profiles:
+                raise SystemExit(f"Error! Unknown rsync profile (set in the config entry): {profile_name}")
+            reason = "set in the config entry"
+        else:
+            written_location = "source" if action in (BackupAction.RESTORE, BackupAction.RESTORE_DRY,
+                                                      BackupAction.RESTORE_PARTIAL,
+                                                      BackupAction.RESTORE_PARTIAL_DRY) else "target"
+            profile_filesystems = rsync_settings["rsync_profile_filesystems"]
+            profile_name = next((name for name, profile_fs_types in profile_filesystems.items()
+                                 if fs_types[written_location] in profile_fs_types), "default")
+            reason = "detected"
+
+        self.rsync_profile = profile_name
+        self.__rsync_profile_params = list(profiles[profile_name])
+        fs_types_label = ', '.join(f"{name}: {fs_type}" for name, fs_type in fs_types.items())
+        print(f"Rsync profile: {profile_name} ({fs_types_label})")
+        Logger.log(f"Rsync profile: {profile_name} ({reason}; {fs_types_label}), "
+                   + f"parameters: {self.__rsync_profile_params}")
+
+    def __get_transfer_stats(self) -> dict | None:
+        """
+        Returns the transfer statistics of the action: taken from the `--stats` output,
+        or parsed from the rsync log files (if the live progress is disabled).
+        :return: Transfer statistics (see: RsyncProgress.get_stats()), None if not known.
+        """
+        transfer_stats = self.last_transfer_stats
+        if transfer_stats is None and self.__rsync_log_paths:
+            stats_list = []
+            for rsync_log_path in self.__rsync_log_paths:
+                try:
+                    stats_list.append(RsyncProgress.parse_log_file(rsync_log_path))
+                except OSError as error:
+                    Logger.log(f"Failed to read the rsync log {rsync_log_path}: {error}")
+            transfer_stats = RsyncProgress.merge_stats(stats_list) if stats_list else None
+        return transfer_stats
+
+    def __record_run(self, action: BackupAction, time_start: float, return_code: int, transfer_stats: dict | None):
+        """
+        Saves the run in the run history.
+        """
+        try:
+            RunHistory.record(self.config.get_entry_id(), self.config.general_name, action.name, time_start,
+                              time.time() - time_start, transfer_stats, return_code, self.rsync_profile)
+        except sqlite3.Error as error:
+            Logger.log(f"Run history: failed to save the run: {error}")
+
+    def __export_metrics(self, action: BackupAction, time_start: float, return_code: int,
+                         transfer_stats: dict | None, resource_usage: dict = None):
+        """
+        Exports the run metrics (see: MetricsExporter, `metrics` in the settings).
+        :param resource_usage: Resource usage of the rsync processes (see: CommandResult), None if not known.
+        """
+        MetricsExporter.record_run(self.config.get_entry_id(), self.config.general_name, action.name, time_start,
+                                   return_code, transfer_stats, resource_usage, self.__phase_times)
+
+    def __add_phase_time(self, phase: str, time_start: float):
+        """
+        Adds the time elapsed since `time_start` to the phase duration (metrics).
+        """
+        self.__phase_times[phase] = self.__phase_times.get(phase, 0.0) + time.time() - time_start
+
+    def __scan_tree(self, root_dir: str) -> dict:
+        """
+        Scans the tree (see: FileManifest.scan()) - measured as the "scan" phase.
+        """
+        time_start = time.time()
+        try:
+            return FileManifest.scan(root_dir, GeneralSettings.sync_rsync["rsync_shards_scan_workers"])
+        finally:
+            self.__add_phase_time("scan", time_start)
+
+    def __watch(self, source_dir: str, target_dir: str) -> subprocess.CompletedProcess:
+        """
+        Watch mode: runs the full sync, then keeps syncing the changed paths (inotify events, debounced into
+        batches) until interrupted. Falls back to the full sync when the event queue overflows.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :return: CompletedProcess object of the last rsync run.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        print(f"Watch mode: {source_dir} -> {target_dir}")
+        if not self.request_confirmation([[self.binary_path, "(continuous sync)", source_dir, target_dir]]):
+            Logger.log("Skipped watch mode / execution aborted.")
+            raise SystemExit("Aborted.")
+        self.__confirmation_required = False
+
+        # start watching before the initial sync - the changes made in the meantime are not lost
+        watcher = InotifyWatcher(source_dir)
+        Logger.log(f"Watch mode started: {source_dir}")
+        rsync_result = subprocess.CompletedProcess(args=[], returncode=0, stdout=None, stderr=None)
+        try:
+            rsync_result = self.__exec_rsync_with_manifest(source_dir, target_dir, False)
+            print("Watching for changes... (press Ctrl+C to stop)")
+            while True:
+                changed_paths, overflow = watcher.read_batch(rsync_settings["rsync_watch_debounce_secs"],
+                                                             rsync_settings["rsync_watch_max_delay_secs"])
+                self.__rsync_log_paths = []
+                self.__release_rsync_logs()
+                if overflow:
+                    Logger.log("Watch mode: event queue overflow - running the full sync.")
+                    rsync_result = self.__exec_rsync(source_dir, target_dir, False)
+                else:
+                    Logger.log(f"Watch mode: syncing {len(changed_paths)} changed paths.")
+                    rsync_result = self.__exec_rsync(source_dir, target_dir, False, sorted(changed_paths))
+        except KeyboardInterrupt:
+            print("\nWatch mode stopped.")
+            Logger.log("Watch mode stopped by the user.")
+        finally:
+            watcher.close()
+            self.__release_rsync_logs()
+            self.__confirmation_required = True
+
+        return rsync_result
+
+    def __exec_backup(self, source_dir: str, target_dir: str, dry_run: bool) -> subprocess.CompletedProcess:
+        """
+        Executes the backup using the dry-run plan (if enabled in the settings).\n
+        The dry run captures the reported changes and saves them as the plan. The real run replays the plan
+        (only the listed paths are synced) if it is still valid: made for the same directories, not too old,
+        and the source tree has not changed since (same fingerprint). The plan is used only once.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :param dry_run: Should we do a test run?
+        :return: CompletedProcess object of the rsync run.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        if not rsync_settings["rsync_plan_enabled"]:
+            return self.__exec_rsync_with_manifest(source_dir, target_dir, dry_run)
+
+        plan_path = FileSystem.get_state_directory('plans') + f"/{self.config.get_entry_id()}.plan"
+        current_entries = self.__source_entries
+        if current_entries is None:
+            current_entries = self.__scan_tree(source_dir)
+        source_fingerprint = FileManifest.fingerprint(current_entries)
+        self.__source_entries = current_entries
+
+        if dry_run:
+            self.__plan_capture = RsyncPlan()
+            try:
+                rsync_result = self.__exec_rsync_with_manifest(source_dir, target_dir, True, current_entries)
+            finally:
+                rsync_plan, self.__plan_capture = self.__plan_capture, None
+            if rsync_result.returncode == 0:
+                rsync_plan.save(plan_path, source_dir, target_dir, source_fingerprint)
+                plan_summary = rsync_plan.gen_summary()
+                print(plan_summary)
+                Logger.log(f"{plan_summary}\nDry-run plan saved: {plan_path}")
+            return rsync_result
+
+        # the plan is single-use - removed whether it gets replayed or not
+        saved_plan = RsyncPlan.load(plan_path) if os.path.isfile(plan_path) else None
+        if os.path.isfile(plan_path):
+            os.remove(plan_path)
+
+        if saved_plan is not None:
+            discard_reason = None
+            if saved_plan.get('source_dir') != source_dir or saved_plan.get('target_dir') != target_dir:
+                discard_reason = "made for different directories"
+            elif time.time() - saved_plan.get('created_at', 0) > rsync_settings["rsync_plan_max_age_secs"]:
+                discard_reason = "too old"
+            elif saved_plan.get('source_fingerprint') != source_fingerprint:
+                discard_reason = "source changed since the dry run"
+
+            if discard_reason is None:
+                planned_paths = saved_plan.get('paths', [])
+                print(f"Replaying the dry-run plan: {len(planned_paths)} paths to sync.")
+                Logger.log(f"Dry-run plan replayed: {len(planned_paths)} paths.")
+                if planned_paths:
+                    rsync_result = self.__exec_rsync(source_dir, target_dir, False, planned_paths)
+                else:
+                    print("No changes in the dry-run plan - rsync skipped.")
+                    rsync_result = subprocess.CompletedProcess(args=[], returncode=0, stdout=None, stderr=None)
+                if rsync_result.returncode == 0 and rsync_settings["rsync_manifest_enabled"]:
+                    manifest_path = FileSystem.get_state_directory('manifests') \
+                        + f"/{self.config.get_entry_id()}.manifest"
+                    FileManifest.save(manifest_path, current_entries)
+                return rsync_result
+
+            print(f"Dry-run plan discarded ({discard_reason}) - running the regular backup.")
+            Logger.log(f"Dry-run plan discarded: {discard_reason}.")
+
+        return self.__exec_rsync_with_manifest(source_dir, target_dir, False, current_entries)
+
+    def __exec_rsync_with_manifest(self, source_dir: str, target_dir: str, dry_run: bool,
+                                   current_entries: dict = None) -> subprocess.CompletedProcess:
+        """
+        Executes the backup using the change manifest (if enabled in the settings).\n
+        The source tree is compared with the manifest of the last successful backup: rsync gets skipped
+        if nothing changed, otherwise only the changed (and deleted) paths are passed to rsync.
+        The manifest is saved after every successful (non-dry) backup.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :param dry_run: Should we do a test run?
+        :param current_entries: Source tree already scanned by the caller (see: FileManifest.scan()), optional.
+        :return: CompletedProcess object of the rsync run.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        if not rsync_settings["rsync_manifest_enabled"]:
+            return self.__exec_rsync(source_dir, target_dir, dry_run)
+
+        manifest_path = FileSystem.get_state_directory('manifests') + f"/{self.config.get_entry_id()}.manifest"
+        time_start = time.time()
+        if current_entries is None:
+            current_entries = self.__source_entries
+        if current_entries is None:
+            current_entries = self.__scan_tree(source_dir)
+        self.__source_entries = current_entries
+
+        if not os.path.isfile(manifest_path):
+            print("No change manifest found - running the full sync.")
+            rsync_result = self.__exec_rsync(source_dir, target_dir, dry_run)
+        else:
+            manifest = FileManifest(manifest_path)
+            try:
+                changed_paths, deleted_paths = manifest.diff(current_entries)
+            finally:
+                manifest.close()
+            Logger.log(f"Change manifest: {len(changed_paths)} changed, {len(deleted_paths)} deleted "
+                       + f"of {len(current_entries)} entries (compared in {time.time() - time_start:.2f} [sec]).")
+
+            if not changed_paths and not deleted_paths:
+                print("No changes since the last backup - rsync skipped.")
+                self.last_transfer_stats = None
+                return subprocess.CompletedProcess(args=[], returncode=0, stdout=None, stderr=None)
 
-        # prepare the command
+            print(f"Changes since the last backup: {len(changed_paths)} changed, {len(deleted_paths)} deleted.")
+            rsync_result = self.__exec_rsync(source_dir, target_dir, dry_run, changed_paths + deleted_paths)
+
+        if rsync_result.returncode == 0 and not dry_run:
+            FileManifest.save(manifest_path, current_entries)
+        return rsync_result
+
+    def __prepare_rsync_params(self, dry_run: bool, log_name_suffix: str = '', files_from: str = None,
+                               delete_missing: bool = True, concurrent_runs: int = 1) -> list:
+        """
+        Prepares the rsync parameters (without source and target).
+        :param dry_run: Should we add the dry run parameters?
+        :param log_name_suffix: Optional suffix for the rsync log file name (for the concurrent runs).
+        :param files_from: Optional path to the (NUL separated) list of files to transfer. In this mode the paths
+        missing on the source side are deleted on the target (`--delete-missing-args --force`), instead of `--delete*`.
+        :param delete_missing: False - the paths missing on the source side are skipped (`--ignore-missing-args`).
+        :param concurrent_runs: Number of the rsync processes started together - they share the bandwidth limit.
+        :return: List of the parameters.
+        """
         rsync_settings = GeneralSettings.sync_rsync
-        rsync_base_params: list = rsync_settings['rsync_base_params']
+        rsync_params: list = list(rsync_settings['rsync_base_params']) + self.__rsync_profile_params
+
+        if files_from:
+            rsync_params = [param for param in rsync_params if not param.startswith("--delete")]
+            rsync_params += [f"--files-from={files_from}", "--from0"]
+            # `--force`: a directory missing on the source side gets deleted on the target even if it is not empty
+            rsync_params += ["--delete-missing-args", "--force"] if delete_missing else ["--ignore-missing-args"]
 
         if dry_run:
-            rsync_base_params += rsync_settings["rsync_dry_run_params"]
+            rsync_params += rsync_settings["rsync_dry_run_params"]
+        elif rsync_settings["rsync_partial_dir"] and "--inplace" not in rsync_params:
+            # interrupted transfers of the large files are resumed (not started over) by the next run
+            rsync_params += [f"--partial-dir={rsync_settings['rsync_partial_dir']}"]
+
+        if self.__plan_capture:
+            rsync_params += RsyncPlan.out_format_params
+
+        if self.__link_dest_dir:
+            rsync_params += [f"--link-dest={self.__link_dest_dir}"]
+
+        if self.__filter_path:
+            rsync_params += [f"--exclude-from={self.__filter_path}", "--from0"]
+
+        # throttling - the bandwidth limit from the current load (last one wins over the base params)
+        rsync_params += ProcessThrottle.get_bwlimit_params(concurrent_runs)
 
         if rsync_settings["rsync_logging_enabled"]:
             # rsync logging - prepare the path
-            current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             log_dir = Logger.get_log_path_dir()
-            rsync_log_path = log_dir + f"/rsync_{current_date}.log"
-            if not os.path.isdir(log_dir) or os.path.isfile(rsync_log_path):
+            if not os.path.isdir(log_dir):
                 raise SystemExit('Error! Rsync logging paths misconfigured!')
+            rsync_log_path = self.__create_rsync_log_file(log_dir, log_name_suffix)
 
             # rsync logging - log to a file
-            rsync_base_params += [f"--log-file={rsync_log_path}"]
+            rsync_params += [f"--log-file={rsync_log_path}"]
+            self.__rsync_log_paths.append(rsync_log_path)
 
             # rsync logging - extra params
-            rsync_base_params += rsync_settings["rsync_logging_extra_params"]
+            rsync_params += rsync_settings["rsync_logging_extra_params"]
 
-        exec_command: list = [self.binary_path] + rsync_base_params + [source_dir, target_dir]
+        return rsync_params
+
+    def __create_rsync_log_file(self, log_dir: str, log_name_suffix: str) -> str:
+        """
+        Creates the (empty) rsync log file with a unique name. The name has the microseconds, and a number is added
+        if the file already exists - the runs of the same entry can follow each other quickly (actions lists,
+        dry run then backup, retries, watch mode). The file stays locked until the action ends (see: LogRotation).
+        :return: Path to the created log file.
+        """
+        current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        log_name = f"rsync_{current_date}_{self.config.get_entry_id()}{log_name_suffix}"
+        duplicate_number = 0
+        while True:
+            rsync_log_path = log_dir + f"/{log_name}{f'_{duplicate_number}' if duplicate_number else ''}.log"
+            try:
+                log_file_descriptor = os.open(rsync_log_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                duplicate_number += 1
+                continue
+            fcntl.flock(log_file_descriptor, fcntl.LOCK_SH)
+            self.__rsync_log_locks.append(log_file_descriptor)
+            return rsync_log_path
+
+    def __create_temp_file(self, name: str) -> str:
+        """
+        Creates an empty temporary file (rsync lists) with a unique name in the state directory - the concurrent
+        runs of the same entry (e.g. a scheduled batch and an interactive run) do not overwrite each other's files.
+        :param name: Name prefix (the entry ID is added).
+        :return: Path to the created file. The caller removes it.
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=f"{name}_{self.config.get_entry_id()}_",
+                                                      dir=FileSystem.get_state_directory('tmp'))
+        os.close(file_descriptor)
+        return temp_path
+
+    def __release_rsync_logs(self):
+        """
+        Unlocks (closes) the rsync log files of the finished runs - the log rotation can handle them then.
+        """
+        for log_file_descriptor in self.__rsync_log_locks:
+            os.close(log_file_descriptor)
+        self.__rsync_log_locks = []
+
+    def __exec_rsync(self, source_dir: str, target_dir: str, dry_run: bool, selected_paths: list = None,
+                     delete_missing: bool = True) -> subprocess.CompletedProcess:
+        """
+        Executes the rsync command.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :param dry_run: Should we do a test run? True means that rsync will only list the changes
+        (but will not do anything to the files)
+        :param selected_paths: Optional list of paths (relative to the source) - only these get synced.
+        The paths that do not exist in the source get deleted on the target.
+        :param delete_missing: False - the selected paths that do not exist in the source are skipped instead.
+        :return: CompletedProcess object of the rsync run.
+        """
+
+        # validate source and target directories
+        for path in (source_dir, target_dir):
+            if not os.path.isdir(path):
+                raise SystemExit("Error! Not a directory: " + path)
+
+        time_start = time.time()
+        retry_wait_before = self.__phase_times.get("retry_wait", 0.0)
+        confirmation_required = self.__confirmation_required
+        files_from_path = None
+        if selected_paths is not None:
+            files_from_path = self.__create_temp_file("files_from")
+            with open(files_from_path, 'wb') as file:
+                file.write(b''.join(os.fsencode(path) + b'\0' for path in selected_paths))
+        try:
+            attempt = 1
+            while True:
+                if files_from_path:
+                    rsync_result = self.__exec_rsync_single(source_dir, target_dir, dry_run, files_from_path,
+                                                            delete_missing)
+                elif GeneralSettings.sync_rsync["rsync_shards"] > 1:
+                    rsync_result = self.__exec_rsync_sharded(source_dir, target_dir, dry_run)
+                else:
+                    rsync_result = self.__exec_rsync_single(source_dir, target_dir, dry_run)
+
+                if not self.__wait_before_retry(rsync_result.returncode, attempt):
+                    return rsync_result
+                # the retries are not confirmed again
+                self.__confirmation_required = False
+                attempt += 1
+        finally:
+            self.__confirmation_required = confirmation_required
+            if files_from_path:
+                os.remove(files_from_path)
+            self.__add_phase_time("rsync", time_start + self.__phase_times.get("retry_wait", 0.0) - retry_wait_before)
+
+    def __wait_before_retry(self, return_code: int, attempt: int) -> bool:
+        """
+        Decides on the retry of the failed rsync run: only the transient failures are retried (see: `rsync_retry_*`
+        in the settings), with the exponential back-off. Waits before the retry.
+        :param return_code: Exit code of the rsync run.
+        :param attempt: Number of the finished attempt (starting from 1).
+        :return: bool value, True if the run should be retried.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        if return_code not in rsync_settings["rsync_retry_exit_codes"] \
+                or attempt >= rsync_settings["rsync_retry_max_attempts"]:
+            return False
+
+        delay_secs = min(rsync_settings["rsync_retry_initial_delay_secs"] * 2 ** (attempt - 1),
+                         rsync_settings["rsync_retry_max_delay_secs"])
+        retry_message = str(f"Rsync exit code {return_code} ({self.rsync_exit_codes.get(return_code, 'unknown')}) - "
+                            + f"retrying in {delay_secs:.1f} [sec] "
+                            + f"(attempt {attempt + 1}/{rsync_settings['rsync_retry_max_attempts']}).")
+        print(retry_message)
+        Logger.log(retry_message)
+        time_start = time.time()
+        time.sleep(delay_secs)
+        self.__add_phase_time("retry_wait", time_start)
+        return True
+
+    def __print_sync_result(self, rsync_result: subprocess.CompletedProcess):
+        """
+        Informs the user about the result of the rsync run. The captured error output (streamed and concurrent runs
+        - not shown on the console during the run) is printed if the run failed.
+        """
+        if rsync_result.returncode == 0:
+            print("Sync done!")
+        else:
+            print(f"Sync failed! Rsync exit code: {rsync_result.returncode} "
+                  + f"({self.rsync_exit_codes.get(rsync_result.returncode, 'see: man rsync')})")
+            if rsync_result.stderr and str(rsync_result.stderr).strip():
+                print(f"Rsync error output:\n{str(rsync_result.stderr).rstrip()}")
+
+    def __exec_rsync_single(self, source_dir: str, target_dir: str, dry_run: bool, files_from: str = None,
+                            delete_missing: bool = True) -> subprocess.CompletedProcess:
+        """
+        Executes a single rsync process.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :param dry_run: Should we do a test run?
+        :param files_from: Optional path to the list of files to transfer (see: __prepare_rsync_params()).
+        :param delete_missing: See: __prepare_rsync_params().
+        :return: CompletedProcess object of the rsync run.
+        """
+
+        self.last_transfer_stats = None
+        rsync_settings = GeneralSettings.sync_rsync
+        if not rsync_settings["rsync_progress_enabled"]:
+            # prepare the command
+            rsync_params = self.__prepare_rsync_params(dry_run, files_from=files_from, delete_missing=delete_missing)
+            exec_command: list = [self.binary_path] + rsync_params + [source_dir, target_dir]
+
+            # run the command (the output is streamed when the dry-run plan is captured)
+            if rsync_settings["rsync_timeout_secs"]:
+                rsync_result = asyncio.run(self.__exec_with_deadline(exec_command, self.__plan_line_handler(print)))
+            elif self.__plan_capture:
+                rsync_result = self.os_exec_stream(exec_command, self.__plan_line_handler(print),
+                                                   confirmation_required=self.__confirmation_required,
+                                                   logging_enabled=True, logging_enabled_runtime=True,
+                                                   continue_on_failure=True)
+            else:
+                rsync_result = self.os_exec(exec_command, confirmation_required=self.__confirmation_required,
+                                            capture_output=False,
+                                            logging_enabled=True, logging_enabled_runtime=True,
+                                            continue_on_failure=True)
+
+            # save the report
+            self.gen_run_report(exec_command, rsync_result.stdout, rsync_result.stderr)
+
+            self.__print_timeout(rsync_result)
+            self.__print_sync_result(rsync_result)
+            return rsync_result
+
+        # streaming mode - prepare the command
+        rsync_params = self.__prepare_rsync_params(dry_run, files_from=files_from, delete_missing=delete_missing)
+        exec_command: list = [self.binary_path] + rsync_params + rsync_settings["rsync_progress_params"] \
+            + [source_dir, target_dir]
 
         # run the command
-        rsync_result = self.os_exec(exec_command, confirmation_required=True, capture_output=False,
-                                    logging_enabled=True, logging_enabled_runtime=True,
-                                    continue_on_failure=True)
+        rsync_progress = RsyncProgress()
+        line_handler = self.__plan_line_handler(rsync_progress.handle_line)
+        if rsync_settings["rsync_timeout_secs"]:
+            rsync_result = asyncio.run(self.__exec_with_deadline(exec_command, line_handler))
+        else:
+            rsync_result = self.os_exec_stream(exec_command, line_handler,
+                                               confirmation_required=self.__confirmation_required,
+                                               logging_enabled=True, logging_enabled_runtime=True,
+                                               continue_on_failure=True)
+        rsync_progress.finish()
+
+        # save the stats and the report
+        self.__save_transfer_stats(rsync_progress.get_stats())
+        self.gen_run_report(exec_command, rsync_progress.gen_report(), rsync_result.stderr)
+
+        self.__print_timeout(rsync_result)
+        self.__print_sync_result(rsync_result)
+        return rsync_result
+
+    def __plan_line_handler(self, line_handler):
+        """
+        Wraps the output line handler: the lines are passed to the dry-run plan being captured (if any) first,
+        the other lines (not consumed by the plan) are passed to the given handler.
+        """
+        rsync_plan = self.__plan_capture
+        if rsync_plan is None:
+            return line_handler
+
+        def handle_line(line: str):
+            # the itemized change lines are summarized by the plan - not printed nor kept in the report
+            if rsync_plan.handle_line(line):
+                return
+            line_handler(line)
+
+        return handle_line
+
+    async def __exec_with_deadline(self, exec_command: list, line_handler, confirmation_required: bool = None,
+                                   silent: bool = False) -> CommandResult:
+        """
+        Executes the rsync command with the asyncio runner - with the deadline (`rsync_timeout_secs` setting).
+        :param line_handler: Callable that receives the output lines, None - the output is captured.
+        :param confirmation_required: Ask for the confirmation? By default - unless already confirmed (watch mode).
+        :return: CommandResult object of the rsync run.
+        """
+        if confirmation_required is None:
+            confirmation_required = self.__confirmation_required
+        rsync_result = await self.os_exec_async(exec_command, line_handler,
+                                                timeout_secs=GeneralSettings.sync_rsync["rsync_timeout_secs"],
+                                                confirmation_required=confirmation_required, silent=silent,
+                                                logging_enabled=True, logging_enabled_runtime=True,
+                                                continue_on_failure=True)
+        return rsync_result
+
+    @staticmethod
+    def __print_timeout(rsync_result: CommandResult):
+        """
+        Informs the user that the rsync run was stopped (deadline exceeded).
+        """
+        if rsync_result.timed_out:
+            print(f"Rsync timed out after {GeneralSettings.sync_rsync['rsync_timeout_secs']} [sec] - stopped!")
+
+    async def __exec_shards_async(self, shard_commands: list, on_finished) -> list:
+        """
+        Executes the shard commands concurrently in a single event loop (each one with the deadline).
+        :param on_finished: Callable that receives the index and the result of every finished shard (checkpoints).
+        :return: List of the CommandResult objects (in the order of the commands).
+        """
+        finished_count = 0
+
+        async def exec_shard(shard_index: int, command: list) -> CommandResult:
+            nonlocal finished_count
+            shard_result = await self.__exec_with_deadline(command, None, confirmation_required=False, silent=True)
+            on_finished(shard_index, shard_result)
+            finished_count += 1
+            print(f"( Shard {finished_count}/{len(shard_commands)} finished, exit code: {shard_result.returncode}"
+                  + (", timed out" if shard_result.timed_out else "") + " )")
+            return shard_result
+
+        return list(await asyncio.gather(*[exec_shard(shard_index, command)
+                                           for shard_index, command in enumerate(shard_commands)]))
 
-        # save the report
-        self.gen_run_report(exec_command, rsync_result.stdout, rsync_result.stderr)
+    def __save_transfer_stats(self, transfer_stats: dict):
+        """
+        Keeps the transfer statistics and passes them to the logger.
+        """
+        self.last_transfer_stats = transfer_stats
+        Logger.log("Transfer stats: " + json.dumps(transfer_stats, sort_keys=True))
+
+    def __exec_rsync_sharded(self, source_dir: str, target_dir: str, dry_run: bool) -> subprocess.CompletedProcess:
+        """
+        Executes the rsync in sharded mode: top-level subdirectories of the source are split into size-balanced
+        groups, each group is synced by a separate (concurrent) rsync process.\n
+        The top-level entries (files, directories and deletions of the extraneous entries) are handled first
+        by a single non-recursive "sweep" run, so the `--delete` semantics are kept at every level.
+        :param source_dir: Source directory - what to copy?
+        :param target_dir: Target directory - where to save a copy?
+        :param dry_run: Should we do a test run?
+        :return: CommandResult object with merged results (and resource usage) of all the runs.
+        """
+        rsync_settings = GeneralSettings.sync_rsync
+        self.last_transfer_stats = None
+
+        # plan the shards
+        print("Scanning the source tree...")
+        sub_dir_fingerprints, _ = TreeScanner.scan_top_level(source_dir, rsync_settings["rsync_shards_scan_workers"])
+        sub_dir_sizes = {name: fingerprint[0] for name, fingerprint in sub_dir_fingerprints.items()}
+
+        # run journal: the subtrees completed by the interrupted (or failed) run are skipped
+        run_journal = None
+        pending_sizes = sub_dir_sizes
+        if rsync_settings["rsync_journal_enabled"] and not dry_run:
+            run_journal = RunJournal.open(FileSystem.get_state_directory('journals')
+                                          + f"/{self.config.get_entry_id()}.json", source_dir, target_dir,
+                                          rsync_settings["rsync_journal_max_age_secs"])
+            pending_sizes = {name: size for name, size in sub_dir_sizes.items()
+                             if not run_journal.is_completed(name, sub_dir_fingerprints[name])}
+            if len(pending_sizes) < len(sub_dir_sizes):
+                print(f"Resuming the interrupted backup: {len(sub_dir_sizes) - len(pending_sizes)} "
+                      + f"of {len(sub_dir_sizes)} top-level directories already done.")
+
+        shard_groups = TreeScanner.plan_balanced_groups(pending_sizes, rsync_settings["rsync_shards"])
+        Logger.log(f"Sharded rsync plan: {len(pending_sizes)} top-level directories in {len(shard_groups)} shards "
+                   + f"({len(sub_dir_sizes) - len(pending_sizes)} completed by the interrupted run - skipped).")
+
+        # stats are parsed from the captured output (no live progress for the concurrent runs)
+        stats_params = ["--stats"] if rsync_settings["rsync_progress_enabled"] else []
+
+        # sweep: top-level entries only (no recursion)
+        sweep_command: list = [self.binary_path] + self.__prepare_rsync_params(dry_run, '_sweep') + stats_params \
+            + ["--no-recursive", "--dirs", source_dir, target_dir]
 
-        print("Sync done!")
+        # shards: source directories given without the trailing slash - synced as a whole into the target
+        shard_commands: list = []
+        for shard_number, shard_group in enumerate(shard_groups, start=1):
+            shard_commands.append(
+                [self.binary_path]
+                + self.__prepare_rsync_params(dry_run, f"_shard{shard_number}", concurrent_runs=len(shard_groups))
+                + stats_params
+                + [os.path.join(source_dir, name) for name in shard_group] + [target_dir]
+            )
+
+        if self.__confirmation_required and not self.request_confirmation([sweep_command] + shard_commands):
+            Logger.log("Skipped sharded rsync / execution aborted.")
+            raise SystemExit("Aborted.")
+
+        def checkpoint_shard(shard_index: int, shard_result: CommandResult):
+            if run_journal and shard_result.returncode == 0:
+                run_journal.complete({name: sub_dir_fingerprints[name] for name in shard_groups[shard_index]})
+
+        def exec_shard(shard_index: int) -> CommandResult:
+            shard_result = self.os_exec(shard_commands[shard_index], silent=True, logging_enabled_runtime=True,
+                                        continue_on_failure=True)
+            checkpoint_shard(shard_index, shard_result)
+            return shard_result
+
+        # run the sweep first, then the shards concurrently
+        time_start = time.time()
+        if rsync_settings["rsync_timeout_secs"]:
+            results = [asyncio.run(self.__exec_with_deadline(sweep_command, None, confirmation_required=False))]
+            results += asyncio.run(self.__exec_shards_async(shard_commands, checkpoint_shard))
+        else:
+            results = [self.os_exec(sweep_command, logging_enabled_runtime=True, continue_on_failure=True)]
+            with ThreadPoolExecutor(max_workers=max(1, len(shard_commands))) as executor:
+                for shard_result in executor.map(exec_shard, range(len(shard_commands))):
+                    print(f"( Shard {len(results)}/{len(shard_commands)} finished, "
+                          + f"exit code: {shard_result.returncode} )")
+                    results.append(shard_result)
+
+        # the itemized change lines go to the dry-run plan (summarized), not to the report
+        if self.__plan_capture:
+            for result in results:
+                result.stdout = ''.join(line + '\n' for line in str(result.stdout).splitlines()
+                                        if not self.__plan_capture.handle_line(line))
+
+        # merge the results - the first non-zero exit code wins
+        merged_result = CommandResult(
+            args=[result.args for result in results],
+            returncode=next((result.returncode for result in results if result.returncode != 0), 0),
+            stdout=''.join(f"[{self.__shard_label(number)}]\n{result.stdout}" for number, result in enumerate(results)),
+            stderr=''.join(f"[{self.__shard_label(number)}]\n{result.stderr}" for number, result in enumerate(results)),
+            resource_usage=CommandResult.merge_resource_usage(results)
+        )
+        if stats_params:
+            stats_list = []
+            for result in results:
+                rsync_progress = RsyncProgress(print_progress=False)
+                for line in str(result.stdout).splitlines():
+                    rsync_progress.handle_line(line)
+                stats_list.append(rsync_progress.get_stats())
+            merged_stats = RsyncProgress.merge_stats(stats_list)
+            merged_stats['elapsed_secs'] = time.time() - time_start
+            self.__save_transfer_stats(merged_stats)
+
+        self.gen_run_report(f"sharded rsync ({len(shard_commands)} shards + sweep)",
+                            merged_result.stdout, merged_result.stderr)
+
+        if run_journal and merged_result.returncode == 0:
+            run_journal.remove()
+
+        self.__print_sync_result(merged_result)
+        return merged_result
+
+    @staticmethod
+    def __shard_label(number: int) -> str:
+        """
+        Returns the report label for the sharded run number (0 - the sweep run).
+        """
+        return "sweep" if number == 0 else f"shard {number}"
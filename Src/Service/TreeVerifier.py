@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import GeneralSettings
+from Src.IO.FileManifest import FileManifest
+from Src.IO.FileSystem import FileSystem
+from Src.IO.HashCache import HashCache
+
+
+class TreeVerifier:
+    """
+    Compares the source tree with the backup by the file checksums. Files are hashed concurrently
+    (process pool), the hashes of the unchanged files are taken from the cache (see: HashCache).
+    """
+
+    def __init__(self):
+        """
+        Initializes the verifier (see: `verify` in the settings).
+        """
+        verify_settings = GeneralSettings.verify
+        self.algorithm: str = verify_settings["hash_algorithm"]
+        if self.algorithm not in hashlib.algorithms_available:
+            raise SystemExit(f"Error! Unsupported hash algorithm: {self.algorithm}")
+        self.workers: int = verify_settings["workers"] or os.cpu_count() or 1
+        self.cache_enabled: bool = verify_settings["cache_enabled"]
+        self.stats: dict = {"hashed_files": 0, "hashed_bytes": 0, "cached_files": 0}
+
+    def verify(self, source_dir: str, backup_dir: str, ignored_paths: list = None) -> dict:
+        """
+        Verifies the backup.
+        :param source_dir: Source directory (data).
+        :param backup_dir: Backup directory (decrypted, for the encrypted entries).
+        :param ignored_paths: Relative paths skipped on both sides (e.g. the EEsync metadata files in the backup).
+        :return: dict with the result: compared files count and the sorted lists of the mismatched,
+        missing (in the backup), extra (backup only) and unreadable paths.
+        """
+        time_start = time.time()
+        scan_workers = GeneralSettings.sync_rsync["rsync_shards_scan_workers"]
+        source_entries = FileManifest.scan(source_dir, scan_workers)
+        backup_entries = FileManifest.scan(backup_dir, scan_workers)
+        for path in ignored_paths or []:
+            source_entries.pop(path, None)
+            backup_entries.pop(path, None)
+
+        mismatched = []
+        compared_paths = []
+        for path, (size, _, _, kind) in source_entries.items():
+            backup_values = backup_entries.get(path)
+            if backup_values is None:
+                continue
+            if kind != backup_values[3]:
+                mismatched.append(path)
+            elif kind == FileManifest.KIND_FILE:
+                if size != backup_values[0]:
+                    mismatched.append(path)
+                else:
+                    compared_paths.append(path)
+            elif kind == FileManifest.KIND_SYMLINK:
+                try:
+                    if os.readlink(os.path.join(source_dir, path)) != os.readlink(os.path.join(backup_dir, path)):
+                        mismatched.append(path)
+                except OSError:
+                    mismatched.append(path)
+
+        source_hashes, backup_hashes = self.hash_trees([(source_dir, source_entries), (backup_dir, backup_entries)],
+                                                       compared_paths)
+        unreadable = []
+        for path in compared_paths:
+            if source_hashes[path] is None or backup_hashes[path] is None:
+                unreadable.append(path)
+            elif source_hashes[path] != backup_hashes[path]:
+                mismatched.append(path)
+
+        return {
+            "source_dir": source_dir,
+            "backup_dir": backup_dir,
+            "duration_secs": time.time() - time_start,
+            "compared_files": len(compared_paths),
+            "mismatched": sorted(mismatched),
+            "missing": sorted(path for path in source_entries if path not in backup_entries),
+            "extra": sorted(path for path in backup_entries if path not in source_entries),
+            "unreadable": sorted(unreadable)
+        }
+
+    def hash_trees(self, trees: list, paths: list) -> list:
+        """
+        Hashes the files of the trees - the files of all the trees are hashed by a single process pool.
+        The cached hashes of the other (unchanged) files of the trees are kept in the cache.
+        :param trees: List of the tuples: (root directory, scanned entries - see: FileManifest.scan()).
+        :param paths: Relative paths of the files to hash (in every tree).
+        :return: List of the dicts (per tree): path -> digest (None if the file could not be read).
+        """
+        tree_hashes = []
+        pending = []
+        for tree_number, (root_dir, entries) in enumerate(trees):
+            volume, use_path_id = self.__get_volume(root_dir)
+            cache = HashCache.load(volume, self.algorithm) if self.cache_enabled else {}
+            hashes = {}
+            for path in paths:
+                cache_key = self.__get_cache_key(path, entries[path], use_path_id)
+                if cache_key in cache:
+                    hashes[path] = cache[cache_key]
+                    self.stats["cached_files"] += 1
+                else:
+                    pending.append((tree_number, path, entries[path][0]))
+            tree_hashes.append({"volume": volume, "use_path_id": use_path_id, "cache": cache, "hashes": hashes})
+
+        if pending:
+            print(f"Hashing {len(pending)} files ({self.stats['cached_files']} taken from the cache)...")
+            chunk_size = max(1, min(64, len(pending) // (self.workers * 4)))
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     mp_context=multiprocessing.get_context("forkserver")) as executor:
+                file_paths = [os.path.join(trees[tree_number][0], path) for tree_number, path, _ in pending]
+                for (tree_number, path, size), digest in zip(
+                        pending, executor.map(self.hash_file, file_paths, repeat(self.algorithm),
+                                              chunksize=chunk_size)):
+                    tree_hashes[tree_number]["hashes"][path] = digest
+                    if digest is not None:
+                        self.stats["hashed_files"] += 1
+                        self.stats["hashed_bytes"] += size
+
+        if self.cache_enabled:
+            for (_, entries), tree in zip(trees, tree_hashes):
+                current_keys = {self.__get_cache_key(path, values, tree["use_path_id"])
+                                for path, values in entries.items() if values[3] == FileManifest.KIND_FILE}
+                cached_hashes = {cache_key: digest for cache_key, digest in tree["cache"].items()
+                                 if cache_key in current_keys}
+                cached_hashes.update({self.__get_cache_key(path, entries[path], tree["use_path_id"]): digest
+                                      for path, digest in tree["hashes"].items() if digest is not None})
+                HashCache.replace(tree["volume"], self.algorithm, cached_hashes)
+        return [tree["hashes"] for tree in tree_hashes]
+
+    @staticmethod
+    def __get_cache_key(path: str, values: tuple, use_path_id: bool) -> tuple:
+        """
+        Returns the hash cache key of the file: (file ID, size, mtime_ns).
+        :param values: Scanned entry values: (size, mtime_ns, inode, kind).
+        """
+        size, mtime_ns, inode, _ = values
+        return path if use_path_id else str(inode), size, mtime_ns
+
+    @staticmethod
+    def __get_volume(root_dir: str) -> tuple:
+        """
+        Returns the cache volume of the tree and the file ID mode.
+        :return: Tuple: (volume name, True if the files are identified by the path instead of the inode).
+        """
+        mount_info = FileSystem.get_mount_info(root_dir)
+        volume = f"{mount_info['fs_type']}:{mount_info['source']}:{os.path.realpath(root_dir)}"
+        return volume, mount_info['fs_type'].startswith("fuse")
+
+    @staticmethod
+    def hash_file(path: str, algorithm: str) -> str | None:
+        """
+        Hashes the file. Executed by the worker processes.
+        :return: Hex digest, None if the file could not be read.
+        """
+        try:
+            file_hash = hashlib.new(algorithm)
+            with open(path, 'rb') as file:
+                while chunk := file.read(1024 * 1024):
+                    file_hash.update(chunk)
+            return file_hash.hexdigest()
+        except OSError:
+            return None
+
+    def gen_report(self, result: dict, max_paths: int = None) -> str:
+        """
+        Generates the verification report.
+        :param result: Result of the `verify()`.
+        :param max_paths: Maximum number of the listed paths of every kind, None - all of them.
+        """
+        report = str(f"Verification: {result['source_dir']} vs {result['backup_dir']}\n"
+                     + f"  Compared files: {result['compared_files']} (hashed: {self.stats['hashed_files']} files, "
+                     + f"{self.stats['hashed_bytes']} bytes; from the cache: {self.stats['cached_files']}), "
+                     + f"done in {result['duration_secs']:.2f} [sec]\n")
+        for key, label in [("mismatched", "Mismatched"), ("missing", "Missing in the backup"),
+                           ("extra", "Extra in the backup"), ("unreadable", "Unreadable")]:
+            paths = result[key]
+            report += f"  {label}: {len(paths)}\n"
+            listed_paths = paths if max_paths is None else paths[:max_paths]
+            report += ''.join(f"    {path}\n" for path in listed_paths)
+            if len(listed_paths) < len(paths):
+                report += f"    ... and {len(paths) - len(listed_paths)} more (see the log)\n"
+        report += "Result: " + ("OK" if self.is_clean(result) else "DIFFERENCES FOUND")
+        return report
+
+    @staticmethod
+    def is_clean(result: dict) -> bool:
+        """
+        Returns True if the backup matches the source.
+        """
+        return not any(result[key] for key in ["mismatched", "missing", "extra", "unreadable"])